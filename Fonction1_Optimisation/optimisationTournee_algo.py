@@ -12,13 +12,27 @@ Les rendez‑vous modifiables verront leur créneau (date_debut_rdv, date_fin_rd
 Seuls les rendez‑vous modifiés sont renvoyés en sortie.
 """
 
+import os
+import logging
 import math
+import time
 import json
 from datetime import datetime, date, timedelta
 from collections import defaultdict
 from copy import deepcopy
+from concurrent.futures import ProcessPoolExecutor
 from dateutil.parser import parse
-from utils import haversine_distance, to_datetime
+import numpy as np
+from utils import haversine_distance, haversine_matrix, to_datetime
+from Fonction1_Optimisation.optimisationTournee_distances import HorizonTravelTimes
+from Fonction1_Optimisation.optimisationTournee_diff import same_instant
+from Fonction1_Optimisation.optimisationTournee_records import as_appointment
+from Fonction1_Optimisation.optimisationTournee_eligibility import EligibilityIndex
+from Fonction1_Optimisation.optimisationTournee_budget import request_deadline, solve_time_limit, stop_on_stagnation
+from telemetry import RequestReport
+from logs import get_logger
+
+logger = get_logger(__name__)
 
 # Import OR‑Tools
 from ortools.constraint_solver import routing_enums_pb2
@@ -42,12 +56,22 @@ DEPOT_COORDINATES = (48.8566, 2.3522)  # Paris centre
 # Pénalité pour ne pas visiter un rendez‑vous (à ajuster)
 SKIP_PENALTY = 10000
 
-# Durée de résolution maximale (secondes)
+# Durée de résolution maximale (secondes) d'une période ; le budget effectif dépend de la taille
+# du modèle et de l'échéance de la requête (voir optimisationTournee_budget)
 TIME_LIMIT = 10
 
 # Tolérance pour synchronisation multi‑ressources (en minutes)
 SYNC_TOLERANCE = 0  # ici, nous imposons l'égalité stricte
 
+# Nombre de processus pour résoudre les périodes (jour, matin/après‑midi) en parallèle (1 = séquentiel)
+SOLVE_WORKERS = int(os.environ.get("SOLVE_WORKERS", 1))
+
+# Démarrage des solveurs à partir du planning DISC actuel ("0" pour repartir de PATH_CHEAPEST_ARC)
+WARM_START = os.environ.get("WARM_START", "1") != "0"
+
+# Moteur par défaut : "periode" (un modèle par demi‑journée) ou "horizon" (un modèle global)
+OPTIM_ENGINE = os.environ.get("OPTIM_ENGINE", "periode")
+
 # --------------------------
 # FONCTIONS UTILES
 # --------------------------
@@ -61,6 +85,14 @@ def travel_time(coord1, coord2, speed_kmh=50):
     distance = haversine_distance(coord1, coord2)
     return int((distance / speed_kmh) * 60)
 
+def travel_time_matrix(coords, speed_kmh=50):
+    """
+    Calcule la matrice N×N des temps de trajet (en minutes entières) entre une liste de points.
+    Donne les mêmes entiers que travel_time appliqué à chaque paire.
+    """
+    distances = haversine_matrix(coords)
+    return ((distances / speed_kmh) * 60).astype(np.int64)
+
 def time_to_minutes(dt_obj):
     """Convertit une datetime en minutes depuis minuit."""
     return dt_obj.hour * 60 + dt_obj.minute
@@ -72,14 +104,127 @@ def minutes_to_time_str(day_date, minutes_from_midnight):
     scheduled = datetime.combine(day_date, datetime.min.time()) + timedelta(hours=hrs, minutes=mins)
     return scheduled.strftime("%Y-%m-%dT%H:%M:%SZ")
 
+def initial_routes(placements, num_vehicles):
+    """
+    Construit les tournées initiales à partir du planning actuel.
+
+    placements : liste de (début actuel, [nœuds des copies du RDV], [véhicules actuels autorisés]),
+                 la copie k étant affectée au k‑ième véhicule.
+    Retourne une liste de tournées (une par véhicule), chacune ordonnée par heure de début.
+    """
+    routes = [[] for _ in range(num_vehicles)]
+    for start, node_indices, vehicle_indices in placements:
+        for node_index, veh in zip(node_indices, vehicle_indices):
+            routes[veh].append((start, node_index))
+    return [[node_index for _, node_index in sorted(route)] for route in routes]
+
+def feasible_placements(placements, windows, service_times, max_slack, vehicle_ranges, breaks=None):
+    """
+    Placements du planning actuel qui forment des tournées compatibles avec la dimension temps,
+    en un seul passage par heure de début (sans appel au solveur).
+
+    windows[nœud] : intervalles (début au plus tôt, début au plus tard) du nœud.
+    service_times[nœud] : durée d'intervention ; max_slack : temps mort maximal entre deux nœuds.
+    vehicle_ranges[véhicule] : (départ au plus tôt, retour au plus tard) de la tournée.
+    breaks[véhicule] : intervalles (début, fin) qu'aucune intervention ne doit chevaucher.
+
+    Pour chaque véhicule, on tient l'intervalle des débuts possibles du dernier nœud conservé ;
+    un placement est gardé si chacune de ses copies peut suivre le dernier nœud de son véhicule
+    (les copies d'un RDV multi‑ressources partageant le même début).
+    """
+    last = {}  # véhicule -> (début au plus tôt, début au plus tard, durée) du dernier nœud conservé
+    kept = []
+    for placement in sorted(placements, key=lambda placement: placement[0]):
+        _, node_indices, vehicle_indices = placement
+        copies = list(zip(node_indices, vehicle_indices))
+        lower, upper = -math.inf, math.inf
+        for node, veh in copies:
+            if veh in last:
+                prev_lower, prev_upper, prev_service = last[veh]
+                lower = max(lower, prev_lower + prev_service)
+                upper = min(upper, prev_upper + prev_service + max_slack)
+            else:
+                lower = max(lower, vehicle_ranges[veh][0])
+                upper = min(upper, vehicle_ranges[veh][1] + max_slack)
+        node, service = node_indices[0], service_times[node_indices[0]]
+        # Première fenêtre du nœud accessible
+        reachable = next(((max(lower, w_lower), min(upper, w_upper)) for w_lower, w_upper in sorted(windows[node])
+                          if max(lower, w_lower) <= min(upper, w_upper)), None)
+        if reachable is None:
+            continue
+        lower, upper = reachable
+        for _, veh in copies:
+            for break_start, break_end in (breaks or {}).get(veh, ()):
+                # Débuts interdits : ]break_start - service, break_end[
+                if break_start - service < lower < break_end:
+                    lower = break_end
+                elif break_start - service < upper < break_end:
+                    upper = break_start - service
+        if lower > upper or any(lower + service > vehicle_ranges[veh][1] for _, veh in copies):
+            continue
+        for _, veh in copies:
+            last[veh] = (lower, upper, service)
+        kept.append(placement)
+    return kept
+
+def warm_start_assignment(routing, placements, num_vehicles, route_limits=None):
+    """
+    Affectation initiale du solveur reprenant le planning actuel (ReadAssignmentFromRoutes).
+
+    Si le planning complet n'est pas une solution valide du modèle (chevauchements, temps mort
+    trop long...), les RDV qui rendent les tournées invalides sont écartés en un seul passage
+    (feasible_placements, avec route_limits) puis le reste est validé une fois ; à défaut, la
+    validation est retentée sans les RDV multi‑ressources (synchronisation). Retourne None si
+    rien n'est réutilisable.
+    """
+    placements = sorted(placements, key=lambda placement: placement[0])
+    assignment = routing.ReadAssignmentFromRoutes(initial_routes(placements, num_vehicles), True)
+    if assignment is not None or route_limits is None:
+        return assignment
+    kept = feasible_placements(placements, **route_limits)
+    for candidate in (kept, [placement for placement in kept if len(placement[1]) == 1]):
+        if candidate:
+            assignment = routing.ReadAssignmentFromRoutes(initial_routes(candidate, num_vehicles), True)
+            if assignment is not None:
+                return assignment
+    return None
+
+def solve_routing(routing, search_parameters, placements, num_vehicles, route_limits=None):
+    """
+    Résout le modèle ; avec WARM_START, la recherche part du planning DISC actuel
+    (SolveFromAssignmentWithParameters) au lieu de PATH_CHEAPEST_ARC.
+    route_limits : contraintes de la dimension temps, pour écarter les RDV du planning actuel
+                   qui la violent (voir feasible_placements).
+    La reprise du planning est décomptée du temps de recherche (search_parameters.time_limit),
+    qui reste ainsi dans le budget et l'échéance de la requête.
+    """
+    if WARM_START and placements:
+        warm_start = time.perf_counter()
+        routing.CloseModelWithParameters(search_parameters)
+        initial = warm_start_assignment(routing, placements, num_vehicles, route_limits)
+        elapsed_ms = int((time.perf_counter() - warm_start) * 1000)
+        remaining_ms = search_parameters.time_limit.ToMilliseconds() - elapsed_ms
+        search_parameters.time_limit.FromMilliseconds(max(remaining_ms, 1))
+        if initial is not None:
+            solution = routing.SolveFromAssignmentWithParameters(initial, search_parameters)
+            if solution:
+                return solution
+    return routing.SolveWithParameters(search_parameters)
+
 # --------------------------
 # OPTIMISATION D'UNE PÉRIODE (matin ou après‑midi)
 # --------------------------
-def optimize_period_routing(appointments, day_date, period_start, period_end, vehicles):
+def optimize_period_routing(appointments, day_date, period_start, period_end, vehicles, horizon=None, deadline=None,
+                            stats=None):
     """
     Optimise une liste de rendez‑vous pour une période donnée (période = [period_start, period_end] en minutes depuis minuit)
     sur une journée donnée (day_date, objet datetime.date).
     vehicles : liste de noms d'employés (chaque véhicule correspond à un employé)
+    horizon : HorizonTravelTimes de l'horizon ; si fourni, la matrice de temps en est extraite
+              au lieu d'être recalculée.
+    deadline : échéance absolue (time.time()) de la requête, partagée par toutes les périodes.
+    stats : dictionnaire complété (si fourni) avec la taille du modèle, les durées de construction
+            et de résolution, le budget, l'objectif et le nombre de nœuds abandonnés.
     
     Retourne un dictionnaire:
       { appointment_id: { "scheduled_start": minutes_from_midnight absolu,
@@ -91,6 +236,11 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
     avec la fenêtre souhaitée par le client (date_debut_client, date_fin_client).
     Si l'une des dates client est nulle, on utilise par défaut la borne de la période.
     """
+    build_start = time.perf_counter()
+    if stats is None:
+        stats = {}
+    stats.update({"moteur": "periode", "jour": day_date.isoformat(), "debut": period_start, "fin": period_end,
+                  "noeuds": 0, "vehicules": len(vehicles)})
     period_duration = period_end - period_start
     nodes = []
     node_metadata = {}  # mapping: global_node_index -> (appointment_id, copy_index)
@@ -103,35 +253,38 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
         "allowed_vehicles": list(range(len(vehicles))),
         "appointment_id": None,
         "copy_index": None,
-        "is_depot": True
+        "is_depot": True,
+        "site": 0
     }
     nodes.append(depot_node)
+    # Coordonnées distinctes (une par rendez‑vous) : les copies d'un RDV multi‑ressources partagent la même ligne
+    sites = [DEPOT_COORDINATES]
     multi_resource_groups = defaultdict(list)
+    # Planning actuel (date_debut_rdv, affectation_ressources) compatible avec la période
+    placements = []
+    
+    appointments = [as_appointment(rdv) for rdv in appointments]
+    vehicle_set = set(vehicles)
     
     for rdv in appointments:
-        # Récupérer les dates client en gérant le cas null
-        client_start_str = rdv.get("date_debut_client")
-        client_end_str = rdv.get("date_fin_client")
-        client_start_dt = to_datetime(client_start_str) if client_start_str else None
-        client_end_dt = to_datetime(client_end_str) if client_end_str else None
-        # Si la date de fin client est définie, on soustrait 1 minute pour la fenêtre
-        if client_end_dt:
-            client_end_dt = client_end_dt - timedelta(minutes=1)
+        # Dates client pré‑parsées (la fin de fenêtre client est déjà diminuée d'1 minute)
+        client_start_dt = rdv.client_start
+        client_end_dt = rdv.client_end_window
         
         # Vérifier que le jour courant est dans la fenêtre client si les deux dates sont définies
         if client_start_dt and client_end_dt:
-            if not (client_start_dt.date() <= day_date <= client_end_dt.date()):
+            if not (rdv.client_start_date <= day_date <= rdv.client_end_window_date):
                 continue
 
         # Détermination de la borne inférieure
-        if client_start_dt and client_start_dt.date() == day_date:
-            desired_lower = time_to_minutes(client_start_dt)
+        if client_start_dt and rdv.client_start_date == day_date:
+            desired_lower = rdv.client_start_minutes
         else:
             desired_lower = period_start  # pas de contrainte basse
 
         # Détermination de la borne supérieure
-        if client_end_dt and client_end_dt.date() == day_date:
-            desired_upper = time_to_minutes(client_end_dt)
+        if client_end_dt and rdv.client_end_window_date == day_date:
+            desired_upper = rdv.client_end_window_minutes
         else:
             desired_upper = period_end  # pas de contrainte haute
 
@@ -142,7 +295,7 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
             continue
 
         # Pour un rendez‑vous non modifiable, fixer une fenêtre très étroite
-        if rdv["modifiable"] == 0:
+        if rdv.modifiable == 0:
             tw_lower = lower_bound - period_start
             tw_upper = tw_lower + 1  # fenêtre d'une minute
         else:
@@ -150,32 +303,33 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
             tw_upper = upper_bound - period_start
 
         # Traitement des coordonnées
-        try:
-            coord = parse_gps(rdv["coordonnees_gps"])
-        except Exception as e:
-            print(f"Erreur lors du parsing des coordonnées pour rdv id {rdv['id_rdv']}: {e}")
+        coord = rdv.coord
+        if coord is None:
+            logger.warning("Erreur lors du parsing des coordonnées pour rdv id %s : %s",
+                           rdv.id_rdv, rdv.coord_error)
             continue
         
         # Vérification de la durée
-        if not rdv.get("duree"):
-            print(f"⚠️ Le rendez-vous {rdv['id_rdv']} n'a pas de durée définie. Il sera ignoré.")
+        if not rdv.duree:
+            logger.warning("Le rendez-vous %s n'a pas de durée définie, il sera ignoré",
+                           rdv.id_rdv)
             continue
-        service_time = int(rdv["duree"])
+        service_time = rdv.duree
         
         # Déterminer les véhicules autorisés
-        if rdv["modifiable"] == 0:
+        if rdv.modifiable == 0:
             # Pour les rendez-vous non modifiables, s'assurer que la ressource est un poseur
-            allowed = [res for res in rdv["affectation_ressources"] if res in vehicles]
+            allowed = [res for res in rdv.ressources if res in vehicle_set]
             # Si aucune ressource n'est un poseur valide, ignorer ce rendez-vous
             if not allowed:
-                print(f"⚠️ Le rendez-vous non modifiable {rdv['id_rdv']} n'a pas de poseurs valides, il sera ignoré.")
+                logger.warning("Le rendez-vous non modifiable %s n'a pas de poseurs valides, il sera ignoré", rdv.id_rdv)
                 continue
         else:
             # Ne considérer que les ressources qui sont des "poseurs"
-            allowed = [res for res in rdv["affectation_ressources"] if res in vehicles]
+            allowed = [res for res in rdv.ressources if res in vehicle_set]
             # Si aucune ressource n'est disponible, ignorer ce rendez-vous
             if not allowed:
-                print(f"⚠️ Le rendez-vous {rdv['id_rdv']} n'a pas de poseurs valides parmi ses affectations, il sera ignoré.")
+                logger.warning("Le rendez-vous %s n'a pas de poseurs valides parmi ses affectations, il sera ignoré", rdv.id_rdv)
                 continue
                 
         # Vérification supplémentaire pour exclure explicitement Serge Haramboure
@@ -185,34 +339,47 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
         if not allowed_vehicle_indices:
             continue
         
-        nb_copies = rdv.get("nombre_ressources", 1)
+        site = len(sites)
+        sites.append(coord)
+        nb_copies = rdv.nombre_ressources
         for copy in range(nb_copies):
             node = {
                 "coord": coord,
                 "service_time": service_time,
                 "time_window": (tw_lower, tw_upper),
                 "allowed_vehicles": allowed_vehicle_indices,
-                "appointment_id": rdv["id_rdv"],
+                "appointment_id": rdv.id_rdv,
                 "copy_index": copy,
-                "is_depot": False
+                "is_depot": False,
+                "site": site
             }
             node_index = len(nodes)
             nodes.append(node)
-            node_metadata[node_index] = (rdv["id_rdv"], copy)
+            node_metadata[node_index] = (rdv.id_rdv, copy)
             if nb_copies > 1:
-                multi_resource_groups[rdv["id_rdv"]].append(node_index)
+                multi_resource_groups[rdv.id_rdv].append(node_index)
+
+        # Créneau actuel repris comme point de départ s'il respecte la fenêtre, la période et les poseurs
+        if rdv.rdv_start and rdv.rdv_start.date() == day_date:
+            current = time_to_minutes(rdv.rdv_start) - period_start
+            current_vehicles = [vehicles.index(res) for res in rdv.users_actuels
+                                if res in vehicle_set and vehicles.index(res) in allowed_vehicle_indices]
+            if (tw_lower <= current <= tw_upper and current + service_time <= period_duration
+                    and len(current_vehicles) >= nb_copies):
+                placements.append((current, list(range(len(nodes) - nb_copies, len(nodes))), current_vehicles))
     
+    stats["noeuds"] = len(nodes) - 1
     if len(nodes) <= 1:
         return {}
     
     # Construction de la matrice de temps entre tous les nœuds
-    num_nodes = len(nodes)
-    time_matrix = [[0] * num_nodes for _ in range(num_nodes)]
-    for i in range(num_nodes):
-        for j in range(num_nodes):
-            coord_i = nodes[i]["coord"] if not nodes[i].get("is_depot", False) else DEPOT_COORDINATES
-            coord_j = nodes[j]["coord"] if not nodes[j].get("is_depot", False) else DEPOT_COORDINATES
-            time_matrix[i][j] = travel_time(coord_i, coord_j)
+    # (calculée une seule fois par site, puis dupliquée pour les copies)
+    if horizon is not None:
+        site_matrix = horizon.submatrix(sites)
+    else:
+        site_matrix = travel_time_matrix(sites)
+    node_sites = np.array([node["site"] for node in nodes])
+    time_matrix = site_matrix[np.ix_(node_sites, node_sites)].tolist()
     
     data = {
         'time_matrix': time_matrix,
@@ -244,7 +411,7 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
     
     routing.AddDimension(
         time_callback_index,
-        30,  # slack
+        30,  # slack (repris dans route_limits)
         period_duration,  # capacité maximale
         False,  # cumul ne commence pas à 0 automatiquement
         "Time")
@@ -278,11 +445,28 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
     search_parameters = pywrapcp.DefaultRoutingSearchParameters()
     search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
     search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
-    search_parameters.time_limit.FromSeconds(TIME_LIMIT)
+    time_limit = solve_time_limit(len(nodes), len(vehicles), TIME_LIMIT, deadline)
+    if time_limit <= 0:
+        logger.warning("Échéance de la requête atteinte, période %s-%s du %s non optimisée", period_start, period_end, day_date)
+        stats["echeance_atteinte"] = True
+        return {}
+    search_parameters.time_limit.FromMilliseconds(int(time_limit * 1000))
+    stagnation = stop_on_stagnation(routing)
+    stats["budget"] = round(time_limit, 3)
+    stats["construction"] = round(time.perf_counter() - build_start, 4)
     
-    solution = routing.SolveWithParameters(search_parameters)
+    solve_start = time.perf_counter()
+    route_limits = {
+        "windows": [[window] for window in data['time_windows']],
+        "service_times": data['service_times'],
+        "max_slack": 30,
+        "vehicle_ranges": [(0, period_duration)] * len(vehicles),
+    }
+    solution = solve_routing(routing, search_parameters, placements, len(vehicles), route_limits)
+    stats["resolution"] = round(time.perf_counter() - solve_start, 4)
+    stats["solutions"] = stagnation["solutions"]
     if not solution:
-        print(f"Aucune solution trouvée pour la période {period_start}-{period_end} le {day_date}")
+        logger.warning("Aucune solution trouvée pour la période %s-%s le %s", period_start, period_end, day_date)
         return {}
     
     result = defaultdict(lambda: {"scheduled_start": None, "assigned_resources": set()})
@@ -301,14 +485,17 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
                 result[rdv_id]["scheduled_start"] = scheduled_absolute
             index = solution.Value(routing.NextVar(index))
     
+    stats["objectif"] = solution.ObjectiveValue()
+    stats["abandons"] = len(nodes) - 1 - len(visited_nodes)
+
     for rdv_id in result:
         result[rdv_id]["assigned_resources"] = list(result[rdv_id]["assigned_resources"])
     
     # Limiter le nombre de ressources assignées au nombre requis
     for rdv in appointments:
-        rid = rdv["id_rdv"]
+        rid = rdv.id_rdv
         if rid in result:
-            required = int(rdv.get("nombre_ressources", 1))
+            required = rdv.nombre_ressources
             if len(result[rid]["assigned_resources"]) > required:
                 result[rid]["assigned_resources"] = result[rid]["assigned_resources"][:required]
     
@@ -318,26 +505,79 @@ def optimize_period_routing(appointments, day_date, period_start, period_end, ve
         if not all_visited and rdv_id in result:
             del result[rdv_id]
     
-    return result
+    return dict(result)
+
+def solve_period(appointments, day_date, period_start, period_end, vehicles, horizon=None, deadline=None):
+    """optimize_period_routing renvoyant aussi ses statistiques (utilisable dans un processus séparé)."""
+    stats = {}
+    result = optimize_period_routing(appointments, day_date, period_start, period_end, vehicles,
+                                     horizon, deadline, stats)
+    return result, stats
 
 # --------------------------
 # OPTIMISATION SUR L'HORIZON (PLUSIEURS JOURS)
 # --------------------------
-def optimize_schedule(appointments, nb_days):
+def apply_period_result(eligible_rdvs, day, result, updated_rdvs, rdvs_by_id):
+    """
+    Reporte le résultat d'une période sur les rendez‑vous éligibles (enregistrements Appointment)
+    et enregistre dans updated_rdvs les dictionnaires dont le créneau ou l'affectation a changé.
+    """
+    for appt in eligible_rdvs:
+        rid = appt.id_rdv
+        if rid in result:
+            rdv = rdvs_by_id[rid]
+            scheduled_start = result[rid]["scheduled_start"]  # minutes depuis minuit
+            new_date_debut_rdv = minutes_to_time_str(day, scheduled_start)
+            new_date_fin_rdv = minutes_to_time_str(day, scheduled_start + appt.duree)
+            new_affectation = result[rid]["assigned_resources"]
+            # Comparaison sur l'instant (le tri produit "+00:00", minutes_to_time_str produit "Z")
+            if (not same_instant(rdv.get("date_debut_rdv"), new_date_debut_rdv) or
+                not same_instant(rdv.get("date_fin_rdv"), new_date_fin_rdv) or
+                set(rdv["affectation_ressources"]) != set(new_affectation)):
+                rdv["date_debut_rdv"] = new_date_debut_rdv
+                rdv["date_fin_rdv"] = new_date_fin_rdv
+                rdv["affectation_ressources"] = new_affectation
+                appt.ressources = tuple(new_affectation)
+                updated_rdvs[rid] = rdv
+
+def optimize_schedule(appointments, nb_days, poseurs=None, solve_workers=None, engine=None, deadline=None,
+                      report=None):
     """
     Optimise le planning sur nb_days jours (du jour courant jusqu'à aujourd'hui + nb_days),
     en considérant uniquement les jours travaillés (lundi à vendredi).
 
     appointments : liste de dictionnaires correspondant aux rendez‑vous.
+    poseurs : Roster des poseurs résolu une fois pour la requête (sinon lu depuis poseur_roster).
+    solve_workers : nombre de processus pour résoudre les périodes en parallèle
+                    (par défaut SOLVE_WORKERS ; 1 = résolution séquentielle).
+                    En séquentiel, les périodes sont enchaînées : chacune part des enregistrements
+                    mis à jour par les précédentes (un RDV replanifié garde ses nouveaux poseurs).
+                    En parallèle, les périodes sont indépendantes (données initiales) et un RDV
+                    est attribué à la première période (chronologique) qui l'a planifié : les deux
+                    modes peuvent donc donner des plannings différents.
+    engine : "periode" (un modèle OR‑Tools par demi‑journée) ou "horizon" (un modèle unique
+             pour tout l'horizon, voir optimisationTournee_global) ; par défaut OPTIM_ENGINE.
+    deadline : échéance absolue (time.time()) de la résolution ; par défaut maintenant
+               + REQUEST_DEADLINE_SECONDS.
+    report : RequestReport (telemetry) recevant les durées des sous‑étapes et les statistiques
+             de chaque modèle résolu.
     Retourne une liste (de dictionnaires JSON) contenant uniquement les rendez‑vous modifiés,
     avec mise à jour des champs "date_debut_rdv", "date_fin_rdv" et "affectation_ressources".
     """
+    if solve_workers is None:
+        solve_workers = SOLVE_WORKERS
+    if engine is None:
+        engine = OPTIM_ENGINE
+    if deadline is None:
+        deadline = request_deadline()
+    if report is None:
+        report = RequestReport("optimisation")
+
     # Construction de la liste globale des employés (uniquement les poseurs)
-    from Fonction1_Optimisation.optimisationTournee_tri import get_poseur_ids
-    
-    # Récupérer la liste des IDs de poseurs
-    poseurs = get_poseur_ids()
-    print(f"Liste des poseurs disponibles: {poseurs}")
+    if poseurs is None:
+        from Fonction1_Optimisation.optimisationTournee_tri import poseur_roster
+        poseurs = poseur_roster.get()
+    logger.debug("Liste des poseurs disponibles : %s", poseurs)
     
     # Liste des IDs d'utilisateurs spécifiquement exclus
     utilisateurs_exclus = []  # Ajouter ici les IDs à exclure si nécessaire
@@ -354,33 +594,36 @@ def optimize_schedule(appointments, nb_days):
     vehicles_set = {v for v in vehicles_set if "serge haramboure" not in str(v).lower()}
     
     vehicles = sorted(list(vehicles_set))
-    print(f"Véhicules disponibles pour l'optimisation: {vehicles}")
+    logger.info("Véhicules disponibles pour l'optimisation", extra={"nb_vehicules": len(vehicles)})
+    logger.debug("Véhicules : %s", vehicles)
     
     appointments_mod = deepcopy(appointments)
+    rdvs_by_id = {rdv["id_rdv"]: rdv for rdv in appointments_mod}
+    # Enregistrements typés construits une seule fois (dates, GPS et durée déjà convertis)
+    records = [as_appointment(rdv) for rdv in appointments_mod]
     updated_rdvs = {}
+
+    # Matrice des temps de trajet calculée une fois pour tous les sites de l'horizon
+    sites = [DEPOT_COORDINATES] + [appt.coord for appt in records if appt.coord is not None]
+    with report.stage("optimisation.matrice"):
+        horizon = HorizonTravelTimes(sites)
     
     # Pré‑traitement pour les rendez‑vous multi‑journée :
     # Si la durée dépasse la capacité journalière (420 minutes), on planifie sur plusieurs jours.
-    for rdv in appointments_mod:
-        if not rdv.get("duree"):
-            print(f"⚠️ Le rendez-vous {rdv.get('id_rdv')} n'a pas de durée définie. Il sera ignoré.")
+    today = datetime.now().date()
+    for appt in records:
+        if not appt.duree:
+            logger.warning("Le rendez-vous %s n'a pas de durée définie, il sera ignoré",
+                           appt.id_rdv)
             continue
-        duration = int(rdv["duree"])
+        duration = appt.duree
         if duration > DAILY_WORK_CAPACITY:
+            rdv = rdvs_by_id[appt.id_rdv]
             nb_required_days = math.ceil(duration / DAILY_WORK_CAPACITY)
             # Début de planification : utiliser le maximum entre aujourd'hui et date_debut_client si définie
-            client_start_str = rdv.get("date_debut_client")
-            if client_start_str:
-                client_start_date = to_datetime(client_start_str).date()
-            else:
-                client_start_date = datetime.now().date()
-            client_end_str = rdv.get("date_fin_client")
-            if client_end_str:
-                client_end_date = to_datetime(client_end_str).date()
-            else:
-                client_end_date = None  # pas de borne haute client
+            client_start_date = appt.client_start_date or today
             
-            current_date = max(datetime.now().date(), client_start_date)
+            current_date = max(today, client_start_date)
             scheduled_dates = []
             days_planned = 0
             while days_planned < nb_required_days:
@@ -394,76 +637,77 @@ def optimize_schedule(appointments, nb_days):
                 rdv["date_fin_rdv"] = minutes_to_time_str(scheduled_dates[-1], AFTERNOON_END)
             else:
                 rdv["date_fin_rdv"] = minutes_to_time_str(scheduled_dates[-1], MORNING_START + reste)
-            updated_rdvs[rdv["id_rdv"]] = rdv
-            rdv["skip_optim"] = True  # marquer pour ne pas réoptimiser
-        else:
-            rdv["skip_optim"] = False
-
-    # Optimisation sur l'horizon
-    days_processed = 0
-    day_offset = 0
-    current_date = datetime.now().date()
-    while days_processed < nb_days:
-        day = current_date + timedelta(days=day_offset)
-        day_offset += 1
-        if day.weekday() > 4:
-            continue  # ignorer week-end
-        
-        periods = [
-            ("morning", MORNING_START, MORNING_END),
-            ("afternoon", AFTERNOON_START, AFTERNOON_END)
-        ]
+            updated_rdvs[appt.id_rdv] = rdv
+            appt.skip_optim = True  # marquer pour ne pas réoptimiser
+
+    # Jours travaillés de l'horizon (lundi à vendredi)
+    horizon_days = []
+    day = today
+    while len(horizon_days) < nb_days:
+        if day.weekday() <= 4:
+            horizon_days.append(day)
+        day += timedelta(days=1)
+
+    # Index d'éligibilité construit une fois pour l'horizon, puis interrogé par (jour, période)
+    eligibility = EligibilityIndex(records, horizon_days)
+    if logger.isEnabledFor(logging.INFO):
+        logger.info("Charge par demi-journée (RDV éligibles)",
+                    extra={"charge": {f"{day} {period}": n for (day, period), n in eligibility.counts().items()}})
+
+    if engine == "horizon":
+        from Fonction1_Optimisation.optimisationTournee_global import optimize_horizon_routing
+        stats = {}
+        with report.stage("optimisation.resolution"):
+            result = optimize_horizon_routing(eligibility, vehicles, horizon, deadline=deadline, stats=stats)
+        report.add_period(stats)
+        results_by_day = defaultdict(dict)
+        for rid, res in result.items():
+            results_by_day[res["day"]][rid] = res
+        for appt in records:
+            if appt.id_rdv in result:
+                day = result[appt.id_rdv]["day"]
+                apply_period_result([appt], day, results_by_day[day], updated_rdvs, rdvs_by_id)
+        return list(updated_rdvs.values())
+
+    # Optimisation sur l'horizon : construction des problèmes (jour, période) à résoudre
+    periods = [
+        ("morning", MORNING_START, MORNING_END),
+        ("afternoon", AFTERNOON_START, AFTERNOON_END)
+    ]
+    period_tasks = []
+    for day in horizon_days:
         for period_name, p_start, p_end in periods:
-            eligible_rdvs = []
-            for rdv in appointments_mod:
-                if rdv.get("skip_optim", False):
-                    continue
-                # Vérifier la contrainte de fenêtre client si définie
-                client_start_str = rdv.get("date_debut_client")
-                client_end_str = rdv.get("date_fin_client")
-                if client_start_str:
-                    client_start_date = to_datetime(client_start_str).date()
-                else:
-                    client_start_date = None
-                if client_end_str:
-                    client_end_date = to_datetime(client_end_str).date()
-                else:
-                    client_end_date = None
-                # Si les deux sont définies, le jour doit être compris dans la fenêtre
-                if client_start_date and client_end_date:
-                    if not (client_start_date <= day <= client_end_date):
-                        continue
-
-                rdv_client_dt = to_datetime(rdv["date_debut_client"]) if rdv.get("date_debut_client") else None
-                # Si la date de début client est définie, déterminer la période
-                if rdv_client_dt:
-                    if period_name == "morning" and rdv_client_dt.hour < 12:
-                        eligible_rdvs.append(rdv)
-                    elif period_name == "afternoon" and rdv_client_dt.hour >= 14:
-                        eligible_rdvs.append(rdv)
-                    elif period_name == "morning" and 12 <= rdv_client_dt.hour < 14:
-                        eligible_rdvs.append(rdv)
-                else:
-                    # Si non défini, on considère le rendez‑vous éligible
-                    eligible_rdvs.append(rdv)
-            if not eligible_rdvs:
-                continue
-            result = optimize_period_routing(eligible_rdvs, day, p_start, p_end, vehicles)
-            for rdv in eligible_rdvs:
-                rid = rdv["id_rdv"]
-                if rid in result:
-                    scheduled_start = result[rid]["scheduled_start"]  # minutes depuis minuit
-                    new_date_debut_rdv = minutes_to_time_str(day, scheduled_start)
-                    new_date_fin_rdv = minutes_to_time_str(day, scheduled_start + int(rdv["duree"]))
-                    new_affectation = result[rid]["assigned_resources"]
-                    if (rdv.get("date_debut_rdv") != new_date_debut_rdv or
-                        rdv.get("date_fin_rdv") != new_date_fin_rdv or
-                        set(rdv["affectation_ressources"]) != set(new_affectation)):
-                        rdv["date_debut_rdv"] = new_date_debut_rdv
-                        rdv["date_fin_rdv"] = new_date_fin_rdv
-                        rdv["affectation_ressources"] = new_affectation
-                        updated_rdvs[rid] = rdv
-        days_processed += 1
+            eligible_rdvs = eligibility.eligible(day, period_name)
+            if eligible_rdvs:
+                period_tasks.append((day, eligible_rdvs, p_start, p_end))
+
+    with report.stage("optimisation.resolution"):
+        if solve_workers > 1 and len(period_tasks) > 1:
+            # Mode parallèle : chaque période est résolue indépendamment à partir des données initiales,
+            # puis un rendez‑vous est attribué à la première période (chronologique) qui l'a planifié.
+            # Chaque processus ne reçoit que la sous‑matrice des sites de sa période.
+            with ProcessPoolExecutor(max_workers=min(solve_workers, len(period_tasks))) as executor:
+                futures = [
+                    executor.submit(
+                        solve_period, eligible_rdvs, day, p_start, p_end, vehicles,
+                        horizon.restrict([DEPOT_COORDINATES] + [a.coord for a in eligible_rdvs if a.coord is not None]),
+                        deadline,
+                    )
+                    for day, eligible_rdvs, p_start, p_end in period_tasks
+                ]
+                claimed = set()
+                for (day, eligible_rdvs, _, _), future in zip(period_tasks, futures):
+                    result, stats = future.result()
+                    report.add_period(stats)
+                    result = {rid: res for rid, res in result.items() if rid not in claimed}
+                    claimed.update(result)
+                    apply_period_result(eligible_rdvs, day, result, updated_rdvs, rdvs_by_id)
+        else:
+            # Mode séquentiel : périodes enchaînées, chacune voit les résultats des précédentes
+            for day, eligible_rdvs, p_start, p_end in period_tasks:
+                result, stats = solve_period(eligible_rdvs, day, p_start, p_end, vehicles, horizon, deadline)
+                report.add_period(stats)
+                apply_period_result(eligible_rdvs, day, result, updated_rdvs, rdvs_by_id)
     return list(updated_rdvs.values())
 
 # --------------------------
@@ -0,0 +1,67 @@
+"""
+Politique de temps de résolution des modèles de tournées.
+
+Au lieu d'accorder TIME_LIMIT secondes à chaque période, le budget dépend de la taille du
+modèle (nœuds × véhicules), la recherche s'arrête lorsque la meilleure solution ne s'est pas
+améliorée depuis NO_IMPROVEMENT_SECONDS, et une échéance globale par requête /optimisation
+(REQUEST_DEADLINE_SECONDS) est partagée par toutes les périodes.
+"""
+
+import os
+import time
+
+# Budget minimal (secondes) d'un modèle, quelle que soit sa taille
+TIME_BUDGET_BASE = float(os.environ.get("TIME_BUDGET_BASE", 1.0))
+
+# Secondes supplémentaires par couple (nœud, véhicule) du modèle
+TIME_BUDGET_PER_NODE_VEHICLE = float(os.environ.get("TIME_BUDGET_PER_NODE_VEHICLE", 0.002))
+
+# Arrêt anticipé si la meilleure solution n'a pas progressé pendant cette durée (secondes)
+NO_IMPROVEMENT_SECONDS = float(os.environ.get("NO_IMPROVEMENT_SECONDS", 2.0))
+
+# Échéance globale (secondes) de la résolution d'une requête /optimisation
+REQUEST_DEADLINE_SECONDS = float(os.environ.get("REQUEST_DEADLINE_SECONDS", 300))
+
+
+def request_deadline(seconds=REQUEST_DEADLINE_SECONDS):
+    """Échéance absolue (horloge murale, transmissible aux processus de résolution)."""
+    return time.time() + seconds
+
+
+def solve_time_limit(nb_nodes, nb_vehicles, max_seconds, deadline=None):
+    """
+    Temps de résolution (secondes) d'un modèle de nb_nodes nœuds et nb_vehicles véhicules,
+    plafonné à max_seconds et au temps restant avant l'échéance de la requête (0 si dépassée).
+    """
+    budget = TIME_BUDGET_BASE + TIME_BUDGET_PER_NODE_VEHICLE * nb_nodes * max(nb_vehicles, 1)
+    budget = min(budget, max_seconds)
+    if deadline is not None:
+        budget = min(budget, deadline - time.time())
+    return max(budget, 0.0)
+
+
+def stop_on_stagnation(routing, window=NO_IMPROVEMENT_SECONDS):
+    """
+    Arrête la recherche du RoutingModel si le coût de la meilleure solution n'a pas baissé
+    depuis `window` secondes (jamais avant la première solution). À appeler avant la résolution.
+    Retourne l'état suivi (meilleur coût, nombre de solutions), conservé par l'appelant.
+    """
+    state = {"best": None, "last_improvement": None, "solutions": 0}
+
+    def on_solution():
+        cost = routing.CostVar().Value()
+        state["solutions"] += 1
+        if state["best"] is None or cost < state["best"]:
+            state["best"] = cost
+            state["last_improvement"] = time.monotonic()
+
+    def stagnating():
+        last = state["last_improvement"]
+        return last is not None and time.monotonic() - last > window
+
+    routing.AddAtSolutionCallback(on_solution)
+    # Les callbacks doivent rester référencés pendant toute la recherche
+    state["callbacks"] = (on_solution, stagnating)
+    state["limit"] = routing.solver().CustomLimit(stagnating)
+    routing.AddSearchMonitor(state["limit"])
+    return state
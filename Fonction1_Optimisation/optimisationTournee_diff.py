@@ -0,0 +1,99 @@
+"""
+Couche de comparaison canonique entre le planning calculé et l'état actuel du DISC.
+
+Les dates circulent sous plusieurs formats ("...Z" produit par minutes_to_time_str,
+"+00:00" produit par le tri, "+01:00" renvoyé par le DISC) et les ressources sous forme
+d'IDs, de dictionnaires ou d'IRI "/api/users/{id}". Avant de comparer, chaque champ du
+PATCH (users, daterv, datervfin) est normalisé, afin de n'écrire que les vrais changements.
+"""
+
+from utils import to_datetime
+
+# Champs envoyés au DISC lors de la mise à jour d'une intervention
+PATCH_FIELDS = ("users", "daterv", "datervfin")
+
+
+def canonical_users(users):
+    """Normalise une liste de ressources (IDs, dicts {"id": ...} ou IRI "/api/users/{id}") en frozenset d'IDs."""
+    ids = set()
+    for user in users or []:
+        if isinstance(user, dict):
+            user = user.get("id")
+        if isinstance(user, str):
+            user = user.rstrip("/").rsplit("/", 1)[-1]
+        if user is None or user == "":
+            continue
+        try:
+            ids.add(int(user))
+        except (TypeError, ValueError):
+            ids.add(user)
+    return frozenset(ids)
+
+
+def canonical_date(val):
+    """Normalise une date (chaîne ou datetime, quel que soit le fuseau) en chaîne ISO UTC à la seconde."""
+    dt = to_datetime(val) if val else None
+    if dt is None:
+        return None
+    return dt.replace(microsecond=0).strftime("%Y-%m-%dT%H:%M:%SZ")
+
+
+def canonical_payload(payload):
+    """Forme canonique d'un payload PATCH (ou de l'état DISC correspondant)."""
+    return {
+        "users": canonical_users(payload.get("users")),
+        "daterv": canonical_date(payload.get("daterv")),
+        "datervfin": canonical_date(payload.get("datervfin")),
+    }
+
+
+def build_payload(intervention):
+    """Construit le payload PATCH d'une intervention issue de l'optimisation."""
+    return {
+        "users": [f"/api/users/{resource}" for resource in intervention.get("affectation_ressources") or []],
+        "daterv": intervention.get("date_debut_rdv"),
+        "datervfin": intervention.get("date_fin_rdv")
+    }
+
+
+def diff_intervention(intervention):
+    """
+    Compare le payload prévu avec l'état DISC conservé par le tri (clé "etat_disc").
+
+    Retourne un dictionnaire {champ: {"avant": ..., "apres": ...}} des champs réellement modifiés
+    (vide si rien ne change). Sans état DISC connu, tous les champs sont considérés modifiés.
+    """
+    apres = canonical_payload(build_payload(intervention))
+    etat_disc = intervention.get("etat_disc")
+    avant = canonical_payload(etat_disc) if etat_disc is not None else dict.fromkeys(PATCH_FIELDS)
+    changes = {}
+    for field in PATCH_FIELDS:
+        if avant[field] != apres[field]:
+            changes[field] = {"avant": avant[field], "apres": apres[field]}
+    for change in changes.values():
+        for key in ("avant", "apres"):
+            if isinstance(change[key], frozenset):
+                change[key] = sorted(change[key], key=str)
+    return changes
+
+
+def plan_diff(interventions_list):
+    """
+    Sépare les interventions à écrire de celles identiques à l'état DISC.
+
+    Retourne (a_ecrire, rapport) où rapport liste, pour chaque intervention modifiée,
+    {"id": id_rdv, "changes": {...}}.
+    """
+    a_ecrire = []
+    rapport = []
+    for intervention in interventions_list:
+        changes = diff_intervention(intervention)
+        if changes:
+            a_ecrire.append(intervention)
+            rapport.append({"id": intervention.get("id_rdv"), "changes": changes})
+    return a_ecrire, rapport
+
+
+def same_instant(val1, val2):
+    """True si les deux dates désignent le même instant (formats et fuseaux confondus)."""
+    return canonical_date(val1) == canonical_date(val2)
@@ -0,0 +1,199 @@
+"""
+Cache des temps de trajet partagé entre les périodes, les jours et les requêtes.
+
+Les mêmes chantiers reviennent le matin et l'après‑midi de chaque jour de l'horizon :
+plutôt que de recalculer la matrice à chaque appel de optimize_period_routing, on construit
+une matrice unique pour l'horizon (indexée par site) dans laquelle chaque période découpe
+sa sous‑matrice. Les valeurs sont conservées dans un cache LRU de processus, indexé par
+site (coordonnées exactes), pour être réutilisées d'une requête /optimisation à l'autre.
+"""
+
+import math
+import os
+import threading
+from collections import OrderedDict
+
+import numpy as np
+from utils import haversine_pairs
+
+# Nombre maximal de paires (origine, destination) conservées dans le cache
+# (soit au plus sa racine carrée en sites ; davantage pendant une requête qui en demande plus)
+TRAVEL_CACHE_MAX_ENTRIES = int(os.environ.get("TRAVEL_CACHE_MAX_ENTRIES", 250000))
+
+# Vitesse moyenne utilisée pour convertir les distances en minutes (identique à travel_time)
+SPEED_KMH = 50
+
+
+def site_key(coord):
+    """
+    Clé de site : tuple (lat, lon) exact. Les temps du cache sont ainsi calculés sur les
+    coordonnées d'origine et égaux à ceux de travel_time_matrix pour les mêmes points.
+    """
+    return (float(coord[0]), float(coord[1]))
+
+
+def travel_times(origins, destinations, speed_kmh=SPEED_KMH):
+    """Temps de trajet (minutes entières) élément par élément entre deux tableaux de points."""
+    distances = haversine_pairs(origins, destinations)
+    return ((distances / speed_kmh) * 60).astype(np.int64)
+
+
+class TravelTimeCache:
+    """
+    Cache LRU borné des temps de trajet, indexé par site (coordonnées exactes).
+
+    Chaque site connu occupe un emplacement d'une matrice NumPy (−1 pour une paire non encore
+    calculée) : une requête découpe sa sous‑matrice par indexation et ne calcule que les paires
+    manquantes, en un seul appel vectorisé. Le nombre de sites est borné par la racine de
+    max_entries (nombre de paires) ; les sites les moins récemment demandés sont évincés, jamais
+    ceux de la requête en cours. Après éviction, la matrice est reconstruite à la taille des
+    sites conservés dès qu'elle en occupe moins du quart.
+
+    Les compteurs `hits` / `misses` portent sur les paires demandées et permettent de vérifier
+    l'efficacité du cache en charge (voir stats()).
+    """
+
+    def __init__(self, max_entries=TRAVEL_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self.max_sites = max(1, math.isqrt(max_entries))
+        self.hits = 0
+        self.misses = 0
+        self._slots = OrderedDict()   # site -> emplacement dans self._times (ordre LRU)
+        self._free = []               # emplacements libérés par éviction
+        self._times = np.full((0, 0), -1, dtype=np.int32)
+        self._lock = threading.Lock()
+
+    def _slot(self, key):
+        """Emplacement du site (créé si besoin) ; sous self._lock."""
+        slot = self._slots.get(key)
+        if slot is not None:
+            self._slots.move_to_end(key)
+            return slot
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot = len(self._slots)
+            if slot >= len(self._times):
+                size = max(64, 2 * len(self._times))
+                times = np.full((size, size), -1, dtype=np.int32)
+                times[:len(self._times), :len(self._times)] = self._times
+                self._times = times
+        self._slots[key] = slot
+        return slot
+
+    def _evict(self, keep):
+        """Évince les sites les plus anciens au‑delà de la capacité (au moins `keep` sites gardés)."""
+        while len(self._slots) > max(self.max_sites, keep):
+            _, slot = self._slots.popitem(last=False)
+            self._times[slot, :] = -1
+            self._times[:, slot] = -1
+            self._free.append(slot)
+        if len(self._times) > 64 and len(self._slots) < len(self._times) // 4:
+            self._compact()
+
+    def _compact(self):
+        """Reconstruit la matrice sur les seuls sites conservés (emplacements renumérotés) ; sous self._lock."""
+        old = np.fromiter(self._slots.values(), dtype=np.intp, count=len(self._slots))
+        size = max(64, 2 * len(old))
+        times = np.full((size, size), -1, dtype=np.int32)
+        times[:len(old), :len(old)] = self._times[np.ix_(old, old)]
+        self._times = times
+        self._slots = OrderedDict((key, slot) for slot, key in enumerate(self._slots))
+        self._free = []
+
+    def matrix(self, coords):
+        """
+        Retourne la matrice N×N (np.int64) des temps de trajet entre les points donnés.
+        Seules les paires absentes du cache sont calculées, en un seul appel vectorisé.
+        """
+        keys = [site_key(c) for c in coords]
+        n = len(keys)
+        with self._lock:
+            slots = np.fromiter((self._slot(key) for key in keys), dtype=np.intp, count=n)
+            distinct = len(set(keys))
+            block = self._times[np.ix_(slots, slots)].astype(np.int64)
+            missing_i, missing_j = np.nonzero(block < 0)
+            self.hits += n * n - len(missing_i)
+            self.misses += len(missing_i)
+
+            if len(missing_i):
+                points = np.asarray(keys, dtype=np.float64)
+                values = travel_times(points[missing_i], points[missing_j])
+                block[missing_i, missing_j] = values
+                self._times[slots[missing_i], slots[missing_j]] = values
+            self._evict(keep=distinct)
+        return block
+
+    def stats(self):
+        """Compteurs du cache (taille, capacité, succès, échecs, taux de succès)."""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": self._size(),
+                "max_entries": self.max_entries,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+            }
+
+    def _size(self):
+        """Nombre de paires calculées parmi les sites conservés ; sous self._lock."""
+        slots = np.fromiter(self._slots.values(), dtype=np.intp, count=len(self._slots))
+        return int(np.count_nonzero(self._times[np.ix_(slots, slots)] >= 0))
+
+    def clear(self):
+        """Vide le cache et remet les compteurs à zéro."""
+        with self._lock:
+            self._slots.clear()
+            self._free = []
+            self._times = np.full((0, 0), -1, dtype=np.int32)
+            self.hits = 0
+            self.misses = 0
+
+
+# Cache partagé par tout le processus
+travel_time_cache = TravelTimeCache()
+
+
+class HorizonTravelTimes:
+    """
+    Matrice des temps de trajet calculée une fois pour tout l'horizon d'optimisation,
+    indexée par site (coordonnées exactes). Chaque période en extrait sa sous‑matrice.
+    """
+
+    def __init__(self, coords, cache=None):
+        self.cache = travel_time_cache if cache is None else cache
+        self.index = {}
+        for coord in coords:
+            self.index.setdefault(site_key(coord), len(self.index))
+        self.matrix = self.cache.matrix(list(self.index))
+
+    def __getstate__(self):
+        # Le cache (et son verrou) reste propre à chaque processus : seule la matrice est transmise
+        return {"index": self.index, "matrix": self.matrix}
+
+    def __setstate__(self, state):
+        self.cache = travel_time_cache
+        self.index = state["index"]
+        self.matrix = state["matrix"]
+
+    def submatrix(self, coords):
+        """Sous‑matrice (np.int64) pour la liste de points donnée, dans l'ordre donné."""
+        keys = [site_key(c) for c in coords]
+        if any(key not in self.index for key in keys):
+            # Site inconnu de l'horizon : calcul direct via le cache
+            return self.cache.matrix(keys)
+        rows = np.array([self.index[key] for key in keys])
+        return self.matrix[np.ix_(rows, rows)]
+
+    def restrict(self, coords):
+        """
+        HorizonTravelTimes réduit aux points donnés (ex. les sites d'une période) : seule cette
+        sous‑matrice est sérialisée lorsqu'elle est transmise à un processus de résolution.
+        """
+        keys = list(dict.fromkeys(site_key(c) for c in coords))
+        restricted = HorizonTravelTimes.__new__(HorizonTravelTimes)
+        restricted.cache = self.cache
+        restricted.index = {key: k for k, key in enumerate(keys)}
+        restricted.matrix = self.submatrix(keys)
+        return restricted
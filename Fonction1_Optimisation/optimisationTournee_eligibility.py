@@ -0,0 +1,74 @@
+"""
+Index d'éligibilité des rendez‑vous par (jour, période).
+
+optimize_schedule parcourait tous les rendez‑vous pour chaque demi‑journée de l'horizon.
+EligibilityIndex est construit une seule fois par horizon : chaque fenêtre client
+[date_debut_client, date_fin_client] est placée par recherche dichotomique (bisect)
+sur la liste triée des jours travaillés de l'horizon. La requête
+eligible(jour, période) coûte alors O(log N + k) au lieu de O(N).
+"""
+
+import heapq
+from bisect import bisect_left, bisect_right
+
+PERIOD_NAMES = ("morning", "afternoon")
+
+
+def periods_of(appt):
+    """
+    Périodes dans lesquelles le rendez‑vous peut être placé, selon l'heure de date_debut_client :
+    avant 14h -> matin, à partir de 14h -> après‑midi, non définie -> les deux.
+    """
+    if appt.client_start:
+        return ("morning",) if appt.client_start.hour < 14 else ("afternoon",)
+    return PERIOD_NAMES
+
+
+class EligibilityIndex:
+    """
+    records : enregistrements Appointment (l'ordre d'origine est conservé dans les résultats).
+    days : jours travaillés de l'horizon (dates), dans l'ordre chronologique.
+
+    Les rendez‑vous marqués skip_optim sont exclus. Ceux sans fenêtre de dates complète
+    sont éligibles tous les jours de l'horizon.
+    """
+
+    def __init__(self, records, days):
+        self.days = list(days)
+        self._day_pos = {day: i for i, day in enumerate(self.days)}
+        # Rendez‑vous sans fenêtre de dates : [(rang d'origine, rdv)] par période
+        self._always = {period: [] for period in PERIOD_NAMES}
+        # Rendez‑vous avec fenêtre : listes par (position du jour, période), dans l'ordre d'origine
+        self._buckets = {(i, period): [] for i in range(len(self.days)) for period in PERIOD_NAMES}
+
+        for rank, appt in enumerate(records):
+            if appt.skip_optim:
+                continue
+            if appt.client_start_date and appt.client_end_date:
+                # Fenêtre rattachée aux jours [lo, hi[ de l'horizon (jours triés : recherche dichotomique)
+                lo = bisect_left(self.days, appt.client_start_date)
+                hi = bisect_right(self.days, appt.client_end_date, lo)
+                for i in range(lo, hi):
+                    for period in periods_of(appt):
+                        self._buckets[(i, period)].append((rank, appt))
+            else:
+                for period in periods_of(appt):
+                    self._always[period].append((rank, appt))
+
+    def eligible(self, day, period):
+        """Rendez‑vous éligibles pour le jour et la période donnés, dans l'ordre d'origine."""
+        pos = self._day_pos[day]
+        merged = heapq.merge(self._buckets[(pos, period)], self._always[period], key=lambda item: item[0])
+        return [appt for _, appt in merged]
+
+    def count(self, day, period):
+        """Nombre de rendez‑vous éligibles pour le jour et la période donnés."""
+        return len(self._buckets[(self._day_pos[day], period)]) + len(self._always[period])
+
+    def counts(self):
+        """Charge par demi‑journée : {(jour ISO, période): nombre de rendez‑vous éligibles}."""
+        return {
+            (day.isoformat(), period): self.count(day, period)
+            for day in self.days
+            for period in PERIOD_NAMES
+        }
@@ -0,0 +1,296 @@
+"""
+Moteur d'optimisation global : un seul modèle OR‑Tools pour tout l'horizon.
+
+Le moteur par période (optimize_period_routing) résout chaque demi‑journée séparément et
+un rendez‑vous est figé dans la première période qui l'accepte. Ici, un véhicule correspond
+à un couple (poseur, jour) : le solveur choisit à la fois le jour, la période, l'heure et les
+poseurs de chaque rendez‑vous. La pause de midi [MORNING_END, AFTERNOON_START[ est une pause
+(break) fixe de chaque véhicule, de sorte qu'aucune intervention ne la chevauche.
+
+Les conventions du moteur par période sont conservées : le temps de trajet entre dans le coût
+mais pas dans la dimension temps, les RDV non modifiables gardent une fenêtre d'une minute,
+et un RDV multi‑ressources n'est retenu que si toutes ses copies sont planifiées.
+"""
+
+import os
+import time
+from collections import defaultdict
+
+import numpy as np
+from ortools.constraint_solver import pywrapcp, routing_enums_pb2
+
+from Fonction1_Optimisation.optimisationTournee_algo import (
+    AFTERNOON_END,
+    AFTERNOON_START,
+    DEPOT_COORDINATES,
+    MORNING_END,
+    MORNING_START,
+    SKIP_PENALTY,
+    TIME_LIMIT,
+    solve_routing,
+    time_to_minutes,
+    travel_time_matrix,
+)
+from Fonction1_Optimisation.optimisationTournee_budget import solve_time_limit, stop_on_stagnation
+from Fonction1_Optimisation.optimisationTournee_eligibility import PERIOD_NAMES
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Plafond du temps de résolution (secondes) du modèle global ; par défaut TIME_LIMIT par demi‑journée de l'horizon
+GLOBAL_TIME_LIMIT = os.environ.get("GLOBAL_TIME_LIMIT")
+
+# Temps mort maximal entre deux interventions (30 min comme le moteur par période) + pause de midi
+MAX_IDLE = 30 + (AFTERNOON_START - MORNING_END)
+
+MINUTES_PER_DAY = 24 * 60
+
+PERIOD_BOUNDS = {
+    "morning": (MORNING_START, MORNING_END),
+    "afternoon": (AFTERNOON_START, AFTERNOON_END),
+}
+
+
+def rdv_windows(appt, day, day_offset, periods):
+    """
+    Fenêtres de début (minutes absolues depuis le premier jour de l'horizon) d'un rendez‑vous
+    pour un jour donné, calculées comme dans optimize_period_routing pour chaque période éligible.
+    """
+    if appt.client_start and appt.client_end_window:
+        if not (appt.client_start_date <= day <= appt.client_end_window_date):
+            return []
+    windows = []
+    for period in periods:
+        period_start, period_end = PERIOD_BOUNDS[period]
+        if appt.client_start and appt.client_start_date == day:
+            desired_lower = appt.client_start_minutes
+        else:
+            desired_lower = period_start
+        if appt.client_end_window and appt.client_end_window_date == day:
+            desired_upper = appt.client_end_window_minutes
+        else:
+            desired_upper = period_end
+        lower_bound = max(desired_lower, period_start)
+        upper_bound = min(desired_upper, period_end)
+        if lower_bound > upper_bound:
+            continue
+        if appt.modifiable == 0:
+            upper_bound = lower_bound + 1  # fenêtre d'une minute
+        windows.append((day_offset + lower_bound, day_offset + upper_bound))
+    return windows
+
+
+def optimize_horizon_routing(eligibility, vehicles, horizon=None, time_limit=None, deadline=None, stats=None):
+    """
+    Optimise tout l'horizon en un seul modèle.
+
+    eligibility : EligibilityIndex de l'horizon (jours travaillés et RDV éligibles par période).
+    vehicles : liste des poseurs ; un véhicule du modèle = (poseur, jour).
+    horizon : HorizonTravelTimes de l'horizon (sinon la matrice est calculée ici).
+    time_limit : plafond du temps de résolution en secondes (défaut : GLOBAL_TIME_LIMIT, sinon
+                 TIME_LIMIT × nombre de demi‑journées, soit le plafond total du moteur par période) ;
+                 le budget effectif dépend de la taille du modèle (voir solve_time_limit).
+    deadline : échéance absolue (time.time()) de la requête.
+    stats : dictionnaire complété (si fourni) comme dans optimize_period_routing.
+
+    Retourne { appointment_id: { "day": date, "scheduled_start": minutes depuis minuit,
+                                 "assigned_resources": [poseurs] } }.
+    """
+    build_start = time.perf_counter()
+    days = eligibility.days
+    if stats is None:
+        stats = {}
+    stats.update({"moteur": "horizon", "jour": days[0].isoformat() if days else None, "jours": len(days),
+                  "noeuds": 0, "vehicules": len(vehicles) * len(days)})
+    if time_limit is None:
+        time_limit = float(GLOBAL_TIME_LIMIT) if GLOBAL_TIME_LIMIT else TIME_LIMIT * len(days) * len(PERIOD_NAMES)
+
+    # Périodes éligibles de chaque RDV, par jour (d'après l'index d'éligibilité)
+    eligible_periods = defaultdict(lambda: defaultdict(list))  # id_rdv -> jour -> [périodes]
+    records = {}
+    for day in days:
+        for period in PERIOD_NAMES:
+            for appt in eligibility.eligible(day, period):
+                eligible_periods[appt.id_rdv][day].append(period)
+                records[appt.id_rdv] = appt
+
+    vehicle_keys = [(emp, d) for d in range(len(days)) for emp in vehicles]
+    vehicle_set = set(vehicles)
+
+    sites = [DEPOT_COORDINATES]
+    node_sites = [0]
+    service_times = [0]
+    node_windows = [None]
+    node_vehicles = [None]
+    node_metadata = {}
+    multi_resource_groups = defaultdict(list)
+    # Planning actuel repris comme point de départ du solveur (voir solve_routing)
+    placements = []
+    vehicle_of = {key: v for v, key in enumerate(vehicle_keys)}
+    day_index = {day: d for d, day in enumerate(days)}
+
+    for rid, periods_by_day in eligible_periods.items():
+        appt = records[rid]
+        if appt.coord is None:
+            logger.warning("Erreur lors du parsing des coordonnées pour rdv id %s : %s",
+                           rid, appt.coord_error)
+            continue
+        if not appt.duree:
+            logger.warning("Le rendez-vous %s n'a pas de durée définie, il sera ignoré", rid)
+            continue
+        allowed = [res for res in appt.ressources if res in vehicle_set]
+        allowed = [res for res in allowed if "serge haramboure" not in str(res).lower()]
+        if not allowed:
+            logger.warning("Le rendez-vous %s n'a pas de poseurs valides parmi ses affectations, il sera ignoré", rid)
+            continue
+
+        windows = []
+        allowed_vehicle_indices = []
+        for d, day in enumerate(days):
+            if day not in periods_by_day:
+                continue
+            day_windows = rdv_windows(appt, day, d * MINUTES_PER_DAY, periods_by_day[day])
+            if not day_windows:
+                continue
+            windows.extend(day_windows)
+            allowed_vehicle_indices.extend(
+                v for v, (emp, vd) in enumerate(vehicle_keys) if vd == d and emp in allowed
+            )
+        if not windows:
+            continue
+
+        site = len(sites)
+        sites.append(appt.coord)
+        for copy in range(appt.nombre_ressources):
+            node_index = len(node_sites)
+            node_sites.append(site)
+            service_times.append(appt.duree)
+            node_windows.append(windows)
+            node_vehicles.append(allowed_vehicle_indices)
+            node_metadata[node_index] = (rid, copy)
+            if appt.nombre_ressources > 1:
+                multi_resource_groups[rid].append(node_index)
+
+        current_day = appt.rdv_start.date() if appt.rdv_start else None
+        if current_day in day_index:
+            d = day_index[current_day]
+            current = d * MINUTES_PER_DAY + time_to_minutes(appt.rdv_start)
+            current_vehicles = [vehicle_of[(res, d)] for res in appt.users_actuels
+                                if (res, d) in vehicle_of and vehicle_of[(res, d)] in allowed_vehicle_indices]
+            if (any(lower <= current <= upper for lower, upper in windows)
+                    and len(current_vehicles) >= appt.nombre_ressources):
+                first_node = len(node_sites) - appt.nombre_ressources
+                placements.append((current, list(range(first_node, len(node_sites))), current_vehicles))
+
+    stats["noeuds"] = len(node_sites) - 1
+    if len(node_sites) <= 1 or not vehicle_keys:
+        return {}
+
+    site_matrix = horizon.submatrix(sites) if horizon is not None else travel_time_matrix(sites)
+    node_sites = np.array(node_sites)
+    time_matrix = site_matrix[np.ix_(node_sites, node_sites)].tolist()
+
+    manager = pywrapcp.RoutingIndexManager(len(time_matrix), len(vehicle_keys), 0)
+    routing = pywrapcp.RoutingModel(manager)
+
+    def cost_callback(from_index, to_index):
+        from_node = manager.IndexToNode(from_index)
+        to_node = manager.IndexToNode(to_index)
+        return time_matrix[from_node][to_node] + service_times[from_node]
+    routing.SetArcCostEvaluatorOfAllVehicles(routing.RegisterTransitCallback(cost_callback))
+
+    def time_callback(from_index, to_index):
+        return service_times[manager.IndexToNode(from_index)]
+    time_callback_index = routing.RegisterTransitCallback(time_callback)
+
+    routing.AddDimension(time_callback_index, MAX_IDLE, len(days) * MINUTES_PER_DAY, False, "Time")
+    time_dimension = routing.GetDimensionOrDie("Time")
+
+    # Fenêtres des RDV : plage globale, puis suppression des trous (nuits, périodes non éligibles)
+    for node_index in range(1, len(node_windows)):
+        index = manager.NodeToIndex(node_index)
+        windows = sorted(node_windows[node_index])
+        cumul = time_dimension.CumulVar(index)
+        cumul.SetRange(windows[0][0], windows[-1][1])
+        for (_, prev_upper), (next_lower, _) in zip(windows, windows[1:]):
+            if next_lower > prev_upper + 1:
+                cumul.RemoveInterval(prev_upper + 1, next_lower - 1)
+        routing.SetAllowedVehiclesForIndex(node_vehicles[node_index], index)
+
+    # Journée de chaque véhicule (poseur, jour) et pause de midi
+    solver = routing.solver()
+    node_visit_transits = [service_times[manager.IndexToNode(i)] for i in range(routing.Size())]
+    for v, (_, d) in enumerate(vehicle_keys):
+        day_offset = d * MINUTES_PER_DAY
+        for index in (routing.Start(v), routing.End(v)):
+            time_dimension.CumulVar(index).SetRange(day_offset + MORNING_START, day_offset + AFTERNOON_END)
+        lunch = solver.FixedDurationIntervalVar(
+            day_offset + MORNING_END, day_offset + MORNING_END,
+            AFTERNOON_START - MORNING_END, False, f"pause_{v}")
+        time_dimension.SetBreakIntervalsOfVehicle([lunch], v, node_visit_transits)
+
+    # Synchronisation des copies d'un RDV multi‑ressources
+    for node_indices in multi_resource_groups.values():
+        for n1, n2 in zip(node_indices, node_indices[1:]):
+            solver.Add(time_dimension.CumulVar(manager.NodeToIndex(n1)) ==
+                       time_dimension.CumulVar(manager.NodeToIndex(n2)))
+
+    for node_index in range(1, len(node_windows)):
+        routing.AddDisjunction([manager.NodeToIndex(node_index)], SKIP_PENALTY)
+
+    search_parameters = pywrapcp.DefaultRoutingSearchParameters()
+    search_parameters.first_solution_strategy = routing_enums_pb2.FirstSolutionStrategy.PATH_CHEAPEST_ARC
+    search_parameters.local_search_metaheuristic = routing_enums_pb2.LocalSearchMetaheuristic.GUIDED_LOCAL_SEARCH
+    budget = solve_time_limit(len(node_windows), len(vehicle_keys), time_limit, deadline)
+    if budget <= 0:
+        logger.warning("Échéance de la requête atteinte, horizon %s - %s non optimisé", days[0], days[-1])
+        stats["echeance_atteinte"] = True
+        return {}
+    search_parameters.time_limit.FromMilliseconds(int(budget * 1000))
+    stagnation = stop_on_stagnation(routing)
+    stats["budget"] = round(budget, 3)
+    stats["construction"] = round(time.perf_counter() - build_start, 4)
+
+    solve_start = time.perf_counter()
+    route_limits = {
+        "windows": node_windows,
+        "service_times": service_times,
+        "max_slack": MAX_IDLE,
+        "vehicle_ranges": [(d * MINUTES_PER_DAY + MORNING_START, d * MINUTES_PER_DAY + AFTERNOON_END)
+                           for _, d in vehicle_keys],
+        "breaks": {v: [(d * MINUTES_PER_DAY + MORNING_END, d * MINUTES_PER_DAY + AFTERNOON_START)]
+                   for v, (_, d) in enumerate(vehicle_keys)},
+    }
+    solution = solve_routing(routing, search_parameters, placements, len(vehicle_keys), route_limits)
+    stats["resolution"] = round(time.perf_counter() - solve_start, 4)
+    stats["solutions"] = stagnation["solutions"]
+    if not solution:
+        logger.warning("Aucune solution trouvée pour l'horizon %s - %s", days[0], days[-1])
+        return {}
+
+    result = defaultdict(lambda: {"day": None, "scheduled_start": None, "assigned_resources": set()})
+    visited_nodes = set()
+    for v, (emp, d) in enumerate(vehicle_keys):
+        index = solution.Value(routing.NextVar(routing.Start(v)))
+        while not routing.IsEnd(index):
+            node = manager.IndexToNode(index)
+            visited_nodes.add(node)
+            rid, _ = node_metadata[node]
+            result[rid]["day"] = days[d]
+            result[rid]["scheduled_start"] = solution.Value(time_dimension.CumulVar(index)) - d * MINUTES_PER_DAY
+            result[rid]["assigned_resources"].add(emp)
+            index = solution.Value(routing.NextVar(index))
+
+    stats["objectif"] = solution.ObjectiveValue()
+    stats["abandons"] = len(node_windows) - 1 - len(visited_nodes)
+
+    for rid in result:
+        # Limiter le nombre de ressources assignées au nombre requis
+        result[rid]["assigned_resources"] = list(result[rid]["assigned_resources"])[:records[rid].nombre_ressources]
+
+    # Supprimer les RDV multi‑ressources dont toutes les copies n'ont pas été visitées
+    for rid, node_indices in multi_resource_groups.items():
+        if rid in result and not all(n in visited_nodes for n in node_indices):
+            del result[rid]
+
+    return dict(result)
@@ -1,10 +1,20 @@
+import logging
 import os
 import requests
-from authentification import get_api_session 
+from concurrent.futures import ThreadPoolExecutor
+from disc_client import get_disc_client
+from Fonction1_Optimisation.optimisationTournee_diff import build_payload, plan_diff
+from logs import get_logger, sampler
+
+logger = get_logger(__name__)
 
 
 base_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
 
+# Nombre maximal de PATCH envoyés simultanément au DISC
+# (le pool de connexions et les nouvelles tentatives sur 429 / 5xx sont gérés par disc_client)
+PATCH_MAX_IN_FLIGHT = int(os.environ.get("PATCH_MAX_IN_FLIGHT", 8))
+
 
 def update_intervention(intervention, session):
     """
@@ -16,7 +26,7 @@ def update_intervention(intervention, session):
           * "affectation_ressources" : correspond au champ "users"
           * "date_debut" : correspond au champ "daterv" (format ISO 8601 attendu)
           * "date_fin" : correspond au champ "datervfin" (format ISO 8601 attendu)
-      - session : la session requests configurée pour l'API
+      - session : le client DISC (ou une session requests) configuré pour l'API
       
     Retour :
       - Le contenu JSON de la réponse API en cas de succès,
@@ -29,17 +39,10 @@ def update_intervention(intervention, session):
     
     url = f"{base_url}/api/rvinterventions/{intervention_id}"
     
-
-    users_for_patch = [f"/api/users/{resource}" for resource in intervention.get('affectation_ressources')]
-
-    payload = {
-        "users": users_for_patch,
-        "daterv": intervention.get("date_debut_rdv"),
-        "datervfin": intervention.get("date_fin_rdv")
-    }
+    payload = build_payload(intervention)
     
     headers = {"Content-Type": "application/merge-patch+json"}
-    print(url, payload, headers)
+    sampler.log(logger, logging.DEBUG, "majDISC.patch", "PATCH %s", url, payload=payload)
     try:
         response = session.patch(url, json=payload, headers=headers)
         response.raise_for_status()  # Génère une exception pour les codes d'erreur HTTP
@@ -47,22 +50,43 @@ def update_intervention(intervention, session):
     except requests.exceptions.RequestException as e:
         return {"error": str(e), "id": intervention_id}
 
-def update_interventions(interventions_list):
+def update_interventions_bulk(interventions_list, max_in_flight=PATCH_MAX_IN_FLIGHT, session=None):
+    """
+    Met à jour les interventions en parallèle (au plus max_in_flight PATCH en cours).
+
+    Retour :
+      - Une liste contenant la réponse de l'API pour chaque intervention, dans l'ordre
+        de interventions_list (même format que update_interventions).
+    """
+    if session is None:
+        session = get_disc_client()
+    if not interventions_list:
+        return []
+    workers = max(1, min(max_in_flight, len(interventions_list)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(lambda intervention: update_intervention(intervention, session), interventions_list))
+
+def update_interventions(interventions_list, dry_run=False):
     """
-    Itère sur une liste d'interventions et met à jour chacune d'elles via l'API.
+    Met à jour via l'API les interventions dont le payload diffère réellement de l'état DISC.
     
     Paramètres :
       - interventions_list (list) : liste de dictionnaires d'interventions
+      - dry_run (bool) : si True, aucun PATCH n'est envoyé et le diff prévu est retourné
       
     Retour :
-      - Une liste contenant la réponse de l'API pour chaque intervention.
+      - Une liste contenant la réponse de l'API pour chaque intervention modifiée,
+      - ou, en dry_run, la liste des changements prévus ({"id": ..., "changes": {...}}).
     """
-    session = get_api_session()
-    results = []
-    for intervention in interventions_list:
-        result = update_intervention(intervention, session)
-        results.append(result)
-    print(results)    
+    a_ecrire, rapport = plan_diff(interventions_list)
+    logger.info("%d intervention(s) à mettre à jour sur %d", len(a_ecrire), len(interventions_list),
+                extra={"a_ecrire": len(a_ecrire), "total": len(interventions_list), "dry_run": dry_run})
+    if dry_run:
+        return rapport
+    results = update_interventions_bulk(a_ecrire)
+    erreurs = sum(1 for res in results if isinstance(res, dict) and "error" in res)
+    logger.info("mise à jour DISC terminée", extra={"envoyes": len(results), "erreurs": erreurs})
+    logger.debug("réponses DISC %s", results)
     return results
 
 # Exemple d'utilisation
@@ -0,0 +1,91 @@
+"""
+Enregistrement typé d'un rendez‑vous, construit une seule fois après le tri.
+
+optimize_schedule et optimize_period_routing relisaient et reparsaient les mêmes chaînes
+(dates client, GPS, durée) pour chaque jour et chaque période de l'horizon. Appointment
+contient ces valeurs déjà converties : datetimes "aware" en UTC, durée entière,
+coordonnées (lat, lon), ressources en tuple et décalages en minutes depuis minuit.
+"""
+
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Optional
+
+from utils import to_datetime
+
+
+def _minutes(dt_obj):
+    """Minutes depuis minuit (même calcul que time_to_minutes)."""
+    return dt_obj.hour * 60 + dt_obj.minute
+
+
+@dataclass(slots=True)
+class Appointment:
+    id_rdv: object
+    modifiable: int
+    duree: int                                   # 0 si absente ou invalide
+    nombre_ressources: int
+    coord: Optional[tuple]                       # None si coordonnées illisibles (voir coord_error)
+    coord_error: Optional[str]
+    ressources: tuple                            # affectation_ressources courante
+    users_actuels: tuple                         # poseurs réellement affectés côté DISC (etat_disc["users"])
+    rdv_start: Optional[datetime]                # date_debut_rdv
+    rdv_end: Optional[datetime]                  # date_fin_rdv
+    client_start: Optional[datetime]             # date_debut_client
+    client_end: Optional[datetime]               # date_fin_client
+    client_end_window: Optional[datetime]        # date_fin_client - 1 minute (borne de fenêtre)
+    client_start_date: Optional[date]
+    client_end_date: Optional[date]
+    client_end_window_date: Optional[date]
+    client_start_minutes: Optional[int]
+    client_end_window_minutes: Optional[int]
+    skip_optim: bool = False
+
+    @classmethod
+    def from_rdv(cls, rdv):
+        """Construit l'enregistrement à partir d'un rendez‑vous issu de optimisationTournee_tri."""
+        # Import local : optimisationTournee_algo importe ce module
+        from Fonction1_Optimisation.optimisationTournee_algo import parse_gps
+        try:
+            coord, coord_error = parse_gps(rdv["coordonnees_gps"]), None
+        except Exception as e:
+            coord, coord_error = None, str(e)
+
+        try:
+            duree = int(rdv["duree"]) if rdv.get("duree") else 0
+        except (TypeError, ValueError):
+            duree = 0
+
+        # Pour un RDV modifiable, affectation_ressources liste les candidats : l'affectation réelle est dans etat_disc
+        etat_disc = rdv.get("etat_disc")
+        users_actuels = etat_disc.get("users") if etat_disc is not None else rdv.get("affectation_ressources")
+
+        client_start = to_datetime(rdv["date_debut_client"]) if rdv.get("date_debut_client") else None
+        client_end = to_datetime(rdv["date_fin_client"]) if rdv.get("date_fin_client") else None
+        client_end_window = client_end - timedelta(minutes=1) if client_end else None
+
+        return cls(
+            id_rdv=rdv["id_rdv"],
+            modifiable=rdv["modifiable"],
+            duree=duree,
+            nombre_ressources=int(rdv.get("nombre_ressources", 1)),
+            coord=coord,
+            coord_error=coord_error,
+            ressources=tuple(rdv.get("affectation_ressources") or ()),
+            users_actuels=tuple(users_actuels or ()),
+            rdv_start=to_datetime(rdv["date_debut_rdv"]) if rdv.get("date_debut_rdv") else None,
+            rdv_end=to_datetime(rdv["date_fin_rdv"]) if rdv.get("date_fin_rdv") else None,
+            client_start=client_start,
+            client_end=client_end,
+            client_end_window=client_end_window,
+            client_start_date=client_start.date() if client_start else None,
+            client_end_date=client_end.date() if client_end else None,
+            client_end_window_date=client_end_window.date() if client_end_window else None,
+            client_start_minutes=_minutes(client_start) if client_start else None,
+            client_end_window_minutes=_minutes(client_end_window) if client_end_window else None,
+        )
+
+
+def as_appointment(rdv):
+    """Retourne l'enregistrement tel quel, ou le construit à partir d'un dictionnaire."""
+    return rdv if isinstance(rdv, Appointment) else Appointment.from_rdv(rdv)
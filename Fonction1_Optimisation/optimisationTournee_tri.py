@@ -1,11 +1,17 @@
+import logging
 import os
 import requests
 from datetime import datetime, timedelta
 from dateutil.parser import parse
 
 
-from authentification import get_api_session 
+from disc_client import get_disc_client
 from utils import to_datetime
+from chantiers import resolve_chantiers_gps
+from roster import RosterProvider
+from logs import get_logger, sampler
+
+logger = get_logger(__name__)
 
 def is_workday(date_obj):
     """Retourne True si la date est un jour ouvré (lundi à vendredi)."""
@@ -26,6 +32,36 @@ def add_workdays(start_date, workdays):
 
 import requests
 
+def extraire_poseur_ids(types_users):
+    """
+    Extrait de la réponse /api/typeusers les IDs des users actifs du groupe "Poseur".
+    """
+    if not types_users:
+        logger.warning("L'API n'a retourné aucun type d'utilisateur")
+        return []
+    
+    poseurs = []
+    logger.debug("types_users %s", types_users)
+    for group in types_users:
+        # Vérifier précisément si le groupe est celui des poseurs
+        if group.get("nom", "").strip().lower() == "poseur" :
+            # Extraire les IDs de tous les users de ce groupe
+            for user in group.get("users", []):
+                user_id = user.get("id")
+                username = user.get("username", "").lower()
+                
+                # Vérifier que l'ID est valide et que l'utilisateur n'est pas "serge haramboure"
+                if user_id is not None and user_id != 39 and user.get("status") == 0:
+                    poseurs.append(user_id)
+            # Comme les types d'utilisateurs sont mutuellement exclusifs, on peut arrêter la recherche
+            break
+    
+    if not poseurs:
+        logger.warning("Aucun poseur n'a été trouvé dans l'API")
+    logger.info("poseurs chargés", extra={"nb_poseurs": len(poseurs)})
+    logger.debug("poseurs %s", poseurs)
+    return poseurs
+
 def get_poseur_ids():
     """
     Appelle l'API à l'URL spécifiée et récupère toutes les users du groupe "Poseur".
@@ -37,45 +73,22 @@ def get_poseur_ids():
     url = f"{base_url}{endpoint}"
 
     try:
-        # Obtenir la session API authentifiée
-        session = get_api_session()
+        # Obtenir le client API authentifié (reconnexion automatique si la session expire)
+        session = get_disc_client()
         # Faire la requête GET pour récupérer les rendez-vous
         response = session.get(url)
         response.raise_for_status()  # Gère les erreurs HTTP
 
-        types_users = response.json()
-        
-        if not types_users:
-            print("⚠️ L'API n'a retourné aucun type d'utilisateur !")
-            return []
-        
-        poseurs = []
-        print("types_users", types_users)
-        for group in types_users:
-            # Vérifier précisément si le groupe est celui des poseurs
-            if group.get("nom", "").strip().lower() == "poseur" :
-                # Extraire les IDs de tous les users de ce groupe
-                print("group", group)
-                for user in group.get("users", []):
-                    user_id = user.get("id")
-                    username = user.get("username", "").lower()
-                    
-                    # Vérifier que l'ID est valide et que l'utilisateur n'est pas "serge haramboure"
-                    if user_id is not None and user_id != 39 and user.get("status") == 0:
-                        print("user_id", user_id)
-                        poseurs.append(user_id)
-                # Comme les types d'utilisateurs sont mutuellement exclusifs, on peut arrêter la recherche
-                break
-        
-        if not poseurs:
-            print("⚠️ Aucun poseur n'a été trouvé dans l'API !")
-        print("poseurs", poseurs)
-        return poseurs
+        return extraire_poseur_ids(response.json())
     except requests.RequestException as e:
-        print(f"⚠️ Erreur lors de l'appel API pour récupérer les poseurs: {str(e)}")
+        logger.warning("Erreur lors de l'appel API pour récupérer les poseurs : %s", e)
         return []
 
 
+# Liste des poseurs partagée par toutes les requêtes (cache TTL, invalidable via poseur_roster.invalidate())
+poseur_roster = RosterProvider(get_poseur_ids)
+
+
 def get_gps(idChantier):
     """
     Appelle l'API à l'URL spécifiée et récupère toutes les users du groupe "Poseur".
@@ -86,8 +99,8 @@ def get_gps(idChantier):
     endpoint = "/api/chantiers/" + str(idChantier)  # Modifier si nécessaire
     url = f"{base_url}{endpoint}"
     try:
-        # Obtenir la session API authentifiée
-        session = get_api_session()
+        # Obtenir le client API authentifié (reconnexion automatique si la session expire)
+        session = get_disc_client()
         # Faire la requête GET pour récupérer les rendez-vous
         response = session.get(url)
         response.raise_for_status()  # Gère les erreurs HTTP
@@ -95,7 +108,7 @@ def get_gps(idChantier):
         chantier = response.json()
         
         if not chantier:
-            print("⚠️ L'API n'a retourné aucun rendez-vous !")
+            logger.warning("L'API n'a retourné aucun rendez-vous")
         
         gps=chantier.get("gps")
     
@@ -104,17 +117,22 @@ def get_gps(idChantier):
         return []
 
 
-def call_disc_api(date_start: datetime, date_end: datetime):
+def interventions_url(date_start: datetime, date_end: datetime):
+    """URL de /rvinterventions/by-dates pour la plage donnée."""
     date_start_call = date_start.strftime("%d/%m/%Y")
     date_end_call = date_end.strftime("%d/%m/%Y")
     base_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
     endpoint = f"/api/rvinterventions/by-dates?datestart={date_start_call}&dateend={date_end_call}"  # Modifier si nécessaire
-    url = f"{base_url}{endpoint}"
+    return f"{base_url}{endpoint}"
+
+
+def call_disc_api(date_start: datetime, date_end: datetime):
+    url = interventions_url(date_start, date_end)
 
 
     try:
-        # Obtenir la session API authentifiée
-        session = get_api_session()
+        # Obtenir le client API authentifié (reconnexion automatique si la session expire)
+        session = get_disc_client()
         # Faire la requête GET pour récupérer les rendez-vous
         response = session.get(url)
         response.raise_for_status()  # Gère les erreurs HTTP
@@ -122,18 +140,21 @@ def call_disc_api(date_start: datetime, date_end: datetime):
         interventions = response.json()
         
         if not interventions:
-            print("⚠️ L'API n'a retourné aucun rendez-vous !")
+            logger.warning("L'API n'a retourné aucun rendez-vous")
         return interventions
     except requests.RequestException as e:
         return []  # Retourne une liste vide en cas d'erreur
 
 
 
-def filter_and_transform_intervention(interv, opt_start, opt_end):
+def filter_and_transform_intervention(interv, opt_start, opt_end, gps_par_chantier=None, poseurs=None):
     """
     Applique le filtrage et la transformation sur une intervention issue de l'API DISC.
 
     opt_start, opt_end : la plage d'optimisation calculée (objet datetime)
+    gps_par_chantier : table {id_chantier: gps} préchargée (voir chantiers.resolve_chantiers_gps) ;
+                       si absente, le GPS est récupéré via l'API.
+    poseurs : Roster des poseurs résolu une fois par requête ; si absent, lu depuis poseur_roster.
 
     Retourne un dictionnaire structuré selon les spécifications ou None si le rendez-vous est exclu.
     """
@@ -153,16 +174,17 @@ def filter_and_transform_intervention(interv, opt_start, opt_end):
     else:
         modifiable = 1
         # Pour l'affectation des ressources, on utilisera uniquement les poseurs
-        poseurs = get_poseur_ids()
+        if poseurs is None:
+            poseurs = poseur_roster.get()
         # Filtrer les recommandations pour ne garder que les poseurs
         if interv.get("user_recommanded"):
             ressources = [user.get("id") for user in interv.get("user_recommanded", []) 
                          if user.get("id") in poseurs]
             # Si aucun poseur parmi les recommandations, prendre tous les poseurs
             if not ressources:
-                ressources = poseurs
+                ressources = list(poseurs)
         else:
-            ressources = poseurs
+            ressources = list(poseurs)
 
     # --- 2. Extraction des dates depuis l'API ---
     # Dates de rendez-vous (toujours issues de "daterv" et "datervfin")
@@ -215,20 +237,19 @@ def filter_and_transform_intervention(interv, opt_start, opt_end):
                     dateARC_val = datetime.now()
                 dateARC = to_datetime(dateARC_val)
                 if dateARC is None and statusrv not in ["proposé", "convenu"]:
-                    print(f"Erreur de conversion de dateARC pour l'intervention {interv.get('id')}.")
-                    print("sortie2")
+                    logger.warning("Erreur de conversion de dateARC pour l'intervention %s", interv.get('id'))
                     return None
                 # Pour comparer, on rend les datetime naïfs
                 dateARC_naive = dateARC.replace(tzinfo=None) if dateARC and dateARC.tzinfo else dateARC
                 opt_end_naive = opt_end.replace(tzinfo=None) if opt_end.tzinfo else opt_end
                 effective_start_naive = effective_start.replace(tzinfo=None) if effective_start.tzinfo else effective_start
                 if dateARC_naive > opt_end_naive and statusrv not in ["proposé", "convenu"]:
-                    print("sortie3")
+                    sampler.log(logger, logging.DEBUG, "tri.sortie3", "intervention %s écartée : ARC après l'horizon", interv.get('id'))
                     return None
                 if dateARC_naive > effective_start_naive and dateARC_naive <= opt_end_naive:
                     effective_start = dateARC
             else:
-                print("sortie4")
+                sampler.log(logger, logging.DEBUG, "tri.sortie4", "intervention %s écartée : marchandise non commandée", interv.get('id'))
                 return None
 
     # --- 7. Transformation de l'intervention dans le format de sortie ---
@@ -239,13 +260,17 @@ def filter_and_transform_intervention(interv, opt_start, opt_end):
 
     # --- 8. Filtre des rendez-vous non complétés ---
 
-    gps = get_gps(interv.get("chantier", {}).get("id"))
+    id_chantier = interv.get("chantier", {}).get("id")
+    if gps_par_chantier is not None and id_chantier in gps_par_chantier:
+        gps = gps_par_chantier[id_chantier]
+    else:
+        gps = get_gps(id_chantier)
     if not interv.get("nb_intervenants_mandatory"):
         nb_intervenants = 1
     else:
         nb_intervenants = interv.get("nb_intervenants_mandatory")
     if (not gps or not interv.get("duree")) and statusrv not in ["proposé", "convenu"]:
-        print("sortie5")
+        sampler.log(logger, logging.DEBUG, "tri.sortie5", "intervention %s écartée : GPS ou durée manquant", interv.get('id'))
         return None
 
     output = {
@@ -258,17 +283,24 @@ def filter_and_transform_intervention(interv, opt_start, opt_end):
         "date_debut_rdv": final_date_debut_rdv,
         "date_fin_rdv": final_date_fin_rdv,
         "date_debut_client": final_date_debut_client,
-        "date_fin_client": final_date_fin_client
+        "date_fin_client": final_date_fin_client,
+        # État actuel côté DISC, pour n'écrire que les vrais changements (voir optimisationTournee_diff)
+        "etat_disc": {
+            "users": [user.get("id") for user in interv.get("users", [])],
+            "daterv": rdv_date_debut_val,
+            "datervfin": rdv_date_fin_val
+        }
     }
     return output
 
 
-def optimisationTournee_tri(data):
+def optimisationTournee_tri(data, poseurs=None):
     """
     Fonction de tri pour l'optimisation de la tournée.
     
     Paramètre d'entrée (data) :
       - Un dictionnaire contenant au moins le champ "nbJours" (nombre de jours ouvrés à optimiser).
+    poseurs : Roster des poseurs résolu une fois pour la requête (sinon lu depuis poseur_roster).
     
     Étapes :
       1. Calcul de la plage d'optimisation :
@@ -299,18 +331,22 @@ def optimisationTournee_tri(data):
     # Calculer la date de fin en ajoutant nb_jours ouvrés
     opt_end = add_workdays(opt_start, nb_jours)
 
+    if poseurs is None:
+        poseurs = poseur_roster.get()
+
     # 2. Appel à l'API du DISC
 
     jours_interventions = call_disc_api(opt_start, opt_end)
-    
 
+    # 2b. Résolution des GPS chantiers en un seul lot (au lieu d'un appel par intervention)
+    gps_par_chantier = resolve_chantiers_gps(jours_interventions, get_gps)
 
     # 3. Filtrage et transformation
     unique_interventions = {}
     for jour in jours_interventions:
         rvs = jour.get("rvs", [])
         for interv in rvs:
-            transformed = filter_and_transform_intervention(interv, opt_start, opt_end)
+            transformed = filter_and_transform_intervention(interv, opt_start, opt_end, gps_par_chantier, poseurs)
             if transformed:
              unique_interventions[transformed["id_rdv"]] = transformed
     return list(unique_interventions.values())
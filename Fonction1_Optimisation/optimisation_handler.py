@@ -1,25 +1,51 @@
 # optimisation_handler.py
-from Fonction1_Optimisation.optimisationTournee_tri import optimisationTournee_tri
+import os
+import asyncio
+from Fonction1_Optimisation.optimisationTournee_tri import optimisationTournee_tri, poseur_roster
 from Fonction1_Optimisation.optimisationTournee_algo import optimize_schedule
 from Fonction1_Optimisation.optimisationTournee_majDISC import update_interventions
+from telemetry import RequestReport
+from logs import get_logger
 
-def run_optimisation(data):
+# "async" : acquisition des données DISC en parallèle (voir acquisition_async), "sync" sinon
+ACQUISITION_MODE = os.environ.get("ACQUISITION_MODE", "sync")
+
+logger = get_logger(__name__)
+
+def run_optimisation(data, report=None):
     """
     Réalise l'optimisation en deux étapes :
       1. Trie les informations via la fonction `optimisationTournee_tri` (définie dans optimisationTournee_tr.py).
       2. Utilise le résultat du tri en tant que paramètre pour `optimisationTournee_algo` (définie dans optimisationTournee_algo.py).
     
     :param data: Les données d'entrée (par exemple, un dictionnaire contenant les informations nécessaires).
+    :param report: RequestReport recevant la durée de chaque étape (créé si absent).
     :return: Le résultat final de l'optimisation.
     """
+    if report is None:
+        report = RequestReport("optimisation")
     # Étape 1 : Tri des données
-    print("lancement tri")
-    sorted_data = optimisationTournee_tri(data)
+    logger.info("lancement tri")
+    with report.stage("tri"):
+        if ACQUISITION_MODE == "async":
+            from acquisition_async import optimisationTournee_tri_async
+            sorted_data = asyncio.run(optimisationTournee_tri_async(data))
+            # La liste des poseurs vient d'être chargée en parallèle (ou était en cache)
+            poseurs = poseur_roster.get()
+        else:
+            # Liste des poseurs résolue une seule fois pour toute la requête
+            poseurs = poseur_roster.get()
+            sorted_data = optimisationTournee_tri(data, poseurs)
     # Étape 2 : Application de l'algorithme d'optimisation sur les données triées
-    print("lancement optimize")
     nb_days = data.get("nbJours")
-    print("avant opt",sorted_data)
-    result = optimize_schedule(sorted_data, nb_days)
-    print("apres opt",result)
-    maj_DISC = update_interventions(result)
+    logger.info("lancement optimize", extra={"nb_rdv": len(sorted_data), "nb_jours": nb_days})
+    logger.debug("avant opt %s", sorted_data)
+    with report.stage("optimisation"):
+        result = optimize_schedule(sorted_data, nb_days, poseurs, data.get("solveWorkers"), data.get("moteur"),
+                                   report=report)
+    logger.info("optimisation terminée", extra={"nb_modifies": len(result)})
+    logger.debug("apres opt %s", result)
+    # Étape 3 : écriture des seuls changements réels (ou simple rapport en dryRun)
+    with report.stage("maj_disc"):
+        maj_DISC = update_interventions(result, dry_run=data.get("dryRun", False))
     return maj_DISC
@@ -1,5 +1,10 @@
+import logging
 from datetime import datetime
 from utils import to_datetime, haversine_distance
+from logs import get_logger, sampler
+from Fonction2_nvAffectation.nvAffectation_intervals import ResourceIntervalIndex
+
+logger = get_logger(__name__)
 
 def reaffecter_rdv(data):
     """
@@ -24,29 +29,25 @@ def reaffecter_rdv(data):
     # -- 2) Séparer les RDV absents (qui incluent la personne_absente) et les autres --
     rdv_absent = []
     rdv_autres = []
-    print("list",liste_rdv)
+    logger.debug("liste des rdv %s", liste_rdv)
     for rdv in liste_rdv:
         # Si la personne absente apparaît dans "affectation_ressources_defini"
         # => on considère ce RDV comme "rdv_absent"
         if personne_absente in rdv.get("affectation_ressources_defini", []):
-            print("abs",rdv)
             rdv_absent.append(rdv)
         else:
-            print("autre",rdv)
             rdv_autres.append(rdv)
     
+    logger.info("rdv à réaffecter", extra={"employe": personne_absente, "absents": len(rdv_absent),
+                                           "autres": len(rdv_autres)})
+
     # -- Pour éviter de dupliquer dans la liste finale, on garde un set des ID modifiés --
     changed_rdvs = {}
 
-    # Helper pour vérifier le chevauchement de dates
-    def chevauchement(r1, r2):
-        """
-        Retourne True si r1 et r2 se chevauchent (au moins partiellement).
-        """
-        debut1, fin1 = r1["date_debut"], r1["date_fin"]
-        debut2, fin2 = r2["date_debut"], r2["date_fin"]
-        return (debut1 < fin2) and (debut2 < fin1)
-    
+    # Créneaux occupés par ressource (rdv_autres), construits une seule fois ;
+    # tenus à jour au fil des annulations et des réaffectations
+    occupation = ResourceIntervalIndex(rdv_autres)
+
     # Helper pour extraire lat, lon
     def get_lat_lon(rdv):
         lat_str, lon_str = rdv["coordonnees_gps"].split(",")
@@ -56,7 +57,6 @@ def reaffecter_rdv(data):
     for rdv_a in rdv_absent:
         # On retire la ressource absente
         old_defini = rdv_a.get("affectation_ressources_defini", [])
-        print("old_defini",old_defini)
         if personne_absente in old_defini:
             new_defini = [res for res in old_defini if res != personne_absente]
             rdv_a["affectation_ressources_defini"] = new_defini
@@ -69,9 +69,11 @@ def reaffecter_rdv(data):
         
         # On récupère la liste des ressources possibles
         possibles = rdv_a.get("affectation_ressources_possible", [])
-        print("possibles",possibles)
+        sampler.log(logger, logging.DEBUG, "reaffectation.rdv", "réaffectation du rdv %s", rdv_a["id_rdv"],
+                    affectation=old_defini, possibles=possibles)
         # Récupère la coordonnée GPS du RDV absent (pour distance)
         lat_a, lon_a = get_lat_lon(rdv_a)
+        debut_a, fin_a = to_datetime(rdv_a["date_debut"]), to_datetime(rdv_a["date_fin"])
         
         # Tentative d'assigner chaque ressource jusqu'à en avoir assez
         for _ in range(ressources_needed):
@@ -84,16 +86,9 @@ def reaffecter_rdv(data):
                     # Ressource déjà prise pour ce RDV
                     continue
                 
-                # 1) Trouver quels RDV (dans rdv_autres) utilisent cette ressource
-                #    ET qui ont un créneau qui chevauche
-                rdv_en_conflit = []
-                for autre in rdv_autres:
-                    # Vérifions si la ressource est dans 'autre'
-                    defini_autre = autre.get("affectation_ressources_defini", [])
-                    if ressource in defini_autre:
-                        # On teste le chevauchement strict
-                        if chevauchement(rdv_a, autre):
-                            rdv_en_conflit.append(autre)
+                # 1) Trouver quels RDV utilisent cette ressource
+                #    ET qui ont un créneau qui chevauche (chevauchement strict)
+                rdv_en_conflit = occupation.overlapping(ressource, debut_a, fin_a)
                 
                 # 2) Vérifier si on peut “battre” tous les RDV en conflit 
                 #    (i.e. criticité absente > criticité des autres).
@@ -116,7 +111,7 @@ def reaffecter_rdv(data):
                     min_distance = float('inf')
                     for c in rdv_en_conflit:
                         lat_c, lon_c = get_lat_lon(c)
-                        dist = haversine_distance(lat_a, lon_a, lat_c, lon_c)
+                        dist = haversine_distance((lat_a, lon_a), (lat_c, lon_c))
                         if dist < min_distance:
                             min_distance = dist
                 else:
@@ -136,9 +131,10 @@ def reaffecter_rdv(data):
             
             # On “vole” cette ressource (ou elle est libre)
             # => pour chaque RDV en conflit, on annule leurs ressources + date
-            print("Best conflit",best_conflits)
             for victime in best_conflits:
-                print("Grosse victime",victime)
+                sampler.log(logger, logging.INFO, "reaffectation.victime", "rdv %s annulé au profit du rdv %s",
+                            victime["id_rdv"], rdv_a["id_rdv"])
+                occupation.remove(victime)
                 victime["date_debut"] = None
                 victime["date_fin"] = None
                 victime["affectation_ressources_defini"] = []
@@ -148,13 +144,14 @@ def reaffecter_rdv(data):
                 changed_rdvs[victime["id_rdv"]] = victime
             
             # On ajoute cette ressource au RDV absent
-            print("best",best_ressource)
             new_resources_assigned.append(best_ressource)
         
         # -- Fin de la boucle d’assignation pour ce RDV absent --
         if len(new_resources_assigned) == ressources_needed:
             # On a trouvé suffisamment de ressources
             rdv_a["affectation_ressources_defini"] = new_resources_assigned
+            # Ses nouvelles ressources sont désormais occupées sur ce créneau
+            occupation.add(rdv_a)
             # On signale que ce RDV a été modifié
             changed_rdvs[rdv_a["id_rdv"]] = rdv_a
         else:
@@ -169,5 +166,6 @@ def reaffecter_rdv(data):
     
     # -- 4) Construire la liste des RDV modifiés à partir de changed_rdvs --
     liste_modifies = list(changed_rdvs.values())
-    print("liste_modifies",liste_modifies)
+    logger.info("réaffectation terminée", extra={"nb_modifies": len(liste_modifies)})
+    logger.debug("liste_modifies %s", liste_modifies)
     return liste_modifies
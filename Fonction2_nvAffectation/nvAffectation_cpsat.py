@@ -0,0 +1,235 @@
+"""
+Réaffectation conjointe des rendez‑vous d'une personne absente (OR-Tools CP-SAT).
+
+reaffecter_rdv traite les rendez‑vous absents un par un et prend, pour chacun, la ressource
+la plus proche : un choix précoce peut annuler un rendez‑vous qu'un choix ultérieur aurait
+épargné. Ce moteur décide de tous les rendez‑vous absents dans un même modèle, avec les
+mêmes règles que le glouton :
+
+  - un rendez‑vous absent couvert reçoit exactement "nombre_ressources" ressources parmi
+    "affectation_ressources_possible" (hors personne absente) ;
+  - prendre une ressource déjà occupée sur le créneau annule le rendez‑vous qui l'occupe, ce
+    qui n'est permis que si la criticité du rendez‑vous absent est strictement supérieure ;
+  - deux rendez‑vous absents qui se chevauchent ne partagent pas une ressource.
+
+Objectif lexicographique : maximiser d'abord la couverture pondérée par la criticité, puis
+minimiser les annulations (rendez‑vous absents non couverts compris, pondérées par criticité)
+et la distance, mesurée comme dans le glouton (rendez‑vous en conflit le plus proche, 0 pour
+une ressource libre). Le résultat glouton sert de solution initiale
+(hint) ; il est conservé si le solveur n'en trouve pas de meilleure dans le temps imparti.
+"""
+
+import copy
+import os
+
+from ortools.sat.python import cp_model
+
+from Fonction2_nvAffectation.nvAffectation_algo import reaffecter_rdv
+from Fonction2_nvAffectation.nvAffectation_intervals import ResourceIntervalIndex
+from logs import get_logger
+from utils import haversine_distance, to_datetime
+
+logger = get_logger(__name__)
+
+# Temps maximal de résolution (secondes) du modèle de réaffectation
+REAFFECTATION_TIME_LIMIT = float(os.environ.get("REAFFECTATION_TIME_LIMIT", 10))
+
+# Coûts de l'objectif : point de criticité annulé, annulation (quelle que soit la criticité)
+# et kilomètre entre un rendez‑vous et le rendez‑vous auquel il prend la ressource.
+# La couverture n'a pas de poids fixe : il est calculé pour l'emporter sur tous les coûts.
+CANCEL_WEIGHT = 1000
+CANCEL_PENALTY = 200
+DISTANCE_WEIGHT = 1
+
+
+def _lat_lon(rdv):
+    gps = rdv.get("coordonnees_gps")
+    if not gps:
+        return None
+    lat_str, lon_str = gps.split(",")
+    return float(lat_str.strip()), float(lon_str.strip())
+
+
+def _interval(rdv):
+    start, end = to_datetime(rdv.get("date_debut")), to_datetime(rdv.get("date_fin"))
+    if start is None or end is None:
+        return None
+    return start.replace(tzinfo=None), end.replace(tzinfo=None)
+
+
+def _distance_km(rdv_a, conflits):
+    """Comme reaffecter_rdv : distance (km) au rendez‑vous en conflit le plus proche, 0 si la ressource est libre."""
+    coord_a = _lat_lon(rdv_a)
+    distances = [
+        haversine_distance(coord_a, coord)
+        for autre in conflits
+        if coord_a is not None and (coord := _lat_lon(autre)) is not None
+    ]
+    return round(min(distances)) if distances else 0
+
+
+def _cancel_cost(rdv):
+    return CANCEL_WEIGHT * rdv["criticite"] + CANCEL_PENALTY
+
+
+def _cancel_rdv(rdv, alerte):
+    rdv["date_debut"] = None
+    rdv["date_fin"] = None
+    rdv["affectation_ressources_defini"] = []
+    rdv["alerte"] = alerte
+
+
+def reaffecter_rdv_cpsat(data, time_limit=None):
+    """
+    Même entrée et même sortie que reaffecter_rdv (liste des rendez‑vous modifiés).
+
+    time_limit : temps maximal de résolution en secondes (défaut : REAFFECTATION_TIME_LIMIT).
+    """
+    if time_limit is None:
+        time_limit = REAFFECTATION_TIME_LIMIT
+    liste_rdv = data.get("sorted_data", [])
+    personne_absente = data.get("employe_absent", None)
+
+    # Référence gloutonne, calculée sur une copie (reaffecter_rdv modifie les rendez‑vous)
+    greedy_result = reaffecter_rdv({"sorted_data": copy.deepcopy(liste_rdv), "employe_absent": personne_absente})
+    greedy_by_id = {rdv["id_rdv"]: rdv for rdv in greedy_result}
+
+    rdv_absent = [rdv for rdv in liste_rdv if personne_absente in rdv.get("affectation_ressources_defini", [])]
+    rdv_autres = [rdv for rdv in liste_rdv if personne_absente not in rdv.get("affectation_ressources_defini", [])]
+    if not rdv_absent:
+        return greedy_result
+    occupation = ResourceIntervalIndex(rdv_autres)
+    rang = {id(rdv): k for k, rdv in enumerate(rdv_autres)}
+
+    model = cp_model.CpModel()
+    covered = {}
+    assign = {}        # (i, ressource) -> BoolVar
+    cancel = {}        # id(autre) -> BoolVar
+    autres_by_key = {}
+    stealers = {}      # id(autre) -> [(i, BoolVar) des prises permises de sa ressource]
+    distances = {}     # (i, ressource) -> km
+
+    intervals = [_interval(rdv) for rdv in rdv_absent]
+    for i, rdv_a in enumerate(rdv_absent):
+        covered[i] = model.NewBoolVar(f"couvert_{i}")
+        needed = rdv_a.get("nombre_ressources", 1)
+        possibles = list(dict.fromkeys(
+            r for r in rdv_a.get("affectation_ressources_possible", []) if r != personne_absente
+        ))
+        if intervals[i] is None or len(possibles) < needed:
+            model.Add(covered[i] == 0)
+            continue
+        debut_a, fin_a = intervals[i]
+        prises = []
+        for ressource in possibles:
+            conflits = occupation.overlapping(ressource, debut_a, fin_a)
+            x = model.NewBoolVar(f"prise_{i}_{ressource}")
+            assign[(i, ressource)] = x
+            prises.append(x)
+            for autre in conflits:
+                key = id(autre)
+                if key not in cancel:
+                    cancel[key] = model.NewBoolVar(f"annule_{autre['id_rdv']}")
+                    autres_by_key[key] = autre
+                    stealers[key] = []
+                # Prendre la ressource annule le rendez‑vous qui l'occupe...
+                model.AddImplication(x, cancel[key])
+                if rdv_a["criticite"] > autre["criticite"]:
+                    # ... ce qui n'est permis que pour un rendez‑vous strictement plus critique
+                    stealers[key].append((i, x))
+            distances[(i, ressource)] = _distance_km(rdv_a, conflits)
+        model.Add(sum(prises) == needed * covered[i])
+
+    # Une annulation doit être justifiée par au moins une prise permise
+    for key, var in cancel.items():
+        model.Add(var <= sum(x for _, x in stealers[key]))
+
+    # Deux rendez‑vous absents qui se chevauchent ne partagent pas une ressource
+    for i in range(len(rdv_absent)):
+        for j in range(i + 1, len(rdv_absent)):
+            if intervals[i] is None or intervals[j] is None:
+                continue
+            if intervals[i][0] < intervals[j][1] and intervals[j][0] < intervals[i][1]:
+                for (k, ressource), x in assign.items():
+                    if k == i and (j, ressource) in assign:
+                        model.Add(x + assign[(j, ressource)] <= 1)
+
+    # Un rendez‑vous absent non couvert est annulé : il coûte comme une annulation.
+    # Couvrir un point de criticité de plus l'emporte sur tous les coûts réunis (objectif lexicographique).
+    cover_weight = 1 + (
+        sum(_cancel_cost(rdv) for rdv in rdv_absent)
+        + sum(_cancel_cost(autre) for autre in autres_by_key.values())
+        + DISTANCE_WEIGHT * sum(distances.values())
+    )
+
+    def score(value):
+        """Objectif, où value(var) donne la valeur de chaque variable (ou la variable elle‑même)."""
+        return (
+            sum(cover_weight * rdv_absent[i]["criticite"] * value(var) for i, var in covered.items())
+            - sum(_cancel_cost(rdv_absent[i]) * (1 - value(var)) for i, var in covered.items())
+            - sum(_cancel_cost(autres_by_key[key]) * value(var) for key, var in cancel.items())
+            - sum(DISTANCE_WEIGHT * distances[key] * value(var) for key, var in assign.items())
+        )
+
+    model.Maximize(score(lambda var: var))
+
+    # Solution initiale : le résultat glouton
+    greedy_values = {}   # index de variable -> valeur dans la solution gloutonne
+    for i, rdv_a in enumerate(rdv_absent):
+        greedy_rdv = greedy_by_id.get(rdv_a["id_rdv"])
+        # reaffecter_rdv peut rendre le rendez‑vous à la personne absente (elle figure souvent parmi les
+        # ressources possibles et n'occupe plus aucun créneau) : ce n'est pas une couverture
+        greedy_covered = (
+            greedy_rdv is not None and greedy_rdv.get("date_debut") is not None
+            and personne_absente not in greedy_rdv["affectation_ressources_defini"]
+        )
+        greedy_values[covered[i].Index()] = int(greedy_covered)
+        taken = set(greedy_rdv["affectation_ressources_defini"]) if greedy_covered else set()
+        for (k, ressource), x in assign.items():
+            if k == i:
+                greedy_values[x.Index()] = int(ressource in taken)
+    for key, var in cancel.items():
+        greedy_rdv = greedy_by_id.get(autres_by_key[key]["id_rdv"])
+        greedy_values[var.Index()] = int(greedy_rdv is not None and greedy_rdv.get("date_debut") is None)
+    for var in [*covered.values(), *assign.values(), *cancel.values()]:
+        model.AddHint(var, greedy_values[var.Index()])
+    greedy_value = lambda var: greedy_values[var.Index()]
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = time_limit
+    status = solver.Solve(model)
+    logger.info("réaffectation CP-SAT", extra={
+        "statut": solver.StatusName(status), "absents": len(rdv_absent), "conflits": len(cancel),
+        "objectif": solver.ObjectiveValue() if status in (cp_model.OPTIMAL, cp_model.FEASIBLE) else None,
+        "duree": round(solver.WallTime(), 3),
+    })
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        logger.warning("Pas de solution CP-SAT (%s), résultat glouton conservé", solver.StatusName(status))
+        return greedy_result
+    # Arrêt sur le temps limite avec une solution moins bonne que le glouton : on garde le glouton
+    if solver.ObjectiveValue() < score(greedy_value):
+        logger.warning("Solution CP-SAT moins bonne que le glouton, résultat glouton conservé")
+        return greedy_result
+
+    # Application de la solution
+    # Chaque rendez‑vous annulé est rattaché au premier rendez‑vous absent qui a pris sa ressource
+    victimes = {}
+    for key, var in cancel.items():
+        if solver.Value(var):
+            i = next(i for i, x in stealers[key] if solver.Value(x))
+            victimes.setdefault(i, []).append(autres_by_key[key])
+
+    changed_rdvs = {}
+    for i, rdv_a in enumerate(rdv_absent):
+        if solver.Value(covered[i]):
+            for victime in sorted(victimes.get(i, []), key=lambda victime: rang[id(victime)]):
+                _cancel_rdv(victime, f"Rdv annulé car personne plus critique ({rdv_a['id_rdv']}) a récupéré la ressource.")
+                changed_rdvs[victime["id_rdv"]] = victime
+            rdv_a["affectation_ressources_defini"] = [r for (k, r), x in assign.items() if k == i and solver.Value(x)]
+        else:
+            _cancel_rdv(rdv_a, f"Rdv annulé car pas de ressources disponibles pour remplacer l'absence de {personne_absente}")
+        changed_rdvs[rdv_a["id_rdv"]] = rdv_a
+
+    liste_modifies = list(changed_rdvs.values())
+    logger.info("réaffectation terminée", extra={"nb_modifies": len(liste_modifies), "moteur": "cpsat"})
+    return liste_modifies
@@ -1,27 +1,56 @@
 # optimisation_handler.py
-from Fonction2_nvAffectation.nvAffectation_tri import nvAffectation_tri
+import os
+import asyncio
+from Fonction2_nvAffectation.nvAffectation_tri import nvAffectation_tri, poseur_roster
 from Fonction2_nvAffectation.nvAffectation_algo import reaffecter_rdv
+from logs import get_logger
+from telemetry import RequestReport
 
-def run_nvAffectation(data):
+# "async" : acquisition des données DISC en parallèle (voir acquisition_async), "sync" sinon
+ACQUISITION_MODE = os.environ.get("ACQUISITION_MODE", "sync")
+
+# Moteur par défaut : "glouton" (reaffecter_rdv) ou "cpsat" (modèle conjoint, voir nvAffectation_cpsat)
+REAFFECTATION_ENGINE = os.environ.get("REAFFECTATION_ENGINE", "glouton")
+
+logger = get_logger(__name__)
+
+def run_nvAffectation(data, report=None):
     """
     Réalise l'optimisation en deux étapes :
       1. Trie les informations via la fonction `optimisationTournee_tri` (définie dans optimisationTournee_tr.py).
       2. Utilise le résultat du tri en tant que paramètre pour `optimisationTournee_algo` (définie dans optimisationTournee_algo.py).
     
-    :param data: Les données d'entrée (par exemple, un dictionnaire contenant les informations nécessaires).
+    :param data: Les données d'entrée (par exemple, un dictionnaire contenant les informations nécessaires) ;
+                 data["moteur"] choisit le moteur de réaffectation (défaut : REAFFECTATION_ENGINE).
+    :param report: RequestReport recevant la durée de chaque étape (créé si absent).
     :return: Le résultat final de l'optimisation.
     """
+    if report is None:
+        report = RequestReport("remplacement-ressource")
     # Étape 1 : Tri des données
-    print("lancement tri")
-    sorted_data = nvAffectation_tri(data)
+    logger.info("lancement tri")
+    with report.stage("tri"):
+        if ACQUISITION_MODE == "async":
+            from acquisition_async import nvAffectation_tri_async
+            sorted_data = asyncio.run(nvAffectation_tri_async(data))
+        else:
+            # Liste des poseurs résolue une seule fois pour toute la requête
+            poseurs = poseur_roster.get()
+            sorted_data = nvAffectation_tri(data, poseurs)
     # Étape 2 : Application de l'algorithme d'optimisation sur les données triées
     employe_absent = data.get("employeAbsent")
-    print("employe", employe_absent)
     data_for_algo = {
         "sorted_data": sorted_data,
         "employe_absent": int(employe_absent)
     }
-    print("lancement algo", data_for_algo)
-    result = reaffecter_rdv(data_for_algo)
+    logger.info("lancement algo", extra={"employe": employe_absent, "nb_rdv": len(sorted_data)})
+    logger.debug("données algo %s", data_for_algo)
+    engine = data.get("moteur") or REAFFECTATION_ENGINE
+    with report.stage("reaffectation"):
+        if engine == "cpsat":
+            from Fonction2_nvAffectation.nvAffectation_cpsat import reaffecter_rdv_cpsat
+            result = reaffecter_rdv_cpsat(data_for_algo)
+        else:
+            result = reaffecter_rdv(data_for_algo)
     
     return result
@@ -0,0 +1,80 @@
+"""
+Index des créneaux occupés par ressource, pour la détection des conflits de reaffecter_rdv.
+
+reaffecter_rdv parcourait tous les autres rendez‑vous pour chaque ressource candidate.
+ResourceIntervalIndex range les rendez‑vous de chaque ressource par date de début (listes
+triées, recherche dichotomique) : les rendez‑vous d'une ressource qui chevauchent un créneau
+sont trouvés en O(log n + k). L'index est tenu à jour lorsqu'un rendez‑vous est annulé
+(remove) ou reçoit de nouvelles ressources (add).
+"""
+
+from bisect import bisect_left, bisect_right, insort
+from datetime import timedelta
+
+from utils import to_datetime
+
+
+class ResourceIntervalIndex:
+    """
+    rdvs : rendez‑vous au format de nvAffectation_tri (champs "date_debut", "date_fin",
+           "affectation_ressources_defini") ; ceux sans dates sont ignorés.
+
+    Pour chaque ressource : entrées (début, rang, fin, rdv) triées par début, et durée maximale
+    des créneaux, qui borne la recherche des créneaux commencés avant la fenêtre.
+    Les résultats sont rendus dans l'ordre d'insertion (ordre de la liste d'origine).
+    """
+
+    def __init__(self, rdvs=()):
+        self._entries = {}
+        self._max_duration = {}
+        self._keys = {}
+        self._next_rank = 0
+        for rdv in rdvs:
+            self.add(rdv)
+
+    @staticmethod
+    def _interval(rdv):
+        start = to_datetime(rdv.get("date_debut"))
+        end = to_datetime(rdv.get("date_fin"))
+        if start is None or end is None:
+            return None
+        return start.replace(tzinfo=None), end.replace(tzinfo=None)
+
+    def add(self, rdv):
+        """Indexe rdv sous chacune de ses ressources définies (à appeler après une affectation)."""
+        self.remove(rdv)
+        interval = self._interval(rdv)
+        if interval is None:
+            return
+        start, end = interval
+        rank = self._next_rank
+        self._next_rank += 1
+        resources = tuple(dict.fromkeys(rdv.get("affectation_ressources_defini") or []))
+        for resource in resources:
+            insort(self._entries.setdefault(resource, []), (start, rank, end, rdv), key=lambda e: (e[0], e[1]))
+            self._max_duration[resource] = max(self._max_duration.get(resource, timedelta(0)), end - start)
+        self._keys[id(rdv)] = (start, rank, resources)
+
+    def remove(self, rdv):
+        """Retire rdv de l'index (à appeler avant d'annuler ses dates ou ses ressources)."""
+        key = self._keys.pop(id(rdv), None)
+        if key is None:
+            return
+        start, rank, resources = key
+        for resource in resources:
+            entries = self._entries[resource]
+            i = bisect_left(entries, (start, rank), key=lambda e: (e[0], e[1]))
+            del entries[i]
+
+    def overlapping(self, resource, start, end):
+        """Rendez‑vous de la ressource dont le créneau chevauche strictement [start, end[."""
+        entries = self._entries.get(resource)
+        if not entries or start is None or end is None:
+            return []
+        start = start.replace(tzinfo=None)
+        end = end.replace(tzinfo=None)
+        # Seuls les créneaux commencés après start - durée max peuvent encore être en cours à start
+        lo = bisect_right(entries, start - self._max_duration[resource], key=lambda e: e[0])
+        hi = bisect_left(entries, end, lo, key=lambda e: e[0])
+        found = [(rank, rdv) for entry_start, rank, entry_end, rdv in entries[lo:hi] if entry_end > start]
+        return [rdv for _, rdv in sorted(found, key=lambda item: item[0])]
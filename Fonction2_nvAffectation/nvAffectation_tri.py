@@ -4,8 +4,13 @@ from datetime import datetime, timedelta
 from dateutil.parser import parse
 
 
-from authentification import get_api_session 
+from disc_client import get_disc_client
 from utils import to_datetime
+from chantiers import resolve_chantiers_gps
+from roster import RosterProvider
+from logs import get_logger
+
+logger = get_logger(__name__)
 
 def is_workday(date_obj):
     """Retourne True si la date est un jour ouvré (lundi à vendredi)."""
@@ -26,6 +31,26 @@ def add_workdays(start_date, workdays):
 
 import requests
 
+def extraire_poseur_ids(users):
+    """
+    Extrait de la réponse /api/typeusers les IDs des users du groupe "Poseur".
+    """
+    if not users:
+        logger.warning("L'API /typeusers n'a retourné aucun type d'utilisateur (liste des poseurs vide)")
+        return []
+    
+    poseurs = []
+    for group in users:
+        if group.get("nom", "").strip().lower() == "poseur":
+            # Extraire les IDs de tous les users de ce groupe
+            for user in group.get("users", []):
+                user_id = user.get("id")
+                if user_id is not None:
+                    poseurs.append(user_id)
+            break  # On s'arrête dès qu'on a trouvé le groupe "Poseur"
+
+    return poseurs
+
 def get_poseur_ids():
     """
     Appelle l'API à l'URL spécifiée et récupère toutes les users du groupe "Poseur".
@@ -38,32 +63,21 @@ def get_poseur_ids():
 
 
     try:
-        # Obtenir la session API authentifiée
-        session = get_api_session()
+        # Obtenir le client API authentifié (reconnexion automatique si la session expire)
+        session = get_disc_client()
         # Faire la requête GET pour récupérer les rendez-vous
         response = session.get(url)
         response.raise_for_status()  # Gère les erreurs HTTP
 
-        users = response.json()
-        
-        if not users:
-            print("⚠️ L'API n'a retourné aucun rendez-vous !")
-        
-        poseurs = []
-        for group in users:
-            if group.get("nom", "").strip().lower() == "poseur":
-                # Extraire les IDs de tous les users de ce groupe
-                for user in group.get("users", []):
-                    user_id = user.get("id")
-                    if user_id is not None:
-                        poseurs.append(user_id)
-                break  # On s'arrête dès qu'on a trouvé le groupe "Poseur"
-    
-        return poseurs
+        return extraire_poseur_ids(response.json())
     except requests.RequestException as e:
         return []
 
 
+# Liste des poseurs partagée par toutes les requêtes (cache TTL, invalidable via poseur_roster.invalidate())
+poseur_roster = RosterProvider(get_poseur_ids)
+
+
 def get_gps(idChantier):
     """
     Appelle l'API à l'URL spécifiée et récupère toutes les users du groupe "Poseur".
@@ -74,8 +88,8 @@ def get_gps(idChantier):
     endpoint = "/api/chantiers/" + str(idChantier)  # Modifier si nécessaire
     url = f"{base_url}{endpoint}"
     try:
-        # Obtenir la session API authentifiée
-        session = get_api_session()
+        # Obtenir le client API authentifié (reconnexion automatique si la session expire)
+        session = get_disc_client()
         # Faire la requête GET pour récupérer les rendez-vous
         response = session.get(url)
         response.raise_for_status()  # Gère les erreurs HTTP
@@ -83,7 +97,7 @@ def get_gps(idChantier):
         chantier = response.json()
         
         if not chantier:
-            print("⚠️ L'API n'a retourné aucun rendez-vous !")
+            logger.warning("L'API n'a retourné aucun rendez-vous")
         
         gps=chantier.get("gps")
     
@@ -92,15 +106,20 @@ def get_gps(idChantier):
         return []
 
 
-def call_disc_api(date_start: datetime, date_end: datetime):
+def interventions_url(date_start: datetime, date_end: datetime):
+    """URL de /rvinterventions/by-dates utilisée pour le remplacement."""
     base_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
     endpoint = "/api/rvinterventions/by-dates?datestart=25/02/2025&dateend=25/02/2025"  # Modifier si nécessaire
-    url = f"{base_url}{endpoint}"
+    return f"{base_url}{endpoint}"
+
+
+def call_disc_api(date_start: datetime, date_end: datetime):
+    url = interventions_url(date_start, date_end)
 
 
     try:
-        # Obtenir la session API authentifiée
-        session = get_api_session()
+        # Obtenir le client API authentifié (reconnexion automatique si la session expire)
+        session = get_disc_client()
         # Faire la requête GET pour récupérer les rendez-vous
         response = session.get(url)
         response.raise_for_status()  # Gère les erreurs HTTP
@@ -108,7 +127,7 @@ def call_disc_api(date_start: datetime, date_end: datetime):
         interventions = response.json()
         
         if not interventions:
-            print("⚠️ L'API n'a retourné aucun rendez-vous !")
+            logger.warning("L'API n'a retourné aucun rendez-vous")
         
         return interventions
     except requests.RequestException as e:
@@ -117,11 +136,14 @@ def call_disc_api(date_start: datetime, date_end: datetime):
 
 
 
-def filter_and_transform_intervention(interv, remp_start, remp_end):
+def filter_and_transform_intervention(interv, remp_start, remp_end, gps_par_chantier=None, poseurs=None):
     """
     Applique le filtrage et la transformation sur une intervention issue de l'API DISC.
     
     opt_start, opt_end : la plage d'optimisation calculée (objet datetime)
+    gps_par_chantier : table {id_chantier: gps} préchargée (voir chantiers.resolve_chantiers_gps) ;
+                       si absente, le GPS est récupéré via l'API.
+    poseurs : Roster des poseurs résolu une fois par requête ; si absent, lu depuis poseur_roster.
 
     Retourne un dictionnaire structuré selon les spécifications ou None si le rendez-vous est exclu.
     """
@@ -158,14 +180,16 @@ def filter_and_transform_intervention(interv, remp_start, remp_end):
     if interv.get("user_recommanded") :
         ressources_possibles = [user.get("id") for user in interv.get("user_recommanded", [])]
     else :
-        ressources_possibles=get_poseur_ids()
+        if poseurs is None:
+            poseurs = poseur_roster.get()
+        ressources_possibles = list(poseurs)
 
     # --- 2. Conversion des dates en objets datetime ---
     rdv_start = to_datetime(date_debut_val)
     rdv_end   = to_datetime(date_fin_val)
 
     if rdv_start is None or rdv_end is None:
-        print(f"Erreur: Impossible de convertir les dates pour l'intervention {interv.get('id')}.")
+        logger.warning("Impossible de convertir les dates pour l'intervention %s", interv.get('id'))
         return None
 
     # --- 3. Vérifier l'intersection de l'intervalle du rendez-vous avec la plage d'optimisation ---
@@ -196,7 +220,7 @@ def filter_and_transform_intervention(interv, remp_start, remp_end):
                 dateARC_val = march.get("dateARC")
                 dateARC = to_datetime(dateARC_val)
                 if dateARC is None and statusrv not in ["proposé", "convenu"]:
-                    print(f"Erreur de conversion de dateARC pour l'intervention {interv.get('id')}.")
+                    logger.warning("Erreur de conversion de dateARC pour l'intervention %s", interv.get('id'))
                     return None
                 # Pour comparer, on rend les datetime naïfs
                 dateARC_naive = dateARC.replace(tzinfo=None) if dateARC.tzinfo else dateARC
@@ -213,7 +237,11 @@ def filter_and_transform_intervention(interv, remp_start, remp_end):
     final_date_debut = effective_start.isoformat()
     final_date_fin   = rdv_end.isoformat()
     # --- 8. Filtre des rendez vous nous complétés ---
-    gps = get_gps(interv.get("chantier", {}).get("id"))
+    id_chantier = interv.get("chantier", {}).get("id")
+    if gps_par_chantier is not None and id_chantier in gps_par_chantier:
+        gps = gps_par_chantier[id_chantier]
+    else:
+        gps = get_gps(id_chantier)
     if not interv.get("nb_intervenants_mandatory") :
         nb_intervenants=1
     else:
@@ -237,12 +265,13 @@ def filter_and_transform_intervention(interv, remp_start, remp_end):
 
 
 
-def nvAffectation_tri(data):
+def nvAffectation_tri(data, poseurs=None):
     """
     Fonction de tri pour le remplacement d'affectation
     
     Paramètre d'entrée (data) :
       - Un dictionnaire contenant au moins les champs "employe", "dateDebut" et "dateFin"
+    poseurs : Roster des poseurs résolu une fois pour la requête (sinon lu depuis poseur_roster).
     
     Retour :
       - Une liste d'objets rendez-vous structurés sans doublons (basés sur "id_rdv").
@@ -252,17 +281,22 @@ def nvAffectation_tri(data):
     # On fixe la date de début et la date de fin selon les données d'entrée
     remp_start = to_datetime(date_debut)
     remp_end = to_datetime(date_fin)
+    if poseurs is None:
+        poseurs = poseur_roster.get()
 
     # 2. Appel à l'API du DISC
     jours_interventions = call_disc_api(remp_start, remp_end)
-    
+
+    # 2b. Résolution des GPS chantiers en un seul lot (au lieu d'un appel par intervention)
+    gps_par_chantier = resolve_chantiers_gps(jours_interventions, get_gps)
+
     # 3. Filtrage, transformation et déduplication
     output_list = []
     seen_ids = set()  # Ensemble pour stocker les id_rdv déjà rencontrés
     for jour in jours_interventions:
         rvs = jour.get("rvs")
         for interv in rvs:
-            transformed = filter_and_transform_intervention(interv, remp_start, remp_end)
+            transformed = filter_and_transform_intervention(interv, remp_start, remp_end, gps_par_chantier, poseurs)
             if transformed:
                 id_rdv = transformed.get("id_rdv")
                 if id_rdv not in seen_ids:
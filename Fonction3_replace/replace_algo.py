@@ -1,6 +1,11 @@
+import os
 from ortools.sat.python import cp_model
 from datetime import datetime, timedelta
 
+# Temps maximal (secondes) et nombre de workers de la résolution de la phase 3 (multi-RDV)
+PHASE3_TIME_LIMIT = float(os.environ.get("PHASE3_TIME_LIMIT", 5))
+PHASE3_WORKERS = int(os.environ.get("PHASE3_WORKERS", 8))
+
 def get_bonus_for_marchandises(rdv_candidat):
         """
         Définit le bonus en fonction du statut des marchandises.
@@ -31,10 +36,11 @@ def get_bonus_for_marchandises(rdv_candidat):
 
         return 0  # Pas de bonus sinon
 
-def optimiser_affectation_poseurs(poseurs_libres, candidats, rdv_annule, phase_name="PhaseX"):
+def optimiser_affectation_poseurs(poseurs_libres, candidats, rdv_annule, phase_name="PhaseX", solver=None):
     """
     OR-Tools : un poseur = au plus un RDV.
     Priorité aux RDV sans marchandise ou avec des statuts favorables.
+    solver : CpSolver à utiliser (ex. pour l'arrêter depuis un autre thread), un nouveau sinon.
     """
     model = cp_model.CpModel()
     assignments = {}
@@ -69,7 +75,8 @@ def optimiser_affectation_poseurs(poseurs_libres, candidats, rdv_annule, phase_n
 
     model.Maximize(sum(objective_expr))
 
-    solver = cp_model.CpSolver()
+    if solver is None:
+        solver = cp_model.CpSolver()
     status = solver.Solve(model)
 
     resultats = []
@@ -98,12 +105,19 @@ def optimiser_affectation_poseurs(poseurs_libres, candidats, rdv_annule, phase_n
     return resultats
 
 
-def optimiser_affectation_multi(poseurs_libres, candidats, rdv_annule):
+def optimiser_affectation_multi(poseurs_libres, candidats, rdv_annule, solver=None):
     """
     PHASE 3 : 
     - Chaque poseur peut être affecté à plusieurs RDV, 
       tant que la somme des durées n’excède pas la durée du RDV annulé.
     - On favorise les RDV avec des statuts favorables pour les marchandises.
+    solver : CpSolver à utiliser (ex. pour l'arrêter depuis un autre thread), utilisé avec ses
+             propres paramètres ; à défaut, un nouveau solveur borné par PHASE3_TIME_LIMIT et
+             PHASE3_WORKERS.
+
+    Seuls les couples (poseur, RDV) possibles sont modélisés : RDV à partir de la date de
+    disponibilité du poseur et de durée au plus égale à celle du RDV annulé. Le remplissage
+    glouton de chaque poseur (bonus décroissant) sert de solution initiale.
     """
     try:
         duree_annule = int(float(rdv_annule.get("duree", "1")))  # 🔧 Conversion robuste
@@ -120,18 +134,6 @@ def optimiser_affectation_multi(poseurs_libres, candidats, rdv_annule):
         except ValueError:
             rdv_durations[i] = 1
 
-    for poseur_info in poseurs_libres:
-        poseur = poseur_info["poseur"]
-        for j in range(len(candidats)):
-            assignments[(poseur, j)] = model.NewBoolVar(f"assign_{poseur}_{j}")
-
-    for poseur_info in poseurs_libres:
-        poseur = poseur_info["poseur"]
-        model.Add(
-            sum(assignments[(poseur, j)] * int(rdv_durations[j]) for j in range(len(candidats))) 
-            <= int(duree_annule)
-        )
-
     def get_bonus(poseur, rdv_candidat):
         users_c = [u["username"] for u in rdv_candidat.get("users", [])]
         recommended_c = [u["username"] for u in rdv_candidat.get("users_recommended", [])]
@@ -141,14 +143,52 @@ def optimiser_affectation_multi(poseurs_libres, candidats, rdv_annule):
             return 2 + marchandises_bonus
         return 1 + marchandises_bonus
 
-    objective_expr = []
-    for (poseur, j) in assignments:
-        bonus = get_bonus(poseur, candidats[j])
-        objective_expr.append(assignments[(poseur, j)] * bonus)
+    # Élagage : pas de variable pour un RDV trop long ou antérieur à la disponibilité du poseur
+    dates_rdv = {}
+    for j, c in enumerate(candidats):
+        dt_str = c.get("daterv", "")
+        dates_rdv[j] = datetime.fromisoformat(dt_str.split("+")[0]).date() if dt_str else None
+    bonus = {}
+    for poseur_info in poseurs_libres:
+        poseur = poseur_info["poseur"]
+        date_dispo = poseur_info.get("date_disponible")
+        for j in range(len(candidats)):
+            if rdv_durations[j] > duree_annule:
+                continue
+            if date_dispo is not None and dates_rdv[j] is not None and dates_rdv[j] < date_dispo:
+                continue
+            if (poseur, j) not in assignments:
+                assignments[(poseur, j)] = model.NewBoolVar(f"assign_{poseur}_{j}")
+                bonus[(poseur, j)] = get_bonus(poseur, candidats[j])
 
-    model.Maximize(sum(objective_expr))
+    if not assignments:
+        return []
+
+    for poseur_info in poseurs_libres:
+        poseur = poseur_info["poseur"]
+        model.Add(
+            sum(var * rdv_durations[j] for (p, j), var in assignments.items() if p == poseur)
+            <= int(duree_annule)
+        )
 
-    solver = cp_model.CpSolver()
+    model.Maximize(sum(var * bonus[key] for key, var in assignments.items()))
+
+    # Solution initiale : chaque poseur rempli par bonus décroissant
+    hinted = set()
+    for poseur_info in poseurs_libres:
+        poseur = poseur_info["poseur"]
+        restant = duree_annule
+        for key in sorted((k for k in assignments if k[0] == poseur), key=lambda k: -bonus[k]):
+            if rdv_durations[key[1]] <= restant:
+                hinted.add(key)
+                restant -= rdv_durations[key[1]]
+    for key, var in assignments.items():
+        model.AddHint(var, key in hinted)
+
+    if solver is None:
+        solver = cp_model.CpSolver()
+        solver.parameters.max_time_in_seconds = PHASE3_TIME_LIMIT
+        solver.parameters.num_search_workers = PHASE3_WORKERS
     status = solver.Solve(model)
 
     resultats = []
@@ -0,0 +1,185 @@
+"""
+Remplacement d'un RDV annulé par un modèle CP-SAT unique.
+
+La cascade de replace_handler résout jusqu'à cinq modèles pour appliquer l'ordre de
+préférence : même équipe > poseur commun > poseur recommandé > même taille d'équipe >
+décomposition multi-RDV. Ce moteur résout un seul modèle sur tous les candidats de la
+fenêtre, avec un objectif lexicographique (poids emboîtés) :
+
+  1. le palier de chaque affectation (PHASE 1 d'abord, puis 2, 2.5, 2.6, 3) ;
+  2. à palier égal, le bonus de l'affectation comme dans la cascade
+     (1 + get_bonus_for_marchandises, +1 en multi-RDV pour un poseur de l'équipe ou recommandé) ;
+  3. en multi-RDV, le remplissage du créneau libéré (minutes utilisées).
+
+Chaque poseur reçoit soit au plus un RDV des paliers 1 à 2.6, soit plusieurs RDV dont la durée
+totale tient dans celle du RDV annulé (palier 3, avec au moins deux poseurs libérés), comme dans
+la cascade et parmi les mêmes RDV (aucun RDV antérieur à la disponibilité du poseur). Un poseur
+peut donc obtenir un RDV de palier 2 quand un autre obtient le seul RDV de palier 1 : la réponse
+est celle de la cascade ou une meilleure.
+"""
+
+import os
+from datetime import datetime
+
+from ortools.sat.python import cp_model
+
+from Fonction3_replace.replace_algo import get_bonus_for_marchandises
+from Fonction3_replace.replace_tri import (
+    CandidateIndex,
+    filtrer_phase1,
+    filtrer_phase2,
+    filtrer_phase2b,
+    filtrer_phase2c,
+)
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Temps maximal (secondes) et nombre de workers de la résolution
+REMPLACEMENT_TIME_LIMIT = float(os.environ.get("REMPLACEMENT_TIME_LIMIT", 10))
+REMPLACEMENT_WORKERS = int(os.environ.get("REMPLACEMENT_WORKERS", 8))
+
+# Paliers dans l'ordre de priorité : (nom de phase, message, filtre ; None pour le multi-RDV)
+PALIERS = (
+    ("PHASE 1", "Remplacement terminé (Phase 1)", filtrer_phase1),
+    ("PHASE 2", "Remplacement terminé (Phase 2)", filtrer_phase2),
+    ("PHASE 2.5", "Remplacement terminé (Phase 2.5)", filtrer_phase2b),
+    ("PHASE 2.6", "Remplacement terminé (Phase 2.6)", filtrer_phase2c),
+    ("PHASE 3 multi", "Remplacement terminé (Phase 3, multi-rdv)", None),
+)
+MULTI = len(PALIERS) - 1
+
+# Échelle du bonus devant le remplissage (au plus REMPLISSAGE_MAX par affectation multi-RDV)
+BONUS_SCALE = 100
+REMPLISSAGE_MAX = 100
+
+
+def _duree(rdv):
+    try:
+        return int(float(rdv.get("duree", "1")))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _date_rdv(rdv):
+    dt_str = rdv.get("daterv", "")
+    return datetime.fromisoformat(dt_str.split("+")[0]).date() if dt_str else None
+
+
+def _affectation(poseur, rdv_nouveau, rdv_annule, phase_name):
+    return {
+        "poseur": poseur,
+        "nouveau_rdv": {
+            "id": rdv_nouveau["id"],
+            "date_heure": rdv_nouveau.get("daterv", ""),
+            "adresse": rdv_nouveau.get("chantier", {}).get("adresse", ""),
+            "duree": rdv_nouveau.get("duree", "?")
+        },
+        "ancien_rdv": {
+            "id": rdv_annule["id"],
+            "date_heure": rdv_annule.get("daterv", ""),
+            "duree": rdv_annule.get("duree", ""),
+            "etat": "désormais sans date"
+        },
+        "phase": phase_name
+    }
+
+
+def optimiser_remplacement_unique(poseurs_libres, candidats, rdv_annule, time_limit=None, workers=None):
+    """
+    Résout le remplacement en un seul modèle.
+
+    time_limit : temps maximal en secondes (défaut : REMPLACEMENT_TIME_LIMIT).
+    workers : nombre de workers CP-SAT (défaut : REMPLACEMENT_WORKERS).
+    Retourne {"message", "affectations"} comme la cascade, ou None si aucune solution
+    n'a été trouvée dans le temps imparti (l'appelant peut alors revenir à la cascade).
+    """
+    index = candidats if isinstance(candidats, CandidateIndex) else CandidateIndex(candidats)
+    candidats = index.candidats
+    capacite = _duree(rdv_annule)
+
+    # Meilleur palier (1 à 2.6) de chaque candidat
+    palier_de = {}
+    for palier, (_, _, filtre) in enumerate(PALIERS[:MULTI]):
+        for rdv in filtre(rdv_annule, index):
+            palier_de.setdefault(id(rdv), palier)
+
+    model = cp_model.CpModel()
+    # Affectations possibles : (BoolVar, p, j, palier, bonus, remplissage) ; le poseur p prend le RDV j
+    termes = []
+    multi_possible = len(poseurs_libres) > 1
+    max_affectations = 0
+
+    for p, poseur_info in enumerate(poseurs_libres):
+        poseur = poseur_info["poseur"]
+        date_dispo = poseur_info["date_disponible"]
+        unique, multi = [], []
+        for j, rdv in enumerate(candidats):
+            bonus_marchandises = get_bonus_for_marchandises(rdv)
+            palier = palier_de.get(id(rdv))
+            date_rdv = _date_rdv(rdv)
+            if palier is not None and date_rdv is not None and date_rdv >= date_dispo:
+                var = model.NewBoolVar(f"unique_{p}_{j}")
+                unique.append(var)
+                termes.append((var, p, j, palier, 1 + bonus_marchandises, 0))
+            # Même élagage que optimiser_affectation_multi : RDV assez court et pas avant la disponibilité
+            if multi_possible and _duree(rdv) <= capacite and (date_rdv is None or date_rdv >= date_dispo):
+                users_c = {u["username"] for u in rdv.get("users", [])}
+                recommended_c = {u["username"] for u in rdv.get("users_recommended", [])}
+                base = 2 if poseur in users_c or poseur in recommended_c else 1
+                var = model.NewBoolVar(f"multi_{p}_{j}")
+                multi.append((var, _duree(rdv)))
+                termes.append((var, p, j, MULTI, base + bonus_marchandises,
+                               REMPLISSAGE_MAX * _duree(rdv) // max(capacite, 1)))
+
+        # Un poseur : au plus un RDV unique, ou des RDV multiples tenant dans le créneau libéré
+        en_multi = model.NewBoolVar(f"en_multi_{p}")
+        model.Add(sum(unique) <= 1 - en_multi)
+        model.Add(sum(var * duree for var, duree in multi) <= capacite * en_multi)
+        max_affectations += max(1, len(multi))
+
+    if not termes:
+        return {"message": "Aucun remplacement possible (Toutes phases échouées)", "affectations": []}
+
+    # Poids emboîtés : un palier l'emporte sur tout ce que les paliers suivants peuvent apporter.
+    # Chaque poseur a au plus un RDV unique : les paliers 1 à 2.6 comptent au plus len(poseurs_libres)
+    # affectations, seul le palier multi‑RDV en compte jusqu'à max_affectations.
+    max_bonus = max(terme[4] for terme in termes)
+    nb_poseurs = len(poseurs_libres)
+    weights = [0] * len(PALIERS)
+    weights[MULTI] = 1
+    lower = (max_affectations * (1 + BONUS_SCALE * max_bonus + REMPLISSAGE_MAX)
+             + nb_poseurs * BONUS_SCALE * max_bonus)
+    for palier in range(MULTI - 1, -1, -1):
+        weights[palier] = lower + 1
+        lower += nb_poseurs * weights[palier]
+    # L'objectif (somme des coefficients) doit tenir sur 64 bits, sinon CP-SAT rejette le modèle
+    if lower >= 2**62:
+        logger.error("Poids du modèle unique hors des entiers 64 bits, retour à la cascade", extra={
+            "poseurs": nb_poseurs, "candidats": len(candidats), "borne_objectif": lower,
+        })
+        return None
+    model.Maximize(sum(
+        (weights[palier] + BONUS_SCALE * bonus + remplissage) * var
+        for var, _, _, palier, bonus, remplissage in termes
+    ))
+
+    solver = cp_model.CpSolver()
+    solver.parameters.max_time_in_seconds = REMPLACEMENT_TIME_LIMIT if time_limit is None else time_limit
+    solver.parameters.num_search_workers = REMPLACEMENT_WORKERS if workers is None else workers
+    status = solver.Solve(model)
+    logger.info("remplacement CP-SAT", extra={
+        "statut": solver.StatusName(status), "variables": len(termes), "duree": round(solver.WallTime(), 3),
+    })
+    if status not in (cp_model.OPTIMAL, cp_model.FEASIBLE):
+        return None
+
+    resultats = []
+    meilleur_palier = None
+    for var, p, j, palier, _, _ in termes:
+        if solver.Value(var):
+            meilleur_palier = palier if meilleur_palier is None else min(meilleur_palier, palier)
+            resultats.append(_affectation(poseurs_libres[p]["poseur"], candidats[j], rdv_annule, PALIERS[palier][0]))
+    if not resultats:
+        return {"message": "Aucun remplacement possible (Toutes phases échouées)", "affectations": []}
+    return {"message": PALIERS[meilleur_palier][1], "affectations": resultats}
@@ -1,15 +1,49 @@
 import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from replace_tri import (
+
+if __name__ == "__main__" and not __package__:
+    # Exécution directe (python Fonction3_replace/replace_handler.py) : racine du dépôt dans le chemin
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from Fonction3_replace.replace_tri import (
+    CandidateIndex,
     preparer_donnees_remplacement,
     filtrer_phase1,
     filtrer_phase2,
     filtrer_phase2b,
     filtrer_phase2c
 )
-from replace_algo import optimiser_affectation_poseurs, optimiser_affectation_multi
+from Fonction3_replace.replace_algo import (
+    PHASE3_TIME_LIMIT,
+    PHASE3_WORKERS,
+    optimiser_affectation_poseurs,
+    optimiser_affectation_multi
+)
+from ortools.sat.python import cp_model
+from logs import get_logger
+from telemetry import RequestReport
+
+logger = get_logger(__name__)
+
+# Moteur par défaut : "cascade" (phases l'une après l'autre), "parallele" (toutes les phases lancées ensemble)
+# ou "cpsat" (un seul modèle pondéré, voir replace_cpsat)
+REMPLACEMENT_ENGINE = os.environ.get("REMPLACEMENT_ENGINE", "cascade")
 
-def run_optimisation_remplacement(rdv_id: str):
+# Nombre de threads du mode "parallele" (une phase par thread ; CP-SAT libère le GIL pendant la résolution)
+PHASE_WORKERS = int(os.environ.get("PHASE_WORKERS", 5))
+
+# Nombre total de workers CP-SAT répartis entre les phases lancées ensemble (mode "parallele")
+PHASE_SEARCH_WORKERS = int(os.environ.get("PHASE_SEARCH_WORKERS", os.cpu_count() or 1))
+
+# Échéance globale (secondes) de la recherche d'une requête /remplacement-rdv, toutes phases confondues
+REMPLACEMENT_DEADLINE_SECONDS = float(os.environ.get("REMPLACEMENT_DEADLINE_SECONDS", 60))
+
+
+def run_optimisation_remplacement(rdv_id: str, report=None, engine=None, deadline=None):
     """
     Approche multi-phase :
       1) PHASE 1 : RDV unique (même durée, équipe identique).
@@ -17,62 +51,171 @@ def run_optimisation_remplacement(rdv_id: str):
       2.5) PHASE 2.5 : RDV unique (même durée, même nb poseurs, >=1 poseur dans recommandés).
       2.6) PHASE 2.6 : RDV unique (même durée, même nb poseurs, sans contrainte de composition).
       3) PHASE 3 : décomposition multi-rdv (même ou plus courte durée).
+
+    report : RequestReport recevant la durée du chargement et de la recherche (créé si absent).
+    engine : "cascade" ou "parallele" (défaut : REMPLACEMENT_ENGINE) ; le résultat est le même,
+             la première phase (par ordre de priorité) qui trouve une affectation.
+             "cpsat" : un seul modèle sur tous les candidats (même résultat ou meilleur) ;
+             retour à la cascade si aucune solution n'est trouvée dans le temps imparti.
+    deadline : échéance absolue (time.time()) de la recherche ; par défaut maintenant
+               + REMPLACEMENT_DEADLINE_SECONDS. Aucune phase ne résout au‑delà.
     """
+    if report is None:
+        report = RequestReport("remplacement-rdv")
+    if engine is None:
+        engine = REMPLACEMENT_ENGINE
 
     # Récupération de l'équipe annulée, la durée, etc.
-    poseurs_libres, candidats, rdv_annule = preparer_donnees_remplacement(rdv_id)
-    if not rdv_annule or not poseurs_libres:
-        return {
-            "message": f"Aucun remplacement possible (RDV {rdv_id} introuvable ou poseurs inexistants)",
-            "affectations": []
-        }
-
-    # PHASE 1
-    phase1_candidates = filtrer_phase1(rdv_annule, candidats)
-    if phase1_candidates:
-        result1 = optimiser_affectation_poseurs(
-            poseurs_libres, phase1_candidates, rdv_annule, phase_name="PHASE 1"
-        )
-        if result1:
-            return {"message": "Remplacement terminé (Phase 1)", "affectations": result1}
-
-    # PHASE 2
-    phase2_candidates = filtrer_phase2(rdv_annule, candidats)
-    if phase2_candidates:
-        result2 = optimiser_affectation_poseurs(
-            poseurs_libres, phase2_candidates, rdv_annule, phase_name="PHASE 2"
-        )
-        if result2:
-            return {"message": "Remplacement terminé (Phase 2)", "affectations": result2}
-
-    # PHASE 2.5
-    phase2b_candidates = filtrer_phase2b(rdv_annule, candidats)
-    if phase2b_candidates:
-        result2b = optimiser_affectation_poseurs(
-            poseurs_libres, phase2b_candidates, rdv_annule, phase_name="PHASE 2.5"
-        )
-        if result2b:
-            return {"message": "Remplacement terminé (Phase 2.5)", "affectations": result2b}
-
-    # PHASE 2.6
-    phase2c_candidates = filtrer_phase2c(rdv_annule, candidats)
-    if phase2c_candidates:
-        result2c = optimiser_affectation_poseurs(
-            poseurs_libres, phase2c_candidates, rdv_annule, phase_name="PHASE 2.6"
-        )
-        if result2c:
-            return {"message": "Remplacement terminé (Phase 2.6)", "affectations": result2c}
-
-    # PHASE 3
+    with report.stage("chargement"):
+        poseurs_libres, candidats, rdv_annule = preparer_donnees_remplacement(rdv_id)
+    with report.stage("phases"):
+        if deadline is None:
+            deadline = time.time() + REMPLACEMENT_DEADLINE_SECONDS
+        if not rdv_annule or not poseurs_libres:
+            return {
+                "message": f"Aucun remplacement possible (RDV {rdv_id} introuvable ou poseurs inexistants)",
+                "affectations": []
+            }
+        if engine == "cpsat":
+            from Fonction3_replace.replace_cpsat import optimiser_remplacement_unique
+            result = optimiser_remplacement_unique(poseurs_libres, candidats, rdv_annule)
+            if result is not None:
+                return result
+            logger.warning("Pas de solution du modèle unique, retour à la cascade", extra={"rdv": rdv_id})
+        phases = _phases(poseurs_libres, candidats, rdv_annule)
+        if engine == "parallele":
+            return _remplacement_parallele(phases, deadline)
+        return _remplacement_par_phases(phases, deadline)
+
+
+def _phases(poseurs_libres, candidats, rdv_annule):
+    """
+    Phases dans l'ordre de priorité : [(message, fonction(solver) -> affectations)].
+    Chaque fonction filtre ses candidats puis résout son modèle avec le CpSolver fourni.
+    """
+    # Index des candidats construit une seule fois pour toutes les phases
+    index = CandidateIndex(candidats)
+
+    def phase_rdv_unique(filtre, phase_name):
+        def run(solver=None):
+            phase_candidates = filtre(rdv_annule, index)
+            if not phase_candidates:
+                return []
+            return optimiser_affectation_poseurs(
+                poseurs_libres, phase_candidates, rdv_annule, phase_name=phase_name, solver=solver
+            )
+        return run
+
+    def phase_multi(solver=None):
+        if solver is not None:
+            # Le solveur de la phase reçoit les bornes de la phase 3 (non modifié par optimiser_affectation_multi)
+            solver.parameters.max_time_in_seconds = PHASE3_TIME_LIMIT
+            if not solver.parameters.num_search_workers:
+                solver.parameters.num_search_workers = PHASE3_WORKERS
+        return optimiser_affectation_multi(poseurs_libres, index.candidats, rdv_annule, solver=solver)
+
+    phases = [
+        ("Remplacement terminé (Phase 1)", phase_rdv_unique(filtrer_phase1, "PHASE 1")),
+        ("Remplacement terminé (Phase 2)", phase_rdv_unique(filtrer_phase2, "PHASE 2")),
+        ("Remplacement terminé (Phase 2.5)", phase_rdv_unique(filtrer_phase2b, "PHASE 2.5")),
+        ("Remplacement terminé (Phase 2.6)", phase_rdv_unique(filtrer_phase2c, "PHASE 2.6")),
+    ]
     if len(poseurs_libres) > 1:
-        result3 = optimiser_affectation_multi(poseurs_libres, candidats, rdv_annule)
-        if result3:
-            return {"message": "Remplacement terminé (Phase 3, multi-rdv)", "affectations": result3}
-
-    return {
-        "message": "Aucun remplacement possible (Toutes phases échouées)",
-        "affectations": []
-    }
+        phases.append(("Remplacement terminé (Phase 3, multi-rdv)", phase_multi))
+    return phases
+
+
+_ECHEC = {
+    "message": "Aucun remplacement possible (Toutes phases échouées)",
+    "affectations": []
+}
+
+
+def _remplacement_par_phases(phases, deadline=None):
+    for message, run in phases:
+        result = run(_PhaseSolver(deadline=deadline))
+        if result:
+            return {"message": message, "affectations": result}
+    return dict(_ECHEC)
+
+
+class _AbandonCallback(cp_model.CpSolverSolutionCallback):
+    """Arrête la recherche à la première solution trouvée après l'abandon de la phase."""
+
+    def __init__(self, phase_solver, solution_callback=None):
+        super().__init__()
+        self.phase_solver = phase_solver
+        self.solution_callback = solution_callback
+
+    def on_solution_callback(self):
+        if self.solution_callback is not None:
+            self.solution_callback.on_solution_callback()
+        if self.phase_solver.abandoned:
+            self.StopSearch()
+
+
+class _PhaseSolver(cp_model.CpSolver):
+    """
+    CpSolver d'une phase, arrêtable depuis un autre thread (abandon) et borné par l'échéance
+    de la requête.
+
+    Un StopSearch reçu juste avant le démarrage effectif de la recherche serait perdu :
+    l'abandon est donc aussi vérifié à chaque solution (_AbandonCallback), et la recherche
+    ne dépasse jamais l'échéance, même si aucune solution n'est trouvée.
+    """
+
+    def __init__(self, workers=None, deadline=None):
+        super().__init__()
+        if workers:
+            self.parameters.num_search_workers = workers
+        self.deadline = deadline
+        self.abandoned = False
+        self._lock = threading.Lock()
+
+    def abandon(self):
+        with self._lock:
+            self.abandoned = True
+        self.StopSearch()
+
+    def solve(self, model, solution_callback=None):
+        with self._lock:
+            if self.abandoned:
+                return cp_model.UNKNOWN
+            if self.deadline is not None:
+                remaining = self.deadline - time.time()
+                if remaining <= 0:
+                    logger.warning("Échéance de la requête atteinte, phase non résolue")
+                    return cp_model.UNKNOWN
+                # La limite propre à la phase (ex. PHASE3_TIME_LIMIT) est conservée si plus courte
+                self.parameters.max_time_in_seconds = min(self.parameters.max_time_in_seconds, remaining)
+        return super().solve(model, _AbandonCallback(self, solution_callback))
+
+
+def _remplacement_parallele(phases, deadline=None):
+    """
+    Lance toutes les phases en même temps. Les résultats sont lus dans l'ordre de priorité :
+    dès qu'une phase trouve une affectation (toutes les phases prioritaires étant terminées
+    sans résultat), les phases suivantes sont arrêtées et leur résultat ignoré.
+    Les PHASE_SEARCH_WORKERS workers CP-SAT sont répartis entre les phases ; une phase
+    abandonnée dont l'arrêt serait perdu s'arrête au plus tard à l'échéance.
+    """
+    workers = max(1, PHASE_SEARCH_WORKERS // len(phases))
+    solvers = [_PhaseSolver(workers, deadline) for _ in phases]
+    executor = ThreadPoolExecutor(max_workers=max(1, min(PHASE_WORKERS, len(phases))))
+    try:
+        futures = [executor.submit(run, solver) for (_, run), solver in zip(phases, solvers)]
+        for rank, ((message, _), future) in enumerate(zip(phases, futures)):
+            result = future.result()
+            if result:
+                for solver, pending in zip(solvers[rank + 1:], futures[rank + 1:]):
+                    pending.cancel()
+                    solver.abandon()
+                logger.info("phase retenue", extra={"phase": message, "abandonnees": len(phases) - rank - 1})
+                return {"message": message, "affectations": result}
+        return dict(_ECHEC)
+    finally:
+        # Les phases arrêtées se terminent en arrière‑plan, sans bloquer la réponse
+        executor.shutdown(wait=False, cancel_futures=True)
 
 
 if __name__ == "__main__":
@@ -1,11 +1,14 @@
 from datetime import datetime, timedelta
-from replace_utils import charger_rendez_vous
+from Fonction3_replace.replace_utils import charger_rdv, charger_fenetre, FENETRE_CANDIDATS_JOURS
+from logs import get_logger
+
+logger = get_logger(__name__)
 
 def preparer_donnees_remplacement(rdv_id: str):
     """
-    Récupère tous les RDV,
-    Trouve le RDV annulé (rdv_id),
-    Extrait la date, la durée, et l'équipe.
+    Récupère le RDV annulé (rdv_id) par son identifiant,
+    Extrait la date, la durée, et l'équipe,
+    Charge uniquement les RDV de la fenêtre [date d'annulation, +7 jours].
     Construit la liste (poseurs_libres, candidats).
     
     Renvoie :
@@ -13,35 +16,31 @@ def preparer_donnees_remplacement(rdv_id: str):
       - candidats : tous les RDV potentiels dans les 7 jours
       - rdv_annule : le RDV annulé lui-même
     """
-    print(f"Préparation des données pour le RDV annulé {rdv_id}")
-
-    all_rdv = charger_rendez_vous()
-    if not all_rdv:
-        print("Aucun RDV récupéré depuis la source.")
-        return [], [], None
-
-    rdv_annule = None
-    for jour_data in all_rdv:
-        for rdv in jour_data.get("rvs", []):
-            if str(rdv.get("id")) == rdv_id:
-                rdv_annule = rdv
-                break
-        if rdv_annule:
-            break
+    logger.info("Préparation des données pour le RDV annulé %s", rdv_id)
 
+    rdv_annule = charger_rdv(rdv_id)
     if not rdv_annule:
-        print(f"RDV {rdv_id} introuvable dans les données.")
+        logger.warning("RDV %s introuvable dans les données.", rdv_id)
         return [], [], None
 
-    # Affiche rapidement le RDV annulé
-    print("RDV annulé :", rdv_annule)
-
     # Extraire la date d'annulation
     daterv_str = rdv_annule.get("daterv", "")
     if not daterv_str:
         return [], [], None
     date_annulation = datetime.fromisoformat(daterv_str.split("+")[0]).date()
 
+    # RDV de la fenêtre des candidats (réponse mise en cache pour les remplacements de la même semaine)
+    date_limite = date_annulation + timedelta(days=FENETRE_CANDIDATS_JOURS)
+    all_rdv = charger_fenetre(date_annulation, date_limite)
+
+    # La version /by-dates du RDV annulé a le même format que les candidats : on la préfère
+    rdv_annule = next(
+        (rdv for jour_data in all_rdv for rdv in jour_data.get("rvs", []) if str(rdv.get("id")) == str(rdv_id)),
+        rdv_annule,
+    )
+
+    logger.debug("RDV annulé : %s", rdv_annule)
+
     # Gérer la durée
     duree_annule = rdv_annule.get("duree", "")
     if not duree_annule:
@@ -52,7 +51,7 @@ def preparer_donnees_remplacement(rdv_id: str):
 
     # Si tous sont "À planifier", on ne fait rien
     if all(p == "À planifier" for p in poseurs_concernes):
-        print("Tous les poseurs sont 'À planifier', aucune optimisation à faire.")
+        logger.info("Tous les poseurs sont 'À planifier', aucune optimisation à faire.", extra={"rdv": rdv_id})
         return [], [], None
 
     poseurs_libres = [
@@ -61,7 +60,6 @@ def preparer_donnees_remplacement(rdv_id: str):
     ]
 
     # Construire la liste des RDV candidats (dans les 7 jours)
-    date_limite = date_annulation + timedelta(days=7)
     candidats_filtres = []
     for jour_data in all_rdv:
         for rdv in jour_data.get("rvs", []):
@@ -74,12 +72,71 @@ def preparer_donnees_remplacement(rdv_id: str):
             if date_annulation <= dt_rdv <= date_limite:
                 candidats_filtres.append(rdv)
 
-    print(f"{len(candidats_filtres)} RDV candidats dans la fenêtre de 7 jours.")
+    logger.info("RDV candidats dans la fenêtre", extra={"rdv": rdv_id, "nb_candidats": len(candidats_filtres),
+                                                        "jours": FENETRE_CANDIDATS_JOURS})
     return poseurs_libres, candidats_filtres, rdv_annule
 
 
+# ------------------------------
+# Index des candidats
+# ------------------------------
+
+class CandidateIndex:
+    """
+    Index des RDV candidats, construit en un seul passage :
+    chaque candidat est rangé par (durée, taille d'équipe), avec ses noms de poseurs et de
+    poseurs recommandés précalculés (frozensets). Chaque filtre de phase devient une lecture
+    de dictionnaire au lieu d'un parcours complet des candidats.
+    Les résultats conservent l'ordre de la liste d'origine.
+    """
+
+    def __init__(self, candidats):
+        self.candidats = list(candidats)
+        self._par_equipe = {}          # (durée, frozenset des poseurs) -> [rang]
+        self._par_taille = {}          # (durée, nb poseurs) -> [rang]
+        self._par_poseur = {}          # (durée, nb poseurs, poseur) -> [rang]
+        self._par_recommande = {}      # (durée, nb poseurs, poseur recommandé) -> [rang]
+        for rang, c in enumerate(self.candidats):
+            users = [u["username"] for u in c.get("users", [])]
+            recommandes = frozenset(u["username"] for u in c.get("users_recommended", []))
+            duree = c.get("duree")
+            taille = (duree, len(users))
+            self._par_equipe.setdefault((duree, frozenset(users)), []).append(rang)
+            self._par_taille.setdefault(taille, []).append(rang)
+            for nom in frozenset(users):
+                self._par_poseur.setdefault((*taille, nom), []).append(rang)
+            for nom in recommandes:
+                self._par_recommande.setdefault((*taille, nom), []).append(rang)
+
+    def _rdv(self, rangs):
+        return [self.candidats[rang] for rang in rangs]
+
+    def _union(self, index, cles):
+        rangs = set()
+        for cle in cles:
+            rangs.update(index.get(cle, ()))
+        return self._rdv(sorted(rangs))
+
+    def meme_equipe(self, duree, users):
+        return self._rdv(self._par_equipe.get((duree, frozenset(users)), ()))
+
+    def meme_taille(self, duree, nb):
+        return self._rdv(self._par_taille.get((duree, nb), ()))
+
+    def poseur_commun(self, duree, users):
+        return self._union(self._par_poseur, [(duree, len(users), nom) for nom in set(users)])
+
+    def poseur_recommande(self, duree, users):
+        return self._union(self._par_recommande, [(duree, len(users), nom) for nom in set(users)])
+
+
+def _index(candidats):
+    return candidats if isinstance(candidats, CandidateIndex) else CandidateIndex(candidats)
+
+
 # ------------------------------
 # Fonctions de filtrage par phase
+# (candidats : liste de RDV ou CandidateIndex, à construire une fois pour toutes les phases)
 # ------------------------------
 
 def filtrer_phase1(rdv_annule, candidats):
@@ -87,15 +144,8 @@ def filtrer_phase1(rdv_annule, candidats):
     PHASE 1 : même durée, même équipe.
     """
     duree_annule = rdv_annule.get("duree", "1")
-    users_annule = {u["username"] for u in rdv_annule.get("users", [])}
-    
-    phase1 = []
-    for c in candidats:
-        if c.get("duree") == duree_annule:
-            users_c = {u["username"] for u in c.get("users", [])}
-            if users_c == users_annule:
-                phase1.append(c)
-    return phase1
+    users_annule = [u["username"] for u in rdv_annule.get("users", [])]
+    return _index(candidats).meme_equipe(duree_annule, users_annule)
 
 
 def filtrer_phase2(rdv_annule, candidats):
@@ -104,18 +154,7 @@ def filtrer_phase2(rdv_annule, candidats):
     """
     duree_annule = rdv_annule.get("duree", "1")
     users_annule = [u["username"] for u in rdv_annule.get("users", [])]
-    nb_annule = len(users_annule)
-    set_annule = set(users_annule)
-
-    phase2 = []
-    for c in candidats:
-        if c.get("duree") == duree_annule:
-            users_c = [u["username"] for u in c.get("users", [])]
-            if len(users_c) == nb_annule:
-                set_c = set(users_c)
-                if set_annule & set_c:  # intersection
-                    phase2.append(c)
-    return phase2
+    return _index(candidats).poseur_commun(duree_annule, users_annule)
 
 
 def filtrer_phase2b(rdv_annule, candidats):
@@ -124,19 +163,7 @@ def filtrer_phase2b(rdv_annule, candidats):
     """
     duree_annule = rdv_annule.get("duree", "1")
     users_annule = [u["username"] for u in rdv_annule.get("users", [])]
-    nb_annule = len(users_annule)
-    set_annule = set(users_annule)
-
-    phase2b = []
-    for c in candidats:
-        if c.get("duree") == duree_annule:
-            users_c = [u["username"] for u in c.get("users", [])]
-            if len(users_c) == nb_annule:
-                recommended_c = [u for u in c.get("users_recommended", [])]
-                recommended_names = set(u["username"] for u in recommended_c)
-                if set_annule & recommended_names:
-                    phase2b.append(c)
-    return phase2b
+    return _index(candidats).poseur_recommande(duree_annule, users_annule)
 
 
 def filtrer_phase2c(rdv_annule, candidats):
@@ -144,20 +171,12 @@ def filtrer_phase2c(rdv_annule, candidats):
     PHASE 2.6 : même durée, même nb poseurs, pas de contrainte de commun.
     """
     duree_annule = rdv_annule.get("duree", "1")
-    users_annule = rdv_annule.get("users", [])
-    nb_annule = len(users_annule)
-
-    phase2c = []
-    for c in candidats:
-        if c.get("duree") == duree_annule:
-            users_c = c.get("users", [])
-            if len(users_c) == nb_annule:
-                phase2c.append(c)
-    return phase2c
+    nb_annule = len(rdv_annule.get("users", []))
+    return _index(candidats).meme_taille(duree_annule, nb_annule)
 
 
 def filtrer_phase3(rdv_annule, candidats):
     """
     PHASE 3 : ex. autoriser durée <= duree_annule (non implémenté ici).
     """
-    return candidats
+    return _index(candidats).candidats
@@ -1,34 +1,156 @@
 import json
 import requests
 import os
-import sys
-
-sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+import threading
+import time
 
+from copy import deepcopy
 from datetime import datetime, timedelta
 from math import radians, sin, cos, sqrt, atan2
-from authentification import get_api_session
+from disc_client import get_disc_client
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Durée de validité (secondes) des journées /by-dates chargées pour un remplacement de RDV
+REMPLACEMENT_CACHE_TTL = float(os.environ.get("REMPLACEMENT_CACHE_TTL", 120))
+
+# Nombre de jours de la fenêtre des RDV candidats, à partir de la date d'annulation
+FENETRE_CANDIDATS_JOURS = 7
 
-def charger_rendez_vous(fichier="data/rendez_vous.json"):
+
+class WindowCache:
     """
-    Récupère les rendez-vous depuis l’API externe
-    (exemple d’appel).
+    Cache à durée de vie limitée (TTL) des RDV /rvinterventions/by-dates, rangés par semaine
+    (clé : lundi) puis par jour de début (daterv). Seules les journées absentes du cache sont
+    demandées à l'API : des remplacements successifs sur la même semaine réutilisent les
+    journées déjà chargées. Une erreur API n'est pas mise en cache.
     """
-    base_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
-    endpoint = "/api/rvinterventions/by-dates?datestart=24/02/2025&dateend=25/03/2025"
-    url = f"{base_url}{endpoint}"
 
+    def __init__(self, ttl=REMPLACEMENT_CACHE_TTL):
+        self._ttl = ttl
+        self._semaines = {}
+        self._lock = threading.Lock()
+
+    def jours(self, date_debut, date_fin, fetch):
+        """
+        RDV des journées [date_debut, date_fin] : {jour: [rdv, ...]} (copies, modifiables par l'appelant).
+        fetch(debut, fin) charge les RDV de [debut, fin] (liste), None en cas d'erreur ; il n'est
+        appelé qu'une fois, sur l'intervalle couvrant les journées manquantes.
+        """
+        jours = [date_debut + timedelta(days=k) for k in range((date_fin - date_debut).days + 1)]
+        now = time.monotonic()
+        with self._lock:
+            # Purge des journées expirées
+            for lundi, semaine in list(self._semaines.items()):
+                for jour in [j for j, (loaded_at, _) in semaine.items() if now - loaded_at >= self._ttl]:
+                    del semaine[jour]
+                if not semaine:
+                    del self._semaines[lundi]
+            manquants = [jour for jour in jours if jour not in self._semaines.get(_lundi(jour), {})]
+        if manquants:
+            rdvs = fetch(manquants[0], manquants[-1])
+            if rdvs is not None:
+                par_jour = {manquants[0] + timedelta(days=k): []
+                            for k in range((manquants[-1] - manquants[0]).days + 1)}
+                for rdv in rdvs:
+                    jour = _jour_rdv(rdv)
+                    if jour in par_jour:
+                        par_jour[jour].append(rdv)
+                loaded_at = time.monotonic()
+                with self._lock:
+                    for jour, rdvs_jour in par_jour.items():
+                        self._semaines.setdefault(_lundi(jour), {})[jour] = (loaded_at, rdvs_jour)
+        with self._lock:
+            trouves = {jour: self._semaines.get(_lundi(jour), {}).get(jour) for jour in jours}
+            return {jour: deepcopy(entry[1]) for jour, entry in trouves.items() if entry is not None}
+
+    def invalidate(self):
+        """Vide le cache (ex. après mise à jour des RDV dans le DISC)."""
+        with self._lock:
+            self._semaines.clear()
+
+
+def _lundi(jour):
+    return jour - timedelta(days=jour.weekday())
+
+
+def _jour_rdv(rdv):
+    dt_str = rdv.get("daterv", "")
+    return datetime.fromisoformat(dt_str.split("+")[0]).date() if dt_str else None
+
+
+fenetres_rdv = WindowCache()
+
+
+def charger_rdv(rdv_id):
+    """
+    Récupère un RDV par son identifiant (/api/rvinterventions/{id}) ; None s'il est introuvable.
+    """
+    base_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
+    url = f"{base_url}/api/rvinterventions/{rdv_id}"
     try:
-        session = get_api_session()
-        response = session.get(url)
+        response = get_disc_client().get(url)
+        if response.status_code == 404:
+            return None
         response.raise_for_status()
+        return response.json()
+    except requests.RequestException as e:
+        logger.error("Erreur lors de l'appel à l'API : %s", e, extra={"rdv": rdv_id})
+        return None
 
-        interventions = response.json()
-        return interventions
 
-    except requests.RequestException as e:
-        print(f"❌ Erreur lors de l'appel à l'API : {e}")
-        return []
+def charger_fenetre(date_debut, date_fin):
+    """
+    Récupère les RDV des journées [date_debut, date_fin] (dates) depuis /rvinterventions/by-dates,
+    au format [{"date": ..., "rvs": [...]}, ...] (un RDV par jour de début, daterv), via le cache
+    fenetres_rdv. Le résultat est une copie : l'appelant peut le modifier.
+    """
+    base_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
+
+    def fetch(debut, fin):
+        endpoint = (f"/api/rvinterventions/by-dates?datestart={debut.strftime('%d/%m/%Y')}"
+                    f"&dateend={fin.strftime('%d/%m/%Y')}")
+        url = f"{base_url}{endpoint}"
+        try:
+            response = get_disc_client().get(url)
+            response.raise_for_status()
+            jours = response.json()
+        except requests.RequestException as e:
+            logger.error("Erreur lors de l'appel à l'API : %s", e, extra={"url": url})
+            return None
+        # Un RDV sur plusieurs journées peut figurer dans chacune d'elles : dédoublonnage par id
+        rdvs = {}
+        for jour_data in jours:
+            for rdv in jour_data.get("rvs", []):
+                rdvs.setdefault(rdv.get("id") or id(rdv), rdv)
+        return list(rdvs.values())
+
+    jours = fenetres_rdv.jours(date_debut, date_fin, fetch)
+    return [{"date": jour.isoformat(), "rvs": rvs} for jour, rvs in sorted(jours.items())]
+
+
+def trouver_rdv(employe, date_debut, date_fin=None):
+    """
+    Identifiant (str) du RDV de l'employé (id ou nom d'utilisateur) qui commence dans
+    [date_debut, date_fin] (le plus proche de date_debut), d'après les journées /by-dates ;
+    None si aucun. Sert aux appels de /remplacement-rdv à l'ancien format (sans idRdv).
+    """
+    debut = date_debut.replace(tzinfo=None)
+    fin = (date_fin or date_debut).replace(tzinfo=None)
+    trouves = []
+    for jour_data in charger_fenetre(debut.date(), fin.date()):
+        for rdv in jour_data.get("rvs", []):
+            dt_str = rdv.get("daterv", "")
+            if not dt_str:
+                continue
+            if not any(str(employe) in (str(u.get("id")), u.get("username")) for u in rdv.get("users", [])):
+                continue
+            dt_rdv = datetime.fromisoformat(dt_str.split("+")[0])
+            if debut <= dt_rdv <= fin:
+                trouves.append((dt_rdv - debut, str(rdv["id"])))
+    return min(trouves)[1] if trouves else None
+
 
 def calculer_distance(coord1, coord2):
     """
@@ -0,0 +1,231 @@
+"""
+Acquisition asynchrone des données DISC pour les étapes de tri.
+
+Même résultat que optimisationTournee_tri / nvAffectation_tri, mais les appels
+(/rvinterventions/by-dates, /typeusers, /chantiers/{id}) partent en parallèle, bornés
+par un sémaphore : la latence totale tend vers celle de l'appel le plus long au lieu
+de la somme des allers-retours. Les rendez-vous transformés sont produits au fil de
+l'eau, dès que le GPS de leur chantier est connu.
+"""
+
+import asyncio
+import functools
+import os
+import ssl
+from datetime import datetime
+
+import certifi
+import httpx
+
+from chantiers import collecter_chantiers
+from disc_client import (
+    DISC_BACKOFF,
+    DISC_CONNECT_TIMEOUT,
+    DISC_READ_TIMEOUT,
+    DISC_RETRIES,
+    DiscAuthError,
+    get_disc_client,
+    is_auth_failure,
+)
+from utils import to_datetime
+from logs import get_logger
+import Fonction1_Optimisation.optimisationTournee_tri as optimisation_tri
+import Fonction2_nvAffectation.nvAffectation_tri as nvAffectation_tri_module
+
+logger = get_logger(__name__)
+
+# Nombre maximal d'appels DISC simultanés pendant l'acquisition
+ASYNC_MAX_CONCURRENCY = int(os.environ.get("ASYNC_MAX_CONCURRENCY", 16))
+
+# Codes HTTP pour lesquels l'appel est retenté avec attente exponentielle
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+@functools.lru_cache(maxsize=1)
+def _ssl_context():
+    # Le contexte TLS (chargement des certificats) est coûteux : créé une fois par processus
+    return ssl.create_default_context(cafile=certifi.where())
+
+
+class AsyncDiscSession:
+    """
+    Session httpx asynchrone authentifiée avec les cookies du client DISC synchrone.
+    En cas de session expirée, la reconnexion est faite une seule fois (via DiscClient.relogin)
+    pour toutes les requêtes en vol.
+    """
+
+    def __init__(self, max_concurrency=ASYNC_MAX_CONCURRENCY):
+        self._disc = get_disc_client()
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._relogin_lock = asyncio.Lock()
+        self._cookies_generation = 0
+        self._max_concurrency = max_concurrency
+        self._client = None
+
+    async def __aenter__(self):
+        session = await asyncio.to_thread(lambda: self._disc.session)
+        self._client = httpx.AsyncClient(
+            cookies=session.cookies,
+            timeout=httpx.Timeout(DISC_READ_TIMEOUT, connect=DISC_CONNECT_TIMEOUT),
+            limits=httpx.Limits(max_connections=self._max_concurrency),
+            follow_redirects=True,
+            verify=_ssl_context(),
+        )
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+
+    async def _relogin(self, generation):
+        async with self._relogin_lock:
+            if self._cookies_generation == generation:
+                session = await asyncio.to_thread(self._disc.relogin)
+                self._client.cookies = session.cookies
+                self._cookies_generation += 1
+
+    async def _send(self, url):
+        for attempt in range(DISC_RETRIES + 1):
+            response = await self._client.get(url)
+            if response.status_code not in RETRY_STATUSES or attempt == DISC_RETRIES:
+                return response
+            await asyncio.sleep(DISC_BACKOFF * (2 ** attempt))
+
+    async def get_json(self, url, default):
+        """GET JSON ; retourne `default` en cas d'erreur HTTP (comme les fonctions get_* synchrones)."""
+        async with self._semaphore:
+            try:
+                generation = self._cookies_generation
+                response = await self._send(url)
+                if is_auth_failure(response):
+                    logger.warning("Session DISC expirée (%s sur %s), reconnexion", response.status_code, url)
+                    await self._relogin(generation)
+                    response = await self._send(url)
+                    if is_auth_failure(response):
+                        raise DiscAuthError(f"Session DISC refusée après reconnexion ({response.status_code} sur {url})")
+                response.raise_for_status()
+                return response.json()
+            except httpx.HTTPError as e:
+                logger.warning("Erreur lors de l'appel API %s : %s", url, e)
+                return default
+
+
+async def _stream(tri_module, win_start, win_end, poseurs, session):
+    """
+    Produit des couples (position, rdv transformé), position étant le rang de l'intervention
+    dans la réponse /rvinterventions/by-dates.
+    """
+    base_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
+    interventions_task = asyncio.create_task(
+        session.get_json(tri_module.interventions_url(win_start, win_end), [])
+    )
+    roster_task = None
+    if poseurs is None:
+        poseurs = tri_module.poseur_roster.peek()
+    if poseurs is None:
+        roster_task = asyncio.create_task(session.get_json(f"{base_url}/api/typeusers", []))
+
+    jours_interventions = await interventions_task
+    if roster_task is not None:
+        poseurs = tri_module.poseur_roster.store(tri_module.extraire_poseur_ids(await roster_task))
+
+    # GPS : embarqués dans la réponse, sinon récupérés en parallèle
+    gps_par_chantier, ids_manquants = collecter_chantiers(jours_interventions)
+    gps_par_chantier[None] = []
+
+    async def fetch_gps(id_chantier):
+        chantier = await session.get_json(f"{base_url}/api/chantiers/{id_chantier}", None)
+        return id_chantier, (chantier.get("gps") if chantier is not None else [])
+
+    gps_tasks = {asyncio.create_task(fetch_gps(id_chantier)) for id_chantier in ids_manquants}
+
+    # Interventions en attente du GPS de leur chantier
+    en_attente = {}
+    position = 0
+    for jour in jours_interventions or []:
+        for interv in jour.get("rvs") or []:
+            id_chantier = (interv.get("chantier") or {}).get("id")
+            if id_chantier in gps_par_chantier:
+                transformed = tri_module.filter_and_transform_intervention(
+                    interv, win_start, win_end, gps_par_chantier, poseurs
+                )
+                if transformed:
+                    yield position, transformed
+            else:
+                en_attente.setdefault(id_chantier, []).append((position, interv))
+            position += 1
+
+    while gps_tasks:
+        done, gps_tasks = await asyncio.wait(gps_tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            id_chantier, gps = task.result()
+            gps_par_chantier[id_chantier] = gps
+            for pos, interv in en_attente.pop(id_chantier, []):
+                transformed = tri_module.filter_and_transform_intervention(
+                    interv, win_start, win_end, gps_par_chantier, poseurs
+                )
+                if transformed:
+                    yield pos, transformed
+
+
+def _fenetre_optimisation(data):
+    nb_jours = data.get("nbJours", 0)
+    if nb_jours <= 0:
+        return None
+    today = datetime.now()
+    opt_start = datetime(today.year, today.month, today.day)
+    return opt_start, optimisation_tri.add_workdays(opt_start, nb_jours)
+
+
+async def stream_optimisation_rdvs(data, poseurs=None, max_concurrency=ASYNC_MAX_CONCURRENCY):
+    """Produit les rendez-vous de optimisationTournee_tri au fur et à mesure (sans doublon d'id_rdv)."""
+    fenetre = _fenetre_optimisation(data)
+    if fenetre is None:
+        return
+    seen_ids = set()
+    async with AsyncDiscSession(max_concurrency) as session:
+        async for _, rdv in _stream(optimisation_tri, *fenetre, poseurs, session):
+            if rdv["id_rdv"] not in seen_ids:
+                seen_ids.add(rdv["id_rdv"])
+                yield rdv
+
+
+async def optimisationTournee_tri_async(data, poseurs=None, max_concurrency=ASYNC_MAX_CONCURRENCY):
+    """Équivalent asynchrone de optimisationTournee_tri (même liste, même ordre)."""
+    fenetre = _fenetre_optimisation(data)
+    if fenetre is None:
+        return []
+    async with AsyncDiscSession(max_concurrency) as session:
+        resultats = [item async for item in _stream(optimisation_tri, *fenetre, poseurs, session)]
+    resultats.sort(key=lambda item: item[0])
+    unique_interventions = {}
+    for _, rdv in resultats:
+        unique_interventions[rdv["id_rdv"]] = rdv
+    return list(unique_interventions.values())
+
+
+async def stream_nvAffectation_rdvs(data, poseurs=None, max_concurrency=ASYNC_MAX_CONCURRENCY):
+    """Produit les rendez-vous de nvAffectation_tri au fur et à mesure (sans doublon d'id_rdv)."""
+    remp_start = to_datetime(data.get("dateDebut"))
+    remp_end = to_datetime(data.get("dateFin"))
+    seen_ids = set()
+    async with AsyncDiscSession(max_concurrency) as session:
+        async for _, rdv in _stream(nvAffectation_tri_module, remp_start, remp_end, poseurs, session):
+            if rdv["id_rdv"] not in seen_ids:
+                seen_ids.add(rdv["id_rdv"])
+                yield rdv
+
+
+async def nvAffectation_tri_async(data, poseurs=None, max_concurrency=ASYNC_MAX_CONCURRENCY):
+    """Équivalent asynchrone de nvAffectation_tri (même liste, même ordre)."""
+    remp_start = to_datetime(data.get("dateDebut"))
+    remp_end = to_datetime(data.get("dateFin"))
+    async with AsyncDiscSession(max_concurrency) as session:
+        resultats = [item async for item in _stream(nvAffectation_tri_module, remp_start, remp_end, poseurs, session)]
+    resultats.sort(key=lambda item: item[0])
+    output_list = []
+    seen_ids = set()
+    for _, rdv in resultats:
+        if rdv["id_rdv"] not in seen_ids:
+            output_list.append(rdv)
+            seen_ids.add(rdv["id_rdv"])
+    return output_list
@@ -1,21 +1,44 @@
-from fastapi import FastAPI, Request
+import os
+from fastapi import FastAPI, Request, HTTPException
+from fastapi.encoders import jsonable_encoder
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pydantic import BaseModel, conint, constr, root_validator
-from datetime import datetime
+from datetime import date, datetime
+from typing import Literal, Optional
 
 # Importer la fonction de traitement d'optimisation
 from Fonction1_Optimisation.optimisation_handler import run_optimisation
 from Fonction2_nvAffectation.nvAffectation_handler import run_nvAffectation
+from Fonction3_replace.replace_handler import run_optimisation_remplacement
+from Fonction3_replace.replace_utils import trouver_rdv
+from Fonction1_Optimisation.optimisationTournee_tri import poseur_roster as optimisation_roster
+from Fonction2_nvAffectation.nvAffectation_tri import poseur_roster as nvAffectation_roster
+from jobs import JobManager
+from telemetry import RequestReport, metrics
+from Fonction1_Optimisation.optimisationTournee_distances import travel_time_cache
+from logs import get_logger
 
 app = FastAPI()
 
+logger = get_logger(__name__)
+
+# Nombre maximal de traitements simultanés par endpoint
+JOB_LIMITS = {
+    "optimisation": int(os.environ.get("JOB_LIMIT_OPTIMISATION", 1)),
+    "remplacement-ressource": int(os.environ.get("JOB_LIMIT_REMPLACEMENT", 2)),
+}
+
+# File de jobs : les traitements synchrones (requêtes DISC, OR-Tools) tournent hors de la boucle d'événements
+jobs = JobManager(limits=JOB_LIMITS)
+
 # Gestion personnalisée des erreurs de validation
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
     return JSONResponse(
         status_code=400,
-        content={"fonctionLancee": 0, "message": exc.errors()}
+        # jsonable_encoder : les erreurs des root_validator portent l'exception (non sérialisable) dans "ctx"
+        content={"fonctionLancee": 0, "message": jsonable_encoder(exc.errors())}
     )
 
 # =====================
@@ -25,12 +48,20 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
 # Pour /optimisation
 class OptimizationRequest(BaseModel):
     nbJours: conint(gt=0)
+    # Nombre de processus pour résoudre les périodes en parallèle (défaut : SOLVE_WORKERS)
+    solveWorkers: Optional[conint(gt=0)] = None
+    # Si vrai, aucun PATCH n'est envoyé : le résultat liste les changements prévus
+    dryRun: bool = False
+    # Moteur : "periode" (un modèle par demi‑journée) ou "horizon" (un modèle global) ; défaut : OPTIM_ENGINE
+    moteur: Optional[Literal["periode", "horizon"]] = None
 
 # Pour /remplacement-ressource
 class ResourceReplacementRequest(BaseModel):
     employeAbsent: str
     dateDebut: datetime
     dateFin: datetime
+    # Moteur : "glouton" (RDV par RDV) ou "cpsat" (tous les RDV ensemble) ; défaut : REAFFECTATION_ENGINE
+    moteur: Optional[Literal["glouton", "cpsat"]] = None
 
     @root_validator(skip_on_failure=True)
     def check_dates(cls, values):
@@ -44,11 +75,19 @@ class ResourceReplacementRequest(BaseModel):
 position_regex = r'^\s*-?\d+(\.\d+)?\s*,\s*-?\d+(\.\d+)?\s*$'
 
 class AppointmentReplacementRequest(BaseModel):
-    employe: str
-    dateDebut: datetime
-    dateFin: datetime
-    positionAvant: constr(pattern=position_regex)
-    positionApres: constr(pattern=position_regex)
+    # RDV annulé dont le créneau est à réattribuer.
+    # Ancien format (sans idRdv) toujours accepté : le RDV est alors celui de l'employé
+    # qui commence entre dateDebut et dateFin (voir trouver_rdv).
+    idRdv: Optional[str] = None
+    # Contexte du créneau libéré (journalisé ; identifie le RDV à l'ancien format)
+    employe: Optional[str] = None
+    dateDebut: Optional[datetime] = None
+    dateFin: Optional[datetime] = None
+    positionAvant: Optional[constr(pattern=position_regex)] = None
+    positionApres: Optional[constr(pattern=position_regex)] = None
+    # Moteur : "cascade" (phases successives), "parallele" (phases simultanées) ou "cpsat" (modèle unique) ;
+    # défaut : REMPLACEMENT_ENGINE
+    moteur: Optional[Literal["cascade", "parallele", "cpsat"]] = None
 
     @root_validator(skip_on_failure=True)
     def check_dates(cls, values):
@@ -56,33 +95,82 @@ class AppointmentReplacementRequest(BaseModel):
         date_fin = values.get("dateFin")
         if date_debut and date_fin and date_debut > date_fin:
             raise ValueError("dateDebut doit être antérieure à dateFin")
+        if not values.get("idRdv") and not (values.get("employe") and date_debut):
+            raise ValueError("idRdv requis (ou, à l'ancien format, employe et dateDebut)")
         return values
 
 # =====================
 # Définition des endpoints
 # =====================
 
-@app.post("/optimisation")
+@app.post("/optimisation", status_code=202)
 async def optimisation(request_data: OptimizationRequest):
     # Convertir l'objet Pydantic en dictionnaire
     input_data = request_data.dict()
-    # Appeler la fonction d'optimisation (qui enchaîne tri puis algorithme)
-    result = run_optimisation(input_data)
-    return {"fonctionLancee": 1, "message": "Optimisation terminée", "result": result}
+    # Mettre en file la fonction d'optimisation (qui enchaîne tri puis algorithme) ;
+    # deux optimisations sur le même horizon ne sont jamais résolues en même temps
+    horizon = (date.today().isoformat(), input_data["nbJours"])
+    report = RequestReport("optimisation")
+    job = jobs.submit("optimisation", run_optimisation, input_data, report, key=horizon, report=report)
+    return {"fonctionLancee": 1, "message": "Optimisation lancée", "jobId": job.id}
 
-@app.post("/remplacement-ressource")
+@app.post("/remplacement-ressource", status_code=202)
 async def remplacement_ressource(request_data: ResourceReplacementRequest):
     input_data = request_data.dict()
-    result = run_nvAffectation(input_data)
-    return {"fonctionLancee": 1, "message": "Tout est OK", "result": result}
+    report = RequestReport("remplacement-ressource")
+    job = jobs.submit("remplacement-ressource", run_nvAffectation, input_data, report,
+                      key=input_data["employeAbsent"], report=report)
+    return {"fonctionLancee": 1, "message": "Remplacement lancé", "jobId": job.id}
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    job = jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} introuvable")
+    return job.to_dict()
 
 @app.post("/remplacement-rdv")
-async def remplacement_rdv(request_data: AppointmentReplacementRequest):
-    print(
-        f"Remplacement du rendez-vous pour l'employé {request_data.employe} "
-        f"du {request_data.dateDebut} au {request_data.dateFin}."
-    )
-    print(
-        f"Créneau : position avant {request_data.positionAvant}, position après {request_data.positionApres}."
-    )
-    return {"fonctionLancee": 1, "message": "Tout est OK"}
+def remplacement_rdv(request_data: AppointmentReplacementRequest):
+    # Traitement court (une semaine de RDV, mise en cache) : réponse directe, sans job.
+    # Fonction synchrone : FastAPI l'exécute dans son pool de threads.
+    logger.info("remplacement du rdv", extra={
+        "rdv": request_data.idRdv, "employe": request_data.employe,
+        "debut": request_data.dateDebut, "fin": request_data.dateFin,
+    })
+    report = RequestReport("remplacement-rdv")
+    rdv_id = request_data.idRdv
+    if rdv_id is None:
+        # Ancien format : RDV de l'employé sur le créneau indiqué
+        with report.stage("identification"):
+            rdv_id = trouver_rdv(request_data.employe, request_data.dateDebut, request_data.dateFin)
+        if rdv_id is None:
+            return {
+                "fonctionLancee": 1,
+                "message": f"Aucun remplacement possible (aucun RDV de {request_data.employe} sur ce créneau)",
+                "affectations": [],
+                "rapport": report.to_dict(),
+            }
+    result = run_optimisation_remplacement(rdv_id, report, request_data.moteur)
+    return {"fonctionLancee": 1, **result, "rapport": report.to_dict()}
+
+def travel_cache_metrics():
+    stats = travel_time_cache.stats()
+    return [
+        ("zabal_travel_cache_entries", {}, stats["size"]),
+        ("zabal_travel_cache_hits", {}, stats["hits"]),
+        ("zabal_travel_cache_misses", {}, stats["misses"]),
+    ]
+
+metrics.add_collector(travel_cache_metrics)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    # Métriques du processus au format Prometheus (durées par étape, taille des modèles, cache des trajets)
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+@app.post("/poseurs/refresh")
+async def poseurs_refresh():
+    # Vide le cache de la liste des poseurs (ex. nouvelle embauche) sans redémarrer
+    optimisation_roster.invalidate()
+    nvAffectation_roster.invalidate()
+    return {"fonctionLancee": 1, "message": "Liste des poseurs rechargée au prochain appel"}
@@ -2,30 +2,36 @@ import os
 import requests
 import re
 
-# Variable privée pour stocker la session unique
-_session = None
+from logs import get_logger
 
-def login_to_api():
+logger = get_logger(__name__)
+
+def login_to_api(session=None, api_url=None, timeout=None):
     """
     Se connecte à l'API en récupérant d'abord le jeton CSRF.
+
+    session : session requests à authentifier (une nouvelle session est créée si absente).
+    timeout : délais (connexion, lecture) des deux requêtes de login, transmis à requests.
      """
-    api_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
+    if api_url is None:
+        api_url = os.environ.get("API_URL", "https://preprod.disc-chantier.com")
     login_url = f"{api_url}/login"
-    print(f"📡 Connexion à l'API : {api_url}")
+    logger.info("Connexion à l'API : %s", api_url)
 
     # Création d'une session pour gérer les cookies
-    session = requests.Session()
+    if session is None:
+        session = requests.Session()
 
     # 1️⃣ Étape 1 : Récupérer la page de login pour extraire le token CSRF
-    response = session.get(login_url)
+    response = session.get(login_url, timeout=timeout)
     if response.status_code != 200:
-        print(f"❌ Erreur en récupérant la page de login ({response.status_code})")
+        logger.error("Erreur en récupérant la page de login (%s)", response.status_code)
         return None
 
     # Extraire le jeton CSRF du HTML
     match = re.search(r'name="_csrf_token"\s+value="([^"]+)"', response.text)
     if not match:
-        print("🚨 Impossible de récupérer le jeton CSRF. Vérifiez si la page de login a changé.")
+        logger.error("Impossible de récupérer le jeton CSRF. Vérifiez si la page de login a changé.")
         return None
 
     csrf_token = match.group(1)
@@ -38,24 +44,22 @@ def login_to_api():
         '_csrf_token': csrf_token  # Ajout du token CSRF
     }
 
-    response = session.post(login_url, data=login_data, allow_redirects=False)
-
-    print("login",login_data)
+    response = session.post(login_url, data=login_data, allow_redirects=False, timeout=timeout)
 
     # Vérification de la connexion
     if response.status_code in [302, 200]:  # 302 = redirection après connexion réussie
-        print("✅ Connexion réussie !")
+        logger.info("Connexion réussie", extra={"login": login_data["_username"]})
     else:
-        print(f"❌ Erreur de connexion ({response.status_code}) : {response.text}")
+        logger.error("Erreur de connexion (%s)", response.status_code)
+        logger.debug("Réponse de login : %s", response.text)
         return None
 
     return session
 
 def get_api_session():
     """
-    Retourne l'objet session unique pour accéder à l'API.
+    Retourne la session authentifiée du client DISC unique (voir disc_client.get_disc_client).
+    Préférer le client lui-même, qui gère la reconnexion automatique.
     """
-    global _session
-    if _session is None:
-        _session = login_to_api()
-    return _session
+    from disc_client import get_disc_client
+    return get_disc_client().session
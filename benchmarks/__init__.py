@@ -0,0 +1,4 @@
+"""
+Banc d'essai hors ligne : données DISC synthétiques, serveur DISC local et mesures
+de latence, mémoire et qualité des trois fonctions (voir run_benchmarks).
+"""
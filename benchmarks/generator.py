@@ -0,0 +1,168 @@
+"""
+Génération de données DISC synthétiques, au format des réponses réelles
+(voir Fonction3_replace/parse_jsonne.py pour un exemple d'intervention) :
+
+  - /api/typeusers                 : groupes d'utilisateurs, dont "Poseur"
+  - /api/rvinterventions/by-dates  : [{"date": ..., "rvs": [intervention, ...]}, ...]
+  - /api/chantiers/{id}            : chantier avec son champ "gps"
+
+La génération est déterministe pour une graine donnée.
+"""
+
+import random
+from datetime import date, datetime, timedelta, timezone
+
+# Fuseau horaire des dates DISC (heure d'hiver de Paris)
+PARIS = timezone(timedelta(hours=1))
+
+# Zone géographique des chantiers (Pays basque)
+LAT_RANGE = (43.25, 43.55)
+LON_RANGE = (-1.65, -1.10)
+
+# Durées usuelles d'une intervention (minutes) et créneaux de début
+DUREES = (60, 90, 120, 180, 240)
+HEURES_DEBUT = (8, 9, 10, 11, 14, 15, 16)
+
+# Un poseur pour environ RDV_PAR_POSEUR interventions sur l'horizon (au moins 4)
+RDV_PAR_POSEUR = 12
+
+STATUTS_MARCHANDISE = (
+    {"id": 4, "nom": "Commandé", "css_class": "commande", "color": "#0070c0", "place": "4"},
+    {"id": 5, "nom": "Réceptionné", "css_class": "receptionne", "color": "#b8cce4", "place": "5"},
+    {"id": 6, "nom": "Livré", "css_class": "livre", "color": "#92d050", "place": "6"},
+)
+
+VILLES = (("Anglet", "64600"), ("Bayonne", "64100"), ("Biarritz", "64200"),
+          ("Hasparren", "64240"), ("Ustaritz", "64480"), ("Cambo-les-Bains", "64250"))
+
+
+def jours_ouvres(start_date, nb_jours):
+    """Les nb_jours premiers jours ouvrés (lundi‑vendredi) à partir de start_date inclus."""
+    jours = []
+    current = start_date
+    while len(jours) < nb_jours:
+        if current.weekday() < 5:
+            jours.append(current)
+        current += timedelta(days=1)
+    return jours
+
+
+def _iso(dt):
+    return dt.replace(tzinfo=PARIS).isoformat()
+
+
+def _gps(rnd):
+    return f"{rnd.uniform(*LAT_RANGE):.6f}, {rnd.uniform(*LON_RANGE):.6f}"
+
+
+def generate_disc_data(n, seed=0, nb_jours=10, start_date=None):
+    """
+    Génère n interventions réparties sur nb_jours jours ouvrés à partir de start_date
+    (aujourd'hui par défaut), avec les poseurs et les chantiers correspondants.
+
+    Retourne {"typeusers": [...], "jours": [...], "chantiers": {id: chantier}, "poseurs": [...]}.
+    """
+    rnd = random.Random(seed)
+    start_date = start_date or date.today()
+    jours = jours_ouvres(start_date, nb_jours)
+
+    nb_poseurs = max(4, n // RDV_PAR_POSEUR)
+    poseurs = [{"id": 100 + i, "username": f"Poseur {i + 1}", "color": "#%06x" % rnd.randrange(1 << 24), "status": 0}
+               for i in range(nb_poseurs)]
+    a_planifier = {"id": 39, "username": "À planifier", "color": "white"}
+    typeusers = [
+        {"id": 1, "nom": "Poseur", "users": poseurs},
+        {"id": 2, "nom": "Administratif", "users": [{"id": 1, "username": "Bureau", "status": 0}]},
+    ]
+
+    # Environ deux interventions par chantier
+    nb_chantiers = max(1, n // 2)
+    chantiers = {}
+    for i in range(nb_chantiers):
+        chantier_id = 2000 + i
+        ville, codepostal = rnd.choice(VILLES)
+        chantiers[chantier_id] = {
+            "id": chantier_id,
+            "numchantier": f"{rnd.randrange(10000, 99999):05d}",
+            "adresse": f"{rnd.randrange(1, 120)} rue des ajoncs",
+            "ville": ville,
+            "codepostal": codepostal,
+            "gps": _gps(rnd),
+            "infos_prepa": "",
+            "observation": "",
+            "client": {"id": 5000 + i, "fullname": f"CLIENT {i}", "clientContacts": []},
+        }
+
+    par_jour = {jour: [] for jour in jours}
+    for i in range(n):
+        jour = rnd.choice(jours)
+        duree = rnd.choice(DUREES)
+        debut = datetime.combine(jour, datetime.min.time()).replace(hour=rnd.choice(HEURES_DEBUT))
+        fin = debut + timedelta(minutes=duree)
+
+        # Fenêtre client : quelques jours autour du rendez‑vous, même demi‑journée
+        fenetre_debut = debut - timedelta(days=rnd.randint(0, 3))
+        fenetre_fin = fenetre_debut + timedelta(days=rnd.randint(2, 7), hours=3)
+
+        nb_intervenants = rnd.choice((1, 1, 1, 2))
+        equipe = rnd.sample(poseurs, nb_intervenants)
+        users = [{"id": p["id"], "username": p["username"], "color": p["color"]} for p in equipe]
+        if rnd.random() < 0.05:
+            users = [dict(a_planifier)]
+        recommandes = rnd.sample(poseurs, min(len(poseurs), rnd.randint(0, 3)))
+
+        statut = rnd.random()
+        valide = statut < 0.6
+        propose = not valide and statut < 0.8
+
+        chantier = chantiers[2000 + rnd.randrange(nb_chantiers)]
+        # Le GPS n'est pas toujours inclus dans l'intervention : il faut alors appeler /chantiers/{id}
+        chantier_embarque = dict(chantier) if rnd.random() < 0.5 else {**chantier, "gps": ""}
+
+        marchandises = []
+        for j in range(rnd.randint(0, 3)):
+            statut_march = rnd.choices(STATUTS_MARCHANDISE, weights=(1, 2, 6))[0]
+            march = {
+                "id": 8000 + i * 4 + j,
+                "fournisseur": rnd.choice(("Neobaie", "Futurol", "Mariton")),
+                "quantitenature": "1 OB2 PVC",
+                "commentaire": "",
+                "collisage": "",
+                "statusmarchandise": dict(statut_march),
+                "tempsalloue": 0,
+                "segmentationmarchandise": "SC",
+                "numARC": "",
+            }
+            if statut_march["nom"] == "Commandé":
+                march["dateARC"] = _iso(datetime.combine(jour - timedelta(days=rnd.randint(1, 10)), datetime.min.time()))
+            marchandises.append(march)
+
+        par_jour[jour].append({
+            "id": 10000 + i,
+            "daterv": _iso(debut),
+            "datervfin": _iso(fin),
+            "duree": str(duree),
+            "allday": False,
+            "dateValidatedWithClient": 1 if valide else 0,
+            "dateProposedToClient": 1 if propose else 0,
+            "criticity": rnd.randint(1, 5),
+            "datevoulueclientde": _iso(fenetre_debut),
+            "datevoulueclienta": _iso(fenetre_fin),
+            "nb_intervenants": nb_intervenants,
+            "nb_intervenants_mandatory": nb_intervenants if rnd.random() < 0.5 else None,
+            "users": users,
+            "user_recommanded": [{"id": p["id"]} for p in recommandes],
+            "users_recommended": [{"id": p["id"], "username": p["username"]} for p in recommandes],
+            "label": "",
+            "com": "",
+            "chantier": chantier_embarque,
+            "marchandises": marchandises,
+            "typeintervention": {"id": 2, "nom": "La livraison et pose"},
+        })
+
+    return {
+        "typeusers": typeusers,
+        "jours": [{"date": jour.isoformat(), "rvs": rvs} for jour, rvs in par_jour.items()],
+        "chantiers": chantiers,
+        "poseurs": poseurs,
+    }
@@ -0,0 +1,148 @@
+"""
+Serveur DISC local pour les essais hors ligne.
+
+Reproduit les routes utilisées par les trois fonctions :
+  - GET  /login                          : page contenant le jeton CSRF
+  - POST /login                          : connexion (302 + cookie de session)
+  - GET  /api/typeusers
+  - GET  /api/rvinterventions/by-dates   : toutes les journées générées (les bornes de dates ne filtrent pas,
+                                           certaines fonctions interrogent encore une plage fixe)
+  - GET  /api/rvinterventions/{id}
+  - GET  /api/chantiers/{id}
+  - PATCH /api/rvinterventions/{id}      : accepte la mise à jour et renvoie l'intervention modifiée
+"""
+
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_CHANTIER_PATH = re.compile(r"^/api/chantiers/(\d+)$")
+_INTERVENTION_PATH = re.compile(r"^/api/rvinterventions/(\d+)$")
+
+
+class MockDiscServer:
+    """
+    data : données de generator.generate_disc_data (remplaçables via set_data).
+    latency : délai (secondes) ajouté à chaque réponse, pour simuler le réseau.
+
+    Le nombre d'appels par route est compté dans `requests` (remis à zéro par reset_counts).
+    """
+
+    def __init__(self, data, latency=0.0, host="127.0.0.1", port=0):
+        self.latency = latency
+        self.requests = Counter()
+        self._lock = threading.Lock()
+        self.set_data(data)
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def set_data(self, data):
+        with self._lock:
+            self.data = data
+            self._interventions = {rv["id"]: rv for jour in data["jours"] for rv in jour["rvs"]}
+
+    def reset_counts(self):
+        with self._lock:
+            self.requests.clear()
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _count(self, route):
+        with self._lock:
+            self.requests[route] += 1
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def _send(self, status, body=b"", content_type="application/json", headers=None):
+                if server.latency:
+                    time.sleep(server.latency)
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _json(self, obj, status=200):
+                self._send(status, json.dumps(obj, ensure_ascii=False).encode("utf-8"))
+
+            def _read_body(self):
+                length = int(self.headers.get("Content-Length", 0))
+                return self.rfile.read(length) if length else b""
+
+            def do_GET(self):
+                path = self.path.split("?", 1)[0]
+                if path == "/login":
+                    server._count("login")
+                    return self._send(200, b'<input type="hidden" name="_csrf_token" value="benchmark">', "text/html")
+                if path == "/api/typeusers":
+                    server._count("typeusers")
+                    return self._json(server.data["typeusers"])
+                if path == "/api/rvinterventions/by-dates":
+                    server._count("by-dates")
+                    return self._json(server.data["jours"])
+                match = _INTERVENTION_PATH.match(path)
+                if match:
+                    server._count("rvinterventions")
+                    intervention = server._interventions.get(int(match.group(1)))
+                    if intervention is not None:
+                        return self._json(intervention)
+                match = _CHANTIER_PATH.match(path)
+                if match:
+                    server._count("chantiers")
+                    chantier = server.data["chantiers"].get(int(match.group(1)))
+                    if chantier is not None:
+                        return self._json(chantier)
+                server._count("404")
+                self._json({"detail": "Not Found"}, status=404)
+
+            def do_POST(self):
+                self._read_body()
+                if self.path.split("?", 1)[0] == "/login":
+                    server._count("login")
+                    return self._send(302, headers={"Location": "/", "Set-Cookie": "PHPSESSID=benchmark; Path=/"})
+                server._count("404")
+                self._json({"detail": "Not Found"}, status=404)
+
+            def do_PATCH(self):
+                payload = json.loads(self._read_body() or b"{}")
+                match = _INTERVENTION_PATH.match(self.path.split("?", 1)[0])
+                if match:
+                    server._count("patch")
+                    intervention = server._interventions.get(int(match.group(1)))
+                    if intervention is not None:
+                        return self._json({**intervention, **payload})
+                server._count("404")
+                self._json({"detail": "Not Found"}, status=404)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
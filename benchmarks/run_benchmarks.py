@@ -0,0 +1,213 @@
+"""
+Banc d'essai hors ligne des trois fonctions, sans accès au DISC.
+
+Pour chaque taille (nombre d'interventions), des données synthétiques sont servies par un
+serveur DISC local, puis run_optimisation, run_nvAffectation et run_optimisation_remplacement
+sont exécutées. Pour chacune sont relevés : la durée de chaque étape (RequestReport), le pic
+de mémoire Python (tracemalloc) et des indicateurs de qualité de la solution.
+
+Exemple :
+    python -m benchmarks.run_benchmarks --scales 50,500 --time-limit 5 --json resultats.json
+"""
+
+import argparse
+import json
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from datetime import date, datetime, time as dtime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, ROOT)
+
+from benchmarks.generator import generate_disc_data, jours_ouvres
+from benchmarks.mock_disc import MockDiscServer
+
+
+def _run_measured(kind, fn, *args, **kwargs):
+    """Exécute fn(*args, report, **kwargs) ; retourne (résultat, rapport, pic mémoire en Mo, erreur)."""
+    from telemetry import RequestReport
+
+    report = RequestReport(kind)
+    tracemalloc.start()
+    error = None
+    result = None
+    try:
+        result = fn(*args, report, **kwargs)
+    except Exception as exc:
+        error = f"{type(exc).__name__}: {exc}"
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, report, round(peak / 2**20, 2), error
+
+
+def _summary(kind, report, peak_mb, error, quality, server):
+    summary = {
+        "fonction": kind,
+        "etapes": {stage["etape"]: stage["duree"] for stage in report.stages},
+        "duree_totale": report.to_dict()["duree_totale"],
+        "memoire_pic_mo": peak_mb,
+        "appels_disc": dict(server.requests),
+        "qualite": quality,
+    }
+    if error:
+        summary["erreur"] = error
+    return summary
+
+
+def bench_optimisation(server, nb_jours, moteur):
+    from Fonction1_Optimisation.optimisation_handler import run_optimisation
+
+    data = {"nbJours": nb_jours, "dryRun": False, "solveWorkers": None, "moteur": moteur}
+    result, report, peak, error = _run_measured("optimisation", run_optimisation, data)
+    periods = report.periods
+    quality = {
+        "modeles": len(periods),
+        "noeuds": sum(p.get("noeuds", 0) for p in periods),
+        "abandons": sum(p.get("abandons", 0) for p in periods),
+        "objectif": sum(p.get("objectif") or 0 for p in periods),
+        "echeance_atteinte": any(p.get("echeance_atteinte") for p in periods),
+        "mises_a_jour": len(result or []),
+        "erreurs_maj": sum(1 for r in result or [] if isinstance(r, dict) and "error" in r),
+    }
+    return _summary("optimisation", report, peak, error, quality, server)
+
+
+def bench_nvAffectation(server, data, jours, moteur=None):
+    from Fonction2_nvAffectation.nvAffectation_handler import run_nvAffectation
+
+    # Absence du poseur le plus chargé sur tout l'horizon
+    charge = Counter(u["id"] for jour in data["jours"] for rv in jour["rvs"] for u in rv["users"]
+                     if u["id"] != 39)
+    absent = charge.most_common(1)[0][0]
+    request = {
+        "employeAbsent": str(absent),
+        "dateDebut": datetime.combine(jours[0], dtime(0, 0)),
+        "dateFin": datetime.combine(jours[-1], dtime(23, 59)),
+        "moteur": moteur,
+    }
+    result, report, peak, error = _run_measured("remplacement-ressource", run_nvAffectation, request)
+    modifies = result or []
+    quality = {
+        "employe_absent": absent,
+        "rdv_absent": charge[absent],
+        "modifies": len(modifies),
+        "reaffectes": sum(1 for r in modifies if r.get("date_debut") is not None),
+        "annules": sum(1 for r in modifies if r.get("date_debut") is None),
+    }
+    return _summary("remplacement-ressource", report, peak, error, quality, server)
+
+
+def bench_remplacement(server, data, moteur=None):
+    from Fonction3_replace.replace_handler import run_optimisation_remplacement
+
+    # RDV annulé : le premier de la première journée ayant une équipe réelle
+    annule = next(rv for jour in data["jours"] for rv in jour["rvs"]
+                  if rv["users"] and all(u["username"] != "À planifier" for u in rv["users"]))
+    result, report, peak, error = _run_measured("remplacement-rdv", run_optimisation_remplacement,
+                                                  str(annule["id"]), engine=moteur)
+    quality = {
+        "rdv_annule": annule["id"],
+        "message": (result or {}).get("message"),
+        "affectations": len((result or {}).get("affectations") or []),
+    }
+    return _summary("remplacement-rdv", report, peak, error, quality, server)
+
+
+def reset_caches():
+    """Vide les caches de processus pour que chaque taille parte à froid."""
+    from Fonction1_Optimisation.optimisationTournee_tri import poseur_roster as roster_optim
+    from Fonction2_nvAffectation.nvAffectation_tri import poseur_roster as roster_affectation
+    from Fonction1_Optimisation.optimisationTournee_distances import travel_time_cache
+    from Fonction3_replace.replace_utils import fenetres_rdv
+
+    roster_optim.invalidate()
+    roster_affectation.invalidate()
+    travel_time_cache.clear()
+    fenetres_rdv.invalidate()
+
+
+def run(scales, nb_jours=10, seed=0, latency=0.0, moteur=None, moteur_affectation=None, moteur_remplacement=None,
+        fonctions=("optimisation", "affectation", "remplacement")):
+    jours = jours_ouvres(date.today(), nb_jours)
+    results = []
+    with MockDiscServer(generate_disc_data(0, seed, nb_jours), latency=latency) as server:
+        # Les modules lisent API_URL au premier appel : le serveur local doit être en place avant
+        os.environ["API_URL"] = server.url
+        for n in scales:
+            data = generate_disc_data(n, seed, nb_jours)
+            server.set_data(data)
+            scale = {"rdv": n, "poseurs": len(data["poseurs"]), "fonctions": []}
+            for fonction in fonctions:
+                reset_caches()
+                server.reset_counts()
+                start = time.perf_counter()
+                if fonction == "optimisation":
+                    summary = bench_optimisation(server, nb_jours, moteur)
+                elif fonction == "affectation":
+                    summary = bench_nvAffectation(server, data, jours, moteur_affectation)
+                else:
+                    summary = bench_remplacement(server, data, moteur_remplacement)
+                summary["duree_mesuree"] = round(time.perf_counter() - start, 3)
+                scale["fonctions"].append(summary)
+            # Pic de mémoire résidente du processus (Ko sous Linux), toutes fonctions confondues
+            scale["rss_max_mo"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+            results.append(scale)
+    return results
+
+
+def print_table(results):
+    header = f"{'rdv':>6} {'fonction':<24} {'durée (s)':>10} {'mémoire (Mo)':>13}  qualité"
+    print(header)
+    print("-" * len(header))
+    for scale in results:
+        for summary in scale["fonctions"]:
+            quality = summary.get("erreur") or ", ".join(f"{k}={v}" for k, v in summary["qualite"].items())
+            print(f"{scale['rdv']:>6} {summary['fonction']:<24} {summary['duree_mesuree']:>10.3f} "
+                  f"{summary['memoire_pic_mo']:>13.2f}  {quality}")
+            for etape, duree in summary["etapes"].items():
+                print(f"{'':>6}   {etape:<22} {duree:>10.3f}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Banc d'essai hors ligne (serveur DISC local).")
+    parser.add_argument("--scales", default="50,500,5000", help="tailles (nombre d'interventions), séparées par des virgules")
+    parser.add_argument("--jours", type=int, default=10, help="nombre de jours ouvrés de l'horizon")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--latency", type=float, default=0.0, help="latence simulée par appel DISC (secondes)")
+    parser.add_argument("--time-limit", type=int, default=None, help="plafond TIME_LIMIT des modèles de tournées (secondes)")
+    parser.add_argument("--moteur", choices=("periode", "horizon"), default=None)
+    parser.add_argument("--moteur-affectation", choices=("glouton", "cpsat"), default=None)
+    parser.add_argument("--moteur-remplacement", choices=("cascade", "parallele", "cpsat"), default=None)
+    parser.add_argument("--fonctions", default="optimisation,affectation,remplacement")
+    parser.add_argument("--json", dest="json_path", default=None, help="fichier de sortie des résultats détaillés")
+    args = parser.parse_args(argv)
+
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    if args.time_limit is not None:
+        # Plafond par modèle de tournées, recopié par le moteur global à son import
+        from Fonction1_Optimisation import optimisationTournee_algo, optimisationTournee_global
+        optimisationTournee_algo.TIME_LIMIT = args.time_limit
+        optimisationTournee_global.TIME_LIMIT = args.time_limit
+
+    results = run(
+        [int(n) for n in args.scales.split(",")],
+        nb_jours=args.jours,
+        seed=args.seed,
+        latency=args.latency,
+        moteur=args.moteur,
+        moteur_affectation=args.moteur_affectation,
+        moteur_remplacement=args.moteur_remplacement,
+        fonctions=tuple(args.fonctions.split(",")),
+    )
+    print_table(results)
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(results, f, ensure_ascii=False, indent=2, default=str)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+# Nombre maximal d'appels /api/chantiers/{id} lancés en parallèle
+GPS_PREFETCH_WORKERS = int(os.environ.get("GPS_PREFETCH_WORKERS", 8))
+
+
+def collecter_chantiers(jours_interventions):
+    """
+    Parcourt la réponse de /rvinterventions/by-dates et collecte les chantiers distincts.
+
+    Retourne un tuple (gps_connus, ids_manquants) :
+      - gps_connus : {id_chantier: gps} pour les chantiers dont le GPS est déjà embarqué
+      - ids_manquants : ids des chantiers sans GPS dans la réponse
+    """
+    gps_connus = {}
+    ids_manquants = set()
+    for jour in jours_interventions or []:
+        for interv in jour.get("rvs") or []:
+            chantier = interv.get("chantier") or {}
+            id_chantier = chantier.get("id")
+            if id_chantier is None:
+                continue
+            gps = chantier.get("gps")
+            if gps and str(gps).strip():
+                gps_connus[id_chantier] = gps
+            else:
+                ids_manquants.add(id_chantier)
+    ids_manquants -= gps_connus.keys()
+    return gps_connus, ids_manquants
+
+
+def resolve_chantiers_gps(jours_interventions, fetch_gps, max_workers=GPS_PREFETCH_WORKERS):
+    """
+    Construit la table {id_chantier: gps} utilisée par l'étape de transformation.
+
+    Le GPS embarqué dans interv["chantier"] est utilisé en priorité ; seuls les chantiers
+    manquants sont récupérés via fetch_gps, en un seul lot concurrent borné par max_workers.
+    """
+    gps_par_chantier, ids_manquants = collecter_chantiers(jours_interventions)
+    if not ids_manquants:
+        return gps_par_chantier
+
+    ids = sorted(ids_manquants)
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(ids)))) as executor:
+        for id_chantier, gps in zip(ids, executor.map(fetch_gps, ids)):
+            gps_par_chantier[id_chantier] = gps
+    return gps_par_chantier
@@ -0,0 +1,165 @@
+import os
+import threading
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from authentification import login_to_api
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Taille du pool de connexions HTTP vers le DISC (doit couvrir les appels parallèles)
+DISC_POOL_SIZE = int(os.environ.get("DISC_POOL_SIZE", 16))
+
+# Délais (secondes) de connexion et de lecture pour chaque appel
+DISC_CONNECT_TIMEOUT = float(os.environ.get("DISC_CONNECT_TIMEOUT", 5))
+DISC_READ_TIMEOUT = float(os.environ.get("DISC_READ_TIMEOUT", 60))
+
+# Nouvelles tentatives (attente exponentielle) des GET/HEAD sur erreurs réseau, 429 et 5xx
+# (jamais des PATCH, non idempotents côté DISC)
+DISC_RETRIES = int(os.environ.get("DISC_RETRIES", 3))
+DISC_BACKOFF = float(os.environ.get("DISC_BACKOFF", 0.5))
+
+
+class DiscAuthError(Exception):
+    """
+    Authentification au DISC impossible (même après reconnexion).
+
+    Volontairement distincte de requests.RequestException : elle n'est pas absorbée par les
+    `except RequestException` des fonctions get_*, pour ne pas optimiser sur des données vides.
+    """
+
+
+def is_auth_failure(response):
+    """
+    True si la réponse (requests ou httpx) indique une session expirée :
+    401, redirection vers la page de login ou page de login servie à la place du JSON.
+    """
+    if response.status_code == 401:
+        return True
+    location = response.headers.get("Location", "")
+    if response.is_redirect and urlparse(location).path.rstrip("/").endswith("/login"):
+        return True
+    if urlparse(str(response.url)).path.rstrip("/").endswith("/login"):
+        return True
+    content_type = response.headers.get("Content-Type", "")
+    return "text/html" in content_type and 'name="_csrf_token"' in response.text
+
+
+class DiscClient:
+    """
+    Client HTTP du DISC : pool de connexions, délais, nouvelles tentatives et reconnexion
+    transparente lorsque la session expire (401 ou redirection vers la page de login).
+
+    S'utilise comme une requests.Session : get(url), patch(url, json=...), avec une URL complète
+    ou un chemin relatif à API_URL.
+    """
+
+    def __init__(self, base_url=None, pool_size=DISC_POOL_SIZE):
+        self.base_url = (base_url or os.environ.get("API_URL", "https://preprod.disc-chantier.com")).rstrip("/")
+        self.pool_size = pool_size
+        self.timeout = (DISC_CONNECT_TIMEOUT, DISC_READ_TIMEOUT)
+        self._session = None
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    # --------------------------
+    # Session et authentification
+    # --------------------------
+    def _new_session(self):
+        session = requests.Session()
+        retry = Retry(
+            total=DISC_RETRIES,
+            backoff_factor=DISC_BACKOFF,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=frozenset(["GET", "HEAD"]),
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=self.pool_size, max_retries=retry)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        return session
+
+    def _login(self, generation):
+        """(Re)connecte la session, sauf si un autre thread l'a déjà fait depuis `generation`."""
+        with self._lock:
+            if self._session is not None and self._generation != generation:
+                return self._session, self._generation
+            session = login_to_api(self._new_session(), self.base_url, timeout=self.timeout)
+            if session is None:
+                raise DiscAuthError(f"Connexion au DISC impossible ({self.base_url})")
+            self._session = session
+            self._generation += 1
+            return self._session, self._generation
+
+    @property
+    def session(self):
+        """Session requests authentifiée (connexion à la première utilisation)."""
+        with self._lock:
+            session, generation = self._session, self._generation
+        if session is None:
+            session, generation = self._login(generation)
+        return session
+
+    def relogin(self):
+        """Force une reconnexion (sauf si un autre thread vient de le faire) et retourne la session."""
+        with self._lock:
+            generation = self._generation
+        return self._login(generation)[0]
+
+    def invalidate(self):
+        """Oublie la session courante : la prochaine requête se reconnecte."""
+        with self._lock:
+            self._session = None
+
+    # --------------------------
+    # Requêtes
+    # --------------------------
+    def _url(self, url):
+        return url if url.startswith(("http://", "https://")) else f"{self.base_url}{url}"
+
+    def request(self, method, url, **kwargs):
+        """Envoie une requête ; en cas de session expirée, se reconnecte puis rejoue la requête une fois."""
+        kwargs.setdefault("timeout", self.timeout)
+        url = self._url(url)
+        with self._lock:
+            session, generation = self._session, self._generation
+        if session is None:
+            session, generation = self._login(generation)
+
+        response = session.request(method, url, **kwargs)
+        if not is_auth_failure(response):
+            return response
+
+        logger.warning("Session DISC expirée (%s sur %s), reconnexion", response.status_code, url)
+        session, _ = self._login(generation)
+        response = session.request(method, url, **kwargs)
+        if is_auth_failure(response):
+            raise DiscAuthError(f"Session DISC refusée après reconnexion ({response.status_code} sur {url})")
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+    def patch(self, url, **kwargs):
+        return self.request("PATCH", url, **kwargs)
+
+
+# Variable privée pour stocker le client unique
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_disc_client():
+    """
+    Retourne le client DISC unique du processus.
+    """
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = DiscClient()
+        return _client
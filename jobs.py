@@ -0,0 +1,135 @@
+import os
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from concurrent.futures import ThreadPoolExecutor
+
+from logs import get_logger
+
+logger = get_logger(__name__)
+
+# Nombre de traitements (optimisation, remplacement) exécutés simultanément
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 4))
+
+# Durée de conservation (secondes) d'un job terminé avant purge
+JOB_TTL_SECONDS = float(os.environ.get("JOB_TTL_SECONDS", 3600))
+
+# Statuts possibles d'un job
+PENDING = "en attente"
+RUNNING = "en cours"
+DONE = "terminé"
+FAILED = "erreur"
+
+
+class Job:
+    """État d'un traitement soumis à la file de jobs."""
+    __slots__ = ("id", "kind", "status", "result", "error", "created_at", "started_at", "finished_at", "report")
+
+    def __init__(self, kind, report=None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.status = PENDING
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.report = report  # RequestReport (telemetry) éventuellement rempli par le traitement
+
+    def to_dict(self):
+        return {
+            "jobId": self.id,
+            "type": self.kind,
+            "status": self.status,
+            "result": self.result,
+            "error": self.error,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "rapport": self.report.to_dict() if self.report is not None else None,
+        }
+
+
+class JobManager:
+    """
+    File de jobs exécutés dans un pool de threads borné, hors de la boucle d'événements.
+
+    - limits : nombre maximal de jobs d'un même type exécutés en même temps
+               (ex. {"optimisation": 1}) ; pas de limite pour un type absent.
+    - key    : deux jobs de même clé (ex. même horizon) ne sont jamais exécutés en même temps.
+
+    Les limites sont appliquées avant l'envoi au pool : un job qui doit attendre reste dans la
+    file d'attente sans occuper de thread, et les jobs d'autres types passent devant lui
+    (ordre d'arrivée sinon).
+    """
+
+    def __init__(self, max_workers=JOB_WORKERS, limits=None, ttl=JOB_TTL_SECONDS):
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._limits = dict(limits or {})
+        self._running = Counter()    # type -> nombre de jobs envoyés au pool et non terminés
+        self._busy_keys = set()      # (type, clé) des jobs envoyés au pool et non terminés
+        self._waiting = deque()      # (job, clé, fn, args) en attente d'une place
+        self._jobs = {}
+        self._ttl = ttl
+        self._lock = threading.Lock()
+
+    def submit(self, kind, fn, *args, key=None, report=None):
+        """
+        Enregistre un job et le place dans la file ; retourne immédiatement le Job.
+        report : RequestReport passé à fn par l'appelant et exposé dans to_dict().
+        """
+        job = Job(kind, report)
+        with self._lock:
+            self._purge()
+            self._jobs[job.id] = job
+            self._waiting.append((job, None if key is None else (kind, key), fn, args))
+            self._dispatch()
+        return job
+
+    def get(self, job_id):
+        """Retourne le Job correspondant, ou None s'il est inconnu ou purgé."""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _dispatch(self):
+        """Envoie au pool les jobs en attente dont le type et la clé sont libres (sous self._lock)."""
+        blocked = deque()
+        while self._waiting:
+            entry = self._waiting.popleft()
+            job, key = entry[0], entry[1]
+            limit = self._limits.get(job.kind)
+            if (limit is not None and self._running[job.kind] >= limit) or key in self._busy_keys:
+                blocked.append(entry)
+                continue
+            self._running[job.kind] += 1
+            if key is not None:
+                self._busy_keys.add(key)
+            self._executor.submit(self._run, *entry)
+        self._waiting = blocked
+
+    def _run(self, job, key, fn, args):
+        try:
+            job.status = RUNNING
+            job.started_at = time.time()
+            job.result = fn(*args)
+            job.status = DONE
+        except Exception as e:
+            logger.exception("Erreur dans le job %s %s : %s", job.kind, job.id, e)
+            job.error = str(e)
+            job.status = FAILED
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._running[job.kind] -= 1
+                self._busy_keys.discard(key)
+                self._dispatch()
+
+    def _purge(self):
+        now = time.time()
+        expired = [
+            job_id for job_id, job in self._jobs.items()
+            if job.finished_at is not None and now - job.finished_at > self._ttl
+        ]
+        for job_id in expired:
+            del self._jobs[job_id]
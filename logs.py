@@ -0,0 +1,92 @@
+import itertools
+import json
+import logging
+import os
+import sys
+import threading
+
+# Niveau de journalisation (DEBUG, INFO, WARNING, ERROR) ; en production, INFO ou plus
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# "json" : une ligne JSON par message ; "text" : format lisible pour le développement
+LOG_FORMAT = os.environ.get("LOG_FORMAT", "json")
+
+# Messages par élément (un RDV, une intervention...) : un message sur LOG_SAMPLE_EVERY est émis
+LOG_SAMPLE_EVERY = int(os.environ.get("LOG_SAMPLE_EVERY", 100))
+
+# Attributs standard d'un LogRecord, exclus des champs structurés
+_RECORD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+
+
+class JsonFormatter(logging.Formatter):
+    """Formate chaque message en une ligne JSON ; les champs passés via `extra` sont conservés."""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 3),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+_configured = False
+_configure_lock = threading.Lock()
+
+
+def configure_logging(level=LOG_LEVEL, fmt=LOG_FORMAT):
+    """Installe le gestionnaire de la racine "zabal" (une seule fois par processus)."""
+    global _configured
+    with _configure_lock:
+        if _configured:
+            return
+        handler = logging.StreamHandler(sys.stdout)
+        if fmt == "json":
+            handler.setFormatter(JsonFormatter())
+        else:
+            handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s : %(message)s"))
+        root = logging.getLogger("zabal")
+        root.addHandler(handler)
+        root.setLevel(level)
+        root.propagate = False
+        _configured = True
+
+
+def get_logger(name):
+    """Logger du module `name`, rattaché à la racine "zabal"."""
+    configure_logging()
+    return logging.getLogger(f"zabal.{name}")
+
+
+class Sampler:
+    """
+    Échantillonnage des messages DEBUG/INFO par élément : seul un appel sur `every` est journalisé
+    (le premier, puis tous les `every`), avec le nombre d'occurrences dans le champ "occurrence".
+    Les avertissements et erreurs ne sont jamais échantillonnés.
+    """
+
+    def __init__(self, every=LOG_SAMPLE_EVERY):
+        self.every = max(every, 1)
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def log(self, logger, level, key, msg, *args, **fields):
+        if not logger.isEnabledFor(level):
+            return
+        if level >= logging.WARNING:
+            logger.log(level, msg, *args, extra=fields)
+            return
+        with self._lock:
+            counter = self._counters.setdefault(key, itertools.count(1))
+            occurrence = next(counter)
+        if occurrence == 1 or occurrence % self.every == 0:
+            logger.log(level, msg, *args, extra={"occurrence": occurrence, **fields})
+
+
+sampler = Sampler()
@@ -0,0 +1,83 @@
+import os
+import threading
+import time
+
+# Durée de validité (secondes) de la liste des poseurs avant rechargement depuis /api/typeusers
+ROSTER_TTL_SECONDS = float(os.environ.get("ROSTER_TTL_SECONDS", 300))
+
+
+class Roster:
+    """
+    Instantané de la liste des poseurs.
+
+    `ids` conserve l'ordre renvoyé par l'API (utilisé tel quel comme liste d'affectation),
+    `id_set` est un frozenset pour les tests d'appartenance en O(1).
+    """
+    __slots__ = ("ids", "id_set", "loaded_at")
+
+    def __init__(self, ids, loaded_at=None):
+        self.ids = tuple(ids)
+        self.id_set = frozenset(self.ids)
+        self.loaded_at = time.monotonic() if loaded_at is None else loaded_at
+
+    def __contains__(self, user_id):
+        return user_id in self.id_set
+
+    def __iter__(self):
+        return iter(self.ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __bool__(self):
+        return bool(self.ids)
+
+    def __repr__(self):
+        return f"Roster({list(self.ids)})"
+
+
+class RosterProvider:
+    """
+    Fournit la liste des poseurs avec un cache à durée de vie limitée (TTL).
+
+    fetch : fonction sans argument qui renvoie la liste des IDs de poseurs depuis l'API.
+    Une liste vide (erreur API) n'est pas mise en cache, pour retenter au prochain appel.
+    """
+
+    def __init__(self, fetch, ttl=ROSTER_TTL_SECONDS):
+        self._fetch = fetch
+        self._ttl = ttl
+        self._roster = None
+        self._lock = threading.Lock()
+
+    def get(self):
+        """Retourne le Roster courant, rechargé depuis l'API si absent ou expiré."""
+        with self._lock:
+            roster = self._roster
+            if roster is not None and time.monotonic() - roster.loaded_at < self._ttl:
+                return roster
+            roster = Roster(self._fetch() or [])
+            if roster:
+                self._roster = roster
+            return roster
+
+    def peek(self):
+        """Retourne le Roster en cache s'il est encore valide, sans appel API (sinon None)."""
+        with self._lock:
+            roster = self._roster
+            if roster is not None and time.monotonic() - roster.loaded_at < self._ttl:
+                return roster
+            return None
+
+    def store(self, ids):
+        """Enregistre une liste de poseurs obtenue par ailleurs (ex. acquisition asynchrone)."""
+        roster = Roster(ids or [])
+        if roster:
+            with self._lock:
+                self._roster = roster
+        return roster
+
+    def invalidate(self):
+        """Vide le cache : le prochain appel à get() rechargera la liste (ex. nouvelle embauche)."""
+        with self._lock:
+            self._roster = None
@@ -0,0 +1,137 @@
+import threading
+import time
+from contextlib import contextmanager
+
+# Description des métriques exposées sur /metrics
+METRIC_HELP = {
+    "zabal_stage_seconds": "Durée (secondes) de chaque étape d'une requête",
+    "zabal_period_build_seconds": "Durée (secondes) de construction d'un modèle de tournées",
+    "zabal_period_solve_seconds": "Durée (secondes) de résolution d'un modèle de tournées",
+    "zabal_period_nodes": "Nombre de nœuds (hors dépôt) d'un modèle de tournées",
+    "zabal_period_vehicles": "Nombre de véhicules d'un modèle de tournées",
+    "zabal_period_dropped_total": "Nœuds non planifiés (disjonctions abandonnées)",
+    "zabal_period_solved_total": "Modèles de tournées résolus",
+    "zabal_period_last_objective": "Valeur de l'objectif du dernier modèle résolu",
+}
+
+
+class MetricsRegistry:
+    """
+    Métriques du processus au format texte Prometheus.
+
+    - inc     : compteur (suffixe _total conseillé)
+    - observe : résumé (exposé en _sum et _count)
+    - set     : jauge
+    Les collecteurs (fonctions sans argument renvoyant [(nom, {labels}, valeur)]) sont
+    appelés à chaque export, pour des valeurs lues à la demande (ex. cache des trajets).
+    """
+
+    def __init__(self):
+        self._counters = {}
+        self._summaries = {}
+        self._gauges = {}
+        self._collectors = []
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self._lock:
+            total, count = self._summaries.get(key, (0.0, 0))
+            self._summaries[key] = (total + value, count + 1)
+
+    def set(self, name, value, **labels):
+        with self._lock:
+            self._gauges[self._key(name, labels)] = value
+
+    def add_collector(self, collector):
+        self._collectors.append(collector)
+
+    def render(self):
+        """Export au format d'exposition texte Prometheus (version 0.0.4)."""
+        with self._lock:
+            series = {}
+            for (name, labels), value in self._counters.items():
+                series.setdefault((name, "counter"), []).append((name, labels, value))
+            for (name, labels), (total, count) in self._summaries.items():
+                series.setdefault((name, "summary"), []).extend(
+                    [(f"{name}_sum", labels, total), (f"{name}_count", labels, count)]
+                )
+            for (name, labels), value in self._gauges.items():
+                series.setdefault((name, "gauge"), []).append((name, labels, value))
+        for collector in self._collectors:
+            for name, labels, value in collector():
+                series.setdefault((name, "gauge"), []).append((name, tuple(sorted(labels.items())), value))
+
+        lines = []
+        for (name, kind), samples in sorted(series.items()):
+            if name in METRIC_HELP:
+                lines.append(f"# HELP {name} {METRIC_HELP[name]}")
+            lines.append(f"# TYPE {name} {kind}")
+            for sample_name, labels, value in samples:
+                label_str = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{sample_name}{{{label_str}}} {value}" if label_str else f"{sample_name} {value}")
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+
+class RequestReport:
+    """
+    Rapport de temps d'une requête : durée de chaque étape et statistiques de chaque modèle
+    de tournées résolu. Les mêmes valeurs alimentent les métriques du processus.
+    Une sous‑étape est nommée "etape.sous_etape" (ex. "optimisation.matrice").
+    """
+
+    def __init__(self, kind):
+        self.kind = kind
+        self.stages = []
+        self.periods = []
+        self.started_at = time.time()
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def stage(self, name):
+        """Mesure la durée d'un bloc : `with report.stage("tri"): ...`."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            duration = time.perf_counter() - start
+            with self._lock:
+                self.stages.append({"etape": name, "duree": round(duration, 4)})
+            metrics.observe("zabal_stage_seconds", duration, kind=self.kind, stage=name)
+
+    def add_period(self, stats):
+        """Enregistre les statistiques d'un modèle (voir optimize_period_routing)."""
+        if not stats:
+            return
+        with self._lock:
+            self.periods.append(stats)
+        engine = stats.get("moteur", "periode")
+        metrics.inc("zabal_period_solved_total", engine=engine)
+        metrics.observe("zabal_period_build_seconds", stats.get("construction", 0.0), engine=engine)
+        metrics.observe("zabal_period_solve_seconds", stats.get("resolution", 0.0), engine=engine)
+        metrics.observe("zabal_period_nodes", stats.get("noeuds", 0), engine=engine)
+        metrics.observe("zabal_period_vehicles", stats.get("vehicules", 0), engine=engine)
+        metrics.inc("zabal_period_dropped_total", stats.get("abandons", 0), engine=engine)
+        if stats.get("objectif") is not None:
+            metrics.set("zabal_period_last_objective", stats["objectif"], engine=engine)
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "type": self.kind,
+                "etapes": list(self.stages),
+                "periodes": list(self.periods),
+                "duree_totale": round(sum(stage["duree"] for stage in self.stages if "." not in stage["etape"]), 4),
+            }
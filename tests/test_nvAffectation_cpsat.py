@@ -0,0 +1,53 @@
+import copy
+import random
+from datetime import datetime, timedelta
+
+from Fonction2_nvAffectation.nvAffectation_algo import reaffecter_rdv
+from Fonction2_nvAffectation.nvAffectation_cpsat import reaffecter_rdv_cpsat
+
+ABSENT = 1
+
+
+def planning_dense(seed, nb_rdv=500, nb_ressources=25, nb_jours=3):
+    """Planning saturé : chaque ressource a plusieurs rendez‑vous par jour, souvent chevauchants."""
+    rnd = random.Random(seed)
+    debut = datetime(2025, 3, 3, 8, 0)
+    ressources = list(range(1, nb_ressources + 1))
+    rdvs = []
+    for k in range(nb_rdv):
+        start = debut + timedelta(days=rnd.randrange(nb_jours), minutes=30 * rnd.randrange(18))
+        nombre = rnd.choice((1, 1, 2))
+        # Le poseur absent reçoit une part des rendez‑vous
+        defini = rnd.sample(ressources, nombre)
+        if k % 20 == 0 and ABSENT not in defini:
+            defini[0] = ABSENT
+        rdvs.append({
+            "id_rdv": k,
+            "date_debut": start.isoformat(),
+            "date_fin": (start + timedelta(hours=rnd.choice((1, 2, 3)))).isoformat(),
+            "nombre_ressources": nombre,
+            "affectation_ressources_defini": defini,
+            "affectation_ressources_possible": rnd.sample(ressources, 8) + [ABSENT],
+            "criticite": rnd.randint(1, 3),
+            "coordonnees_gps": f"{43.3 + rnd.random() / 5}, {-1.5 + rnd.random() / 5}",
+        })
+    return rdvs
+
+
+def _couverts(resultat, rdvs):
+    """Rendez‑vous absents qui gardent leur créneau sans la personne absente."""
+    absents = {rdv["id_rdv"] for rdv in rdvs if ABSENT in rdv["affectation_ressources_defini"]}
+    return sum(
+        1 for rdv in resultat
+        if rdv["id_rdv"] in absents and rdv["date_debut"] is not None
+        and ABSENT not in rdv["affectation_ressources_defini"]
+    )
+
+
+def test_cpsat_couvre_au_moins_autant_que_le_glouton():
+    for seed in range(3):
+        rdvs = planning_dense(seed)
+        glouton = reaffecter_rdv({"sorted_data": copy.deepcopy(rdvs), "employe_absent": ABSENT})
+        cpsat = reaffecter_rdv_cpsat({"sorted_data": copy.deepcopy(rdvs), "employe_absent": ABSENT}, time_limit=10)
+        assert _couverts(glouton, rdvs) > 0
+        assert _couverts(cpsat, rdvs) >= _couverts(glouton, rdvs)
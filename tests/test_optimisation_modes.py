@@ -0,0 +1,61 @@
+import random
+from datetime import datetime
+
+import pytest
+
+from Fonction1_Optimisation.optimisationTournee_algo import (
+    AFTERNOON_END,
+    AFTERNOON_START,
+    MORNING_END,
+    MORNING_START,
+    optimize_schedule,
+)
+
+
+def planning(seed, nb_rdv=12, poseurs=("A", "B", "C")):
+    """Rendez‑vous sans fenêtre client : chacun est éligible à toutes les périodes de l'horizon."""
+    rnd = random.Random(seed)
+    return [
+        {
+            "id_rdv": k,
+            "modifiable": 1,
+            "duree": str(rnd.choice((30, 60, 90))),
+            "nombre_ressources": 1,
+            "coordonnees_gps": f"{43.3 + rnd.random() / 10}, {-1.5 + rnd.random() / 10}",
+            "affectation_ressources": [rnd.choice(poseurs)],
+            "date_debut_rdv": None,
+            "date_fin_rdv": None,
+            "date_debut_client": None,
+            "date_fin_client": None,
+        }
+        for k in range(nb_rdv)
+    ]
+
+
+def _minutes(valeur):
+    dt = datetime.fromisoformat(valeur)
+    return dt.date(), dt.hour * 60 + dt.minute
+
+
+@pytest.mark.parametrize("solve_workers", [1, 4])
+def test_planning_coherent_en_sequentiel_et_en_parallele(solve_workers):
+    # Les deux modes n'ont pas la même règle d'attribution (voir optimize_schedule) et la recherche
+    # est bornée en temps : on vérifie la validité du planning, pas son identité
+    rdvs = planning(0)
+    initial = {rdv["id_rdv"]: rdv for rdv in rdvs}
+    modifies = optimize_schedule(rdvs, 2, poseurs={"A", "B", "C"}, solve_workers=solve_workers)
+    assert modifies
+
+    occupation = {}
+    for rdv in modifies:
+        assert set(rdv["affectation_ressources"]) <= set(initial[rdv["id_rdv"]]["affectation_ressources"])
+        jour, debut = _minutes(rdv["date_debut_rdv"])
+        jour_fin, fin = _minutes(rdv["date_fin_rdv"])
+        assert jour_fin == jour
+        assert fin - debut == int(initial[rdv["id_rdv"]]["duree"])
+        assert MORNING_START <= debut and fin <= MORNING_END or AFTERNOON_START <= debut and fin <= AFTERNOON_END
+        for poseur in rdv["affectation_ressources"]:
+            occupation.setdefault((poseur, jour), []).append((debut, fin))
+    for creneaux in occupation.values():
+        creneaux.sort()
+        assert all(fin <= suivant for (_, fin), (suivant, _) in zip(creneaux, creneaux[1:]))
@@ -0,0 +1,32 @@
+import random
+from datetime import date
+
+from Fonction3_replace.replace_cpsat import optimiser_remplacement_unique
+
+POSEURS = [f"P{i}" for i in range(6)]
+
+
+def fenetre(seed, nb_candidats):
+    """RDV annulé de 4 poseurs et nb_candidats RDV sur les 7 jours suivants."""
+    rnd = random.Random(seed)
+    annule = {"id": 1, "daterv": "2026-10-19T08:00:00+01:00", "duree": "240",
+              "users": [{"username": p} for p in POSEURS[:4]]}
+    candidats = [
+        {"id": 10 + k, "daterv": f"2026-10-{19 + rnd.randint(0, 6)}T08:00:00+01:00",
+         "duree": str(rnd.choice((60, 90, 120, 240, 300))),
+         "users": [{"username": p} for p in rnd.sample(POSEURS, rnd.choice((1, 2, 4)))],
+         "users_recommended": [{"username": p} for p in rnd.sample(POSEURS, rnd.randint(0, 2))],
+         "marchandises": [], "chantier": {"adresse": ""}}
+        for k in range(nb_candidats)
+    ]
+    poseurs_libres = [{"poseur": u["username"], "date_disponible": date(2026, 10, 19)} for u in annule["users"]]
+    return poseurs_libres, candidats, annule
+
+
+def test_grande_fenetre_sans_debordement():
+    # 4 poseurs et 1000 candidats : les anciens poids dépassaient 2**63 (MODEL_INVALID)
+    poseurs_libres, candidats, annule = fenetre(0, 1000)
+    result = optimiser_remplacement_unique(poseurs_libres, candidats, annule, time_limit=20, workers=4)
+    assert result is not None
+    assert result["affectations"]
+    assert result["message"] == "Remplacement terminé (Phase 1)"
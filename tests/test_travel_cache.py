@@ -0,0 +1,37 @@
+import random
+
+import numpy as np
+
+from Fonction1_Optimisation.optimisationTournee_algo import travel_time, travel_time_matrix
+from Fonction1_Optimisation.optimisationTournee_distances import TravelTimeCache
+
+
+def points(seed, n):
+    rnd = random.Random(seed)
+    return [(43.3 + rnd.random() / 10, -1.5 + rnd.random() / 10) for _ in range(n)]
+
+
+def test_cache_identique_au_calcul_par_paire():
+    cache = TravelTimeCache()
+    coords = points(0, 60)
+    cache.matrix(coords[:40])
+    # Sites proches à 1e-7 degré près : chacun garde ses propres temps
+    coords += [(lat + 1e-7, lon) for lat, lon in coords[:5]]
+    matrice = cache.matrix(coords)
+    assert (matrice == travel_time_matrix(coords)).all()
+    assert all(matrice[i][j] == travel_time(coords[i], coords[j]) for i in range(0, 65, 7) for j in range(65))
+
+
+def test_matrice_compactee_apres_eviction():
+    cache = TravelTimeCache(max_entries=100)
+    grand = points(1, 300)
+    cache.matrix(grand)
+    petit = points(2, 8)
+    matrice = cache.matrix(petit)
+    assert len(cache._slots) == 10
+    assert len(cache._times) <= 64
+    assert (matrice == travel_time_matrix(petit)).all()
+    # Les sites conservés gardent leurs temps après renumérotation
+    hits = cache.hits
+    assert (cache.matrix(petit) == matrice).all()
+    assert cache.hits == hits + 64
@@ -1,4 +1,5 @@
 import math
+import numpy as np
 from datetime import datetime, timedelta
 from dateutil.parser import parse
 
@@ -8,6 +9,10 @@ from dateutil.parser import parse
 from datetime import datetime, timezone
 from dateutil.parser import parse
 
+from logs import get_logger
+
+logger = get_logger(__name__)
+
 def to_datetime(val):
     """
     Convertit une valeur (datetime ou chaîne) en un objet datetime en UTC.
@@ -31,7 +36,7 @@ def to_datetime(val):
             try:
                 dt = parse(val)
             except Exception as e:
-                print(f"Erreur de conversion de date '{val}': {e}")
+                logger.warning("Erreur de conversion de date '%s' : %s", val, e)
                 return None
     else:
         return None
@@ -54,4 +59,30 @@ def haversine_distance(coord1, coord2):
     dlon = lon2 - lon1
     a = math.sin(dlat/2)**2 + math.cos(lat1)*math.cos(lat2)*math.sin(dlon/2)**2
     c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    return R * c
\ No newline at end of file
+    return R * c
+
+
+def haversine_pairs(coords1, coords2):
+    """
+    Version vectorisée de haversine_distance : distances (en km) élément par élément
+    entre deux tableaux de points (lat, lon) de formes compatibles (broadcasting NumPy).
+    """
+    R = 6371  # Rayon de la Terre en km
+    p1 = np.radians(np.asarray(coords1, dtype=np.float64))
+    p2 = np.radians(np.asarray(coords2, dtype=np.float64))
+    lat1, lon1 = p1[..., 0], p1[..., 1]
+    lat2, lon2 = p2[..., 0], p2[..., 1]
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    a = np.sin(dlat/2)**2 + np.cos(lat1)*np.cos(lat2)*np.sin(dlon/2)**2
+    c = 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+    return R * c
+
+
+def haversine_matrix(coords):
+    """
+    Calcule en une seule opération la matrice N×N des distances (en km) entre des points (lat, lon).
+    Même formule que haversine_distance, appliquée à toutes les paires.
+    """
+    points = np.asarray(coords, dtype=np.float64).reshape(-1, 2)
+    return haversine_pairs(points[:, None, :], points[None, :, :])